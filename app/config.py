@@ -13,22 +13,133 @@ class Settings:
     BASE_DIR = BASE_DIR
     UPLOAD_FOLDER = BASE_DIR / 'static/images/uploads'
     DEFAULT_CARD_PATH = BASE_DIR / 'static/images/default_card.png'
+    PLACEHOLDER_IMAGE_PATH = BASE_DIR / 'static/images/placeholder.svg'
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+    # Comma-separated list of generators to route between; a single name behaves like IMAGE_GENERATOR
+    IMAGE_GENERATORS = os.getenv("IMAGE_GENERATORS", "")
+    IMAGE_HEDGE_ENABLED = os.getenv("IMAGE_HEDGE_ENABLED", "true").lower() == "true"
+    IMAGE_HEDGE_DELAY = float(os.getenv("IMAGE_HEDGE_DELAY", "5"))  # seconds, until a provider has a p95
+    IMAGE_HEDGE_MIN_SAMPLES = int(os.getenv("IMAGE_HEDGE_MIN_SAMPLES", "10"))
+    BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+    BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))  # seconds
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json or text
+    # Fraction of INFO/DEBUG records kept per logger: logger=rate,... (warnings and errors are always kept)
+    LOG_SAMPLING = os.getenv("LOG_SAMPLING", "")  # e.g. uvicorn.access=0.1
+    LOG_MAX_FIELD_LENGTH = int(os.getenv("LOG_MAX_FIELD_LENGTH", "2000"))  # characters per message or field
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))  # records buffered before new ones are dropped
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")  # when set, admin endpoints require X-Admin-Token
+    IMAGE_URL_MODE = os.getenv("IMAGE_URL_MODE", "store")  # "store" serves /images/{hash}, "data" inlines data URLs
+    IMAGE_STORE_MAX_BYTES = int(os.getenv("IMAGE_STORE_MAX_BYTES", str(500 * 1024 * 1024)))
+    IMAGE_STORE_MAX_AGE = float(os.getenv("IMAGE_STORE_MAX_AGE", str(7 * 24 * 3600)))  # seconds
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    OPENAI_API_URL = os.getenv("OPENAI_API_URL", "https://api.openai.com/v1/images/generations")
+    RUNWARE_API_URL = os.getenv("RUNWARE_API_URL", "https://api.runware.ai/v1")
+    RUNWARE_WS_URL = os.getenv("RUNWARE_WS_URL", "wss://ws-api.runware.ai/v1")
+    RUNWARE_TRANSPORT = os.getenv("RUNWARE_TRANSPORT", "auto")  # auto (websocket when installed), websocket or http
+    RUNWARE_NUMBER_RESULTS = int(os.getenv("RUNWARE_NUMBER_RESULTS", "1"))  # variants generated per task
+    RUNWARE_MAX_BATCH_SIZE = int(os.getenv("RUNWARE_MAX_BATCH_SIZE", "8"))  # tasks per request
+    RUNWARE_BATCH_WINDOW_MS = float(os.getenv("RUNWARE_BATCH_WINDOW_MS", "20"))
+    RUNWARE_TIMEOUT = float(os.getenv("RUNWARE_TIMEOUT", "60"))  # seconds
+    PICSUM_BASE_URL = os.getenv("PICSUM_BASE_URL", "https://picsum.photos")
     LLM_MODEL = "llama3.2:1b"
+    OLLAMA_API_URL = os.getenv("OLLAMA_API_URL", "http://127.0.0.1:11434/api/chat")
+    OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "10"))
+    OLLAMA_MAX_KEEPALIVE = int(os.getenv("OLLAMA_MAX_KEEPALIVE", "5"))
+    OLLAMA_MAX_CONCURRENCY = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "4"))
+    OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "120"))
+    # Per-provider connection limits for the shared HTTP clients: provider=max_connections:max_keepalive
+    HTTP_PROVIDER_LIMITS = os.getenv("HTTP_PROVIDER_LIMITS", "openai=10:5,runware=10:5,picsum=20:10")
+    HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+    # provider=requests_per_second:max_concurrency; 0 means unlimited
+    ADMISSION_LIMITS = os.getenv("ADMISSION_LIMITS", "openai=5:4,runware=10:8,picsum=20:16")
+    ADMISSION_MAX_QUEUE_WAIT = float(os.getenv("ADMISSION_MAX_QUEUE_WAIT", "10"))  # seconds before shedding
+    ADMISSION_MAX_RETRIES = int(os.getenv("ADMISSION_MAX_RETRIES", "2"))
+    ADMISSION_BACKOFF_BASE = float(os.getenv("ADMISSION_BACKOFF_BASE", "0.5"))  # seconds
+    ADMISSION_BACKOFF_MAX = float(os.getenv("ADMISSION_BACKOFF_MAX", "10"))
+    # Local Stable Diffusion (IMAGE_GENERATOR=huggingface)
+    HF_MODEL_ID = os.getenv("HF_MODEL_ID", "runwayml/stable-diffusion-v1-5")
+    HF_BACKEND = os.getenv("HF_BACKEND", "torch")  # torch or onnx (needs optimum[onnxruntime])
+    HF_SCHEDULER = os.getenv("HF_SCHEDULER", "default")  # default, dpm, euler, euler_a or lcm
+    HF_QUALITY_TIER = os.getenv("HF_QUALITY_TIER", "final")  # draft or final
+    HF_DRAFT_STEPS = int(os.getenv("HF_DRAFT_STEPS", "12"))
+    HF_DRAFT_SIZE = int(os.getenv("HF_DRAFT_SIZE", "384"))
+    HF_FINAL_STEPS = int(os.getenv("HF_FINAL_STEPS", "30"))
+    HF_FINAL_SIZE = int(os.getenv("HF_FINAL_SIZE", "512"))
+    HF_MAX_BATCH_SIZE = int(os.getenv("HF_MAX_BATCH_SIZE", "4"))
+    HF_BATCH_WINDOW_MS = float(os.getenv("HF_BATCH_WINDOW_MS", "50"))
+    HF_CHANNELS_LAST = os.getenv("HF_CHANNELS_LAST", "true").lower() == "true"
+    HF_TORCH_COMPILE = os.getenv("HF_TORCH_COMPILE", "false").lower() == "true"
+    HF_NUM_THREADS = int(os.getenv("HF_NUM_THREADS", "0"))  # 0 keeps torch's default
+    # Shared model server process (IMAGE_GENERATOR=model_server); see app/services/model_server.py
+    MODEL_SERVER_SOCKET = Path(os.getenv("MODEL_SERVER_SOCKET", str(BASE_DIR / ".cache/model_server.sock")))
+    MODEL_SERVER_MAX_PENDING = int(os.getenv("MODEL_SERVER_MAX_PENDING", "64"))
+    MODEL_SERVER_TIMEOUT = float(os.getenv("MODEL_SERVER_TIMEOUT", "300"))
+    IMAGE_CACHE_ENABLED = os.getenv("IMAGE_CACHE_ENABLED", "true").lower() == "true"
+    IMAGE_CACHE_DIR = Path(os.getenv("IMAGE_CACHE_DIR", str(BASE_DIR / ".cache/images")))
+    IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+    IMAGE_PREVIEW_FORMAT = os.getenv("IMAGE_PREVIEW_FORMAT", "webp")  # webp or avif
+    IMAGE_PREVIEW_SIZE = int(os.getenv("IMAGE_PREVIEW_SIZE", "512"))  # longest edge in pixels
+    IMAGE_EMAIL_SIZE = int(os.getenv("IMAGE_EMAIL_SIZE", "800"))
+    IMAGE_PRINT_SIZE = int(os.getenv("IMAGE_PRINT_SIZE", "2048"))
+    RENDITION_CACHE_DIR = Path(os.getenv("RENDITION_CACHE_DIR", str(BASE_DIR / ".cache/renditions")))
+    RENDITION_CACHE_MAX_BYTES = int(os.getenv("RENDITION_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    IMAGE_POOL_ENABLED = os.getenv("IMAGE_POOL_ENABLED", "true").lower() == "true"
+    IMAGE_POOL_OCCASIONS = os.getenv("IMAGE_POOL_OCCASIONS", "birthday,holiday,thank_you,congratulations,other")
+    IMAGE_POOL_SIZE = int(os.getenv("IMAGE_POOL_SIZE", "3"))  # ready images per occasion
+    IMAGE_POOL_REFILL_CONCURRENCY = int(os.getenv("IMAGE_POOL_REFILL_CONCURRENCY", "2"))
+    IMAGE_POOL_MAX_BYTES = int(os.getenv("IMAGE_POOL_MAX_BYTES", str(50 * 1024 * 1024)))
+    RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))  # 0 runs rendering in threads instead of processes
+    RENDER_MAX_PENDING = int(os.getenv("RENDER_MAX_PENDING", "32"))
+    RENDER_RETRY_AFTER = int(os.getenv("RENDER_RETRY_AFTER", "1"))  # seconds
+    LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory")  # memory, sqlite or none
+    LLM_CACHE_PATH = Path(os.getenv("LLM_CACHE_PATH", str(BASE_DIR / "llm_cache.db")))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+    LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))  # seconds
+    LLM_CACHE_VARIANTS = int(os.getenv("LLM_CACHE_VARIANTS", "1"))  # distinct responses kept per prompt
+    GENERATION_MODE = os.getenv("GENERATION_MODE", "pipelined")  # sequential, pipelined or speculative
+    # Latency budgets in seconds per route path; past it the preview shows a placeholder image
+    ROUTE_BUDGETS = os.getenv("ROUTE_BUDGETS", "/generate-message=15,/start-questionnaire=10")
+    PENDING_IMAGE_TTL = float(os.getenv("PENDING_IMAGE_TTL", "600"))  # seconds finished background images stay addressable
+    # Shared by the web workers, so any of them can serve a pending image's status
+    PENDING_IMAGE_DIR = Path(os.getenv("PENDING_IMAGE_DIR", str(BASE_DIR / ".cache/pending")))
+    JOB_BACKEND = os.getenv("JOB_BACKEND", "memory")  # memory or sqlite
+    JOB_DB_PATH = Path(os.getenv("JOB_DB_PATH", str(BASE_DIR / "jobs.db")))
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "100"))
+    JOB_TTL = float(os.getenv("JOB_TTL", "3600"))  # seconds finished jobs are kept
+    JOB_LEASE = float(os.getenv("JOB_LEASE", "60"))  # seconds a running job stays claimed without a renewal
     SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
     SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
     SMTP_USERNAME = os.getenv("SMTP_USERNAME")
     SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
     EMAIL_FROM = os.getenv("EMAIL_FROM")
+    SMTP_START_TLS = os.getenv("SMTP_START_TLS", "true").lower() == "true"
+    SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+    SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+    MAX_BULK_RECIPIENTS = int(os.getenv("MAX_BULK_RECIPIENTS", "500"))
+    MAX_BATCH_RECIPIENTS = int(os.getenv("MAX_BATCH_RECIPIENTS", "500"))
+    BATCH_DIR = Path(os.getenv("BATCH_DIR", str(BASE_DIR / ".cache/batches")))
+    BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))  # cards in flight per batch
+    # Limits shared by all running batches, so interactive traffic keeps its share of each backend
+    BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+    BATCH_IMAGE_CONCURRENCY = int(os.getenv("BATCH_IMAGE_CONCURRENCY", "4"))
+    BATCH_RENDER_CONCURRENCY = int(os.getenv("BATCH_RENDER_CONCURRENCY", "2"))
 
 settings = Settings()
 
 # Create necessary directories
 settings.UPLOAD_FOLDER.mkdir(parents=True, exist_ok=True)
 
-# Create default card if it doesn't exist
-if not settings.DEFAULT_CARD_PATH.exists():
+def ensure_default_card():
+    """Render the default card if it doesn't exist yet
+
+    Called at application startup rather than on import, so importing the
+    config stays cheap.
+    """
+    if settings.DEFAULT_CARD_PATH.exists():
+        return
+    
     from PIL import Image, ImageDraw, ImageFont
     
     # Create a simple default card
@@ -41,4 +152,4 @@ if not settings.DEFAULT_CARD_PATH.exists():
     
     # Save the image
     settings.DEFAULT_CARD_PATH.parent.mkdir(parents=True, exist_ok=True)
-    img.save(settings.DEFAULT_CARD_PATH) 
\ No newline at end of file
+    img.save(settings.DEFAULT_CARD_PATH)
@@ -1,26 +1,37 @@
 from fastapi import FastAPI, Request, Form, Body, HTTPException
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse, RedirectResponse, Response
-from typing import Optional
+from fastapi.responses import JSONResponse, RedirectResponse, Response, FileResponse, StreamingResponse
+from typing import Callable, Optional
 import logging
 from urllib.parse import quote
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from fpdf import FPDF
-from PIL import Image
-import os
-from io import BytesIO
-import qrcode
 import base64
+import asyncio
+import json
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.config import settings
+from app.config import settings, ensure_default_card
 from app.services.service_factory import ServiceFactory
+from app.services.card_renderer import render_gift_card_pdf
+from app.services.render_executor import RenderQueueFull
+from app.services.job_queue import JobQueueFull
+from app.services.batch_service import BatchInProgress, BatchNotFound, parse_recipients
+from app.services.image_router import ImageRouter
+from app.services.image_store import IMAGE_FORMATS, detect_image_format
+from app.services import telemetry
+from app.services.deadline import DeadlineMiddleware, parse_budgets
+from app.services.pending_images import PENDING_PREFIX
+from app.services.structured_logging import RequestIdMiddleware, Payload, parse_sampling, setup_logging
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+log_handler = setup_logging(
+    level=settings.LOG_LEVEL,
+    log_format=settings.LOG_FORMAT,
+    sampling=parse_sampling(settings.LOG_SAMPLING),
+    max_field_length=settings.LOG_MAX_FIELD_LENGTH,
+    queue_size=settings.LOG_QUEUE_SIZE
+)
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
@@ -34,12 +45,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Record per-route latency and in-flight requests
+app.add_middleware(telemetry.MetricsMiddleware)
+
+# Per-route latency budgets, read by the LLM and image services
+app.add_middleware(DeadlineMiddleware, budgets=parse_budgets(settings.ROUTE_BUDGETS))
+
+# Tag every log line with the request's X-Request-ID; added last so it wraps everything above
+app.add_middleware(RequestIdMiddleware)
+
 # Serve static files
 app.mount("/static", StaticFiles(directory=str(settings.BASE_DIR / "static")), name="static")
 
 # Templates configuration
 templates = Jinja2Templates(directory=str(settings.BASE_DIR / "templates"))
 
+@app.on_event("startup")
+async def startup():
+    await asyncio.to_thread(ensure_default_card)
+    ServiceFactory.get_http_clients()
+    
+    image_pool = ServiceFactory.get_image_service().image_pool
+    if image_pool is not None:
+        image_pool.start()
+    
+    telemetry.register_cache("llm", lambda: _stats_of(ServiceFactory.get_llm_service().cache))
+    telemetry.register_cache("image", lambda: _stats_of(ServiceFactory.get_image_cache()))
+    telemetry.register_cache("rendition", lambda: _stats_of(ServiceFactory.get_rendition_cache()))
+    telemetry.register_cache("image_pool", lambda: _stats_of(ServiceFactory.get_image_service().image_pool))
+    job_queue = ServiceFactory.get_job_queue()
+    job_queue.register("generate_card", _run_generation_job)
+    await job_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await ServiceFactory.shutdown()
+
 @app.get("/")
 async def index(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
@@ -75,48 +116,39 @@ async def generate_message(
         form_data = await request.form()
         recipient_name = form_data.get("recipient_name", "Friend")
         
-        logger.info("=== Starting message generation ===")
-        logger.info(f"Recipient: {recipient_name}")
-        logger.info(f"Relationship: {relationship}")
-        logger.info(f"Occasion: {occasion}")
-        logger.info(f"Emotion: {emotion}")
-        logger.info(f"Memories: {memories}")
+        logger.info("Generating message", extra={"occasion": occasion, "emotion": emotion})
+        logger.debug("Card details: %s", Payload({
+            "recipient": recipient_name,
+            "relationship": relationship,
+            "memories": memories
+        }))
         
         # Get services
-        llm_service = ServiceFactory.get_llm_service()
-        image_service = ServiceFactory.get_image_service()
+        generation_service = ServiceFactory.get_generation_service()
         
-        # Generate message and image prompt
-        logger.info("Calling LLM service...")
-        generated_content = await llm_service.generate_message(
+        # Generate message and image, overlapping them according to the generation mode
+        generated_content = await generation_service.generate(
             recipient_name, relationship, occasion, emotion, memories or ""
         )
         
-        logger.info(f"LLM Response: {generated_content}")
+        logger.debug("Image prompt: %s", Payload(generated_content["image_prompt"]))
         
-        # Extract message
+        # Extract message and image
         message = generated_content["message"]
-        logger.info(f"Message: {message}")
-        
-        # Generate image using the prompt
-        logger.info("Calling image service...")
-        image_path = await image_service.generate_image(
-            generated_content["image_prompt"],
-            occasion=occasion
-        )
-        logger.info(f"Image path: {image_path}")
+        image_path = generated_content["image_path"]
+        logger.info("Generated message (%d chars), image %s", len(message), Payload(image_path, limit=100))
         
         # Return the preview template with the generated content
         return templates.TemplateResponse("preview.html", {
             "request": request,
             "message": message,
             "image_path": image_path,
+            "preview_path": _rendition_url(image_path, "preview"),
             "recipient_name": recipient_name
         })
         
     except Exception as e:
-        logger.error(f"Error in generate_message: {str(e)}")
-        logger.exception("Full traceback:")
+        logger.exception("Error in generate_message: %s", e)
         # Return to questionnaire with error and all necessary variables
         return templates.TemplateResponse("questionnaire.html", {
             "request": request,
@@ -130,6 +162,242 @@ async def generate_message(
             }
         }, status_code=500)
 
+def _stats_of(component) -> Optional[dict]:
+    return component.stats() if component is not None else None
+
+@app.get("/metrics")
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/stats")
+async def stats():
+    llm_cache = ServiceFactory.get_llm_service().cache
+    image_cache = ServiceFactory.get_image_cache()
+    image_pool = ServiceFactory.get_image_service().image_pool
+    return JSONResponse({
+        "render": ServiceFactory.get_render_executor().stats(),
+        "llm_cache": llm_cache.stats() if llm_cache else None,
+        "image_cache": image_cache.stats() if image_cache else None,
+        "rendition_cache": ServiceFactory.get_rendition_cache().stats(),
+        "image_pool": image_pool.stats() if image_pool else None,
+        "admission": ServiceFactory.get_admission().stats(),
+        "pending_images": ServiceFactory.get_image_service().pending.stats(),
+        "coalescing": {
+            "llm": ServiceFactory.get_llm_service().inflight.stats(),
+            "image": ServiceFactory.get_image_service().inflight.stats()
+        },
+        "logging": {"queued": log_handler.queue.qsize(), "dropped": log_handler.dropped}
+    })
+
+@app.get("/admin/image-router")
+async def image_router_state(request: Request):
+    if settings.ADMIN_TOKEN and request.headers.get("x-admin-token") != settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    generator = ServiceFactory.get_image_service().generator
+    if not isinstance(generator, ImageRouter):
+        raise HTTPException(status_code=404, detail="Image routing is not enabled (set IMAGE_GENERATORS)")
+    return JSONResponse(generator.state())
+
+@app.get("/images/{image_hash}")
+async def get_image(request: Request, image_hash: str, rendition: Optional[str] = None):
+    image_service = ServiceFactory.get_image_service()
+    if rendition is not None and rendition not in image_service.renditions:
+        raise HTTPException(status_code=404, detail=f"Unknown rendition: {rendition}")
+    stored = ServiceFactory.get_image_store().get(image_hash)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    path, media_type = stored
+    
+    # Content-addressed, so the hash is a strong validator and the body never changes
+    etag = f'"{image_hash}-{rendition}"' if rendition else f'"{image_hash}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable"
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    if rendition is None:
+        return FileResponse(path, media_type=media_type, headers=headers)
+    
+    try:
+        image_data = await asyncio.to_thread(path.read_bytes)
+        output = await image_service.rendition(image_data, rendition, digest=image_hash)
+    except RenderQueueFull:
+        # Serve the original rather than make the page wait, but don't let it be cached as the rendition
+        return FileResponse(path, media_type=media_type, headers={"Cache-Control": "no-store"})
+    return Response(output, media_type=IMAGE_FORMATS[detect_image_format(output)], headers=headers)
+
+def _rendition_url(image_path: str, rendition: str) -> str:
+    """URL of a rendition of a stored image; data URLs and pending images are returned unchanged"""
+    if image_path and image_path.startswith('/images/') and not image_path.startswith(PENDING_PREFIX):
+        return f"{image_path}?rendition={rendition}"
+    return image_path
+
+def _pending_status(token: str) -> dict:
+    status = ServiceFactory.get_image_service().pending.status(token)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Pending image not found")
+    if status["status"] == "ready":
+        status["preview_path"] = _rendition_url(status["image_path"], "preview")
+    return status
+
+@app.get("/images/pending/{token}")
+async def get_pending_image(token: str):
+    """The finished image once ready, a placeholder until then"""
+    status = _pending_status(token)
+    no_store = {"Cache-Control": "no-store"}
+    if status["status"] != "ready":
+        return FileResponse(settings.PLACEHOLDER_IMAGE_PATH, media_type="image/svg+xml", headers=no_store)
+    if status["image_path"].startswith('data:image'):
+        header, _, encoded = status["image_path"].partition(',')
+        media_type = header[len('data:'):].split(';')[0]
+        return Response(base64.b64decode(encoded), media_type=media_type, headers=no_store)
+    return RedirectResponse(status["preview_path"], status_code=307, headers=no_store)
+
+@app.get("/images/pending/{token}/status")
+async def get_pending_image_status(token: str):
+    return JSONResponse(_pending_status(token))
+
+@app.get("/images/pending/{token}/events")
+async def stream_pending_image(token: str):
+    """Server-sent events: a single "ready" (or "failed") event once the image lands"""
+    pending = ServiceFactory.get_image_service().pending
+    _pending_status(token)
+    
+    async def event_stream():
+        while True:
+            # Comment lines keep proxies from closing an idle stream
+            status = await pending.wait(token, timeout=15)
+            if status is None or status["status"] == "failed":
+                yield "event: failed\ndata: {}\n\n"
+                return
+            if status["status"] == "ready":
+                yield f"event: ready\ndata: {json.dumps(_pending_status(token))}\n\n"
+                return
+            yield ": keepalive\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _resolve_pending_image(image_path: Optional[str], timeout: float = 30.0) -> Optional[str]:
+    """Wait briefly for a pending image so PDFs and emails get the real one, not the placeholder"""
+    if not image_path or not image_path.startswith(PENDING_PREFIX):
+        return image_path
+    status = await ServiceFactory.get_image_service().pending.wait(image_path[len(PENDING_PREFIX):], timeout)
+    if status is None or status["status"] != "ready":
+        logger.warning("Pending image %s is not ready, continuing without it", image_path)
+        return None
+    return status["image_path"]
+
+async def _run_generation_job(payload: dict, progress) -> dict:
+    return await ServiceFactory.get_generation_service().generate(
+        payload["recipient_name"],
+        payload["relationship"],
+        payload["occasion"],
+        payload["emotion"],
+        payload["memories"],
+        on_progress=progress
+    )
+
+@app.post("/jobs/generate-message")
+async def submit_generation_job(
+    recipient_name: str = Form("Friend"),
+    relationship: str = Form(...),
+    occasion: str = Form(...),
+    emotion: str = Form(...),
+    memories: Optional[str] = Form(None)
+):
+    try:
+        job = await ServiceFactory.get_job_queue().submit("generate_card", {
+            "recipient_name": recipient_name,
+            "relationship": relationship,
+            "occasion": occasion,
+            "emotion": emotion,
+            "memories": memories or ""
+        })
+    except JobQueueFull as e:
+        logger.warning("Generation job rejected: %s", e)
+        return JSONResponse(
+            {"status": "error", "message": "Server is busy, please retry shortly"},
+            status_code=503,
+            headers={"Retry-After": "5"}
+        )
+    
+    return JSONResponse({
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events"
+    }, status_code=202)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await ServiceFactory.get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JSONResponse(job.to_dict())
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    job_queue = ServiceFactory.get_job_queue()
+    if await job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def event_stream():
+        events = job_queue.subscribe(job_id).__aiter__()
+        next_event = asyncio.ensure_future(events.__anext__())
+        try:
+            while True:
+                # Comment lines keep proxies from closing an idle stream
+                done, _ = await asyncio.wait({next_event}, timeout=15)
+                if not done:
+                    yield ": keepalive\n\n"
+                    continue
+                try:
+                    event = next_event.result()
+                except StopAsyncIteration:
+                    return
+                yield f"id: {event['seq']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+                next_event = asyncio.ensure_future(events.__anext__())
+        finally:
+            next_event.cancel()
+            await asyncio.gather(next_event, return_exceptions=True)
+            await events.aclose()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/stream-message")
+async def stream_message(
+    relationship: str,
+    occasion: str,
+    emotion: str,
+    recipient_name: str = "Friend",
+    memories: Optional[str] = None
+):
+    llm_service = ServiceFactory.get_llm_service()
+    
+    async def event_stream():
+        async for event, data in llm_service.stream_message(
+            recipient_name, relationship, occasion, emotion, memories or ""
+        ):
+            if event == "message_delta":
+                yield f"event: delta\ndata: {json.dumps({'text': data})}\n\n"
+            elif event == "done":
+                yield f"event: done\ndata: {json.dumps(data)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/send-gift-card")
 async def send_gift_card(request: Request):
     try:
@@ -138,40 +406,18 @@ async def send_gift_card(request: Request):
         message = data.get('message')
         gift_card_link = data.get('gift_card_link')
         
-        # Create email
-        msg = MIMEMultipart()
-        msg['Subject'] = "You've received a gift card!"
-        msg['From'] = settings.EMAIL_FROM
-        msg['To'] = recipient_email
-
-        # Create HTML content
-        html = f"""
-        <html>
-            <body>
-                <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <h2>You've received a gift card!</h2>
-                    <div style="margin: 20px 0; padding: 20px; background: #f8f9fa; border-radius: 8px;">
-                        {message}
-                    </div>
-                    <div style="margin: 20px 0;">
-                        <a href="{gift_card_link}" 
-                           style="background: #007bff; color: white; padding: 12px 24px; 
-                                  text-decoration: none; border-radius: 6px;">
-                            Redeem Your Gift Card
-                        </a>
-                    </div>
-                </div>
-            </body>
-        </html>
-        """
+        image_path = await _resolve_pending_image(data.get('image_path'))
+        image_data = await asyncio.to_thread(_load_image_bytes, image_path)
+        if image_data:
+            try:
+                image_data = await ServiceFactory.get_image_service().rendition(image_data, "email")
+            except RenderQueueFull:
+                logger.warning("Render queue full, sending gift card without its image")
+                image_data = None
         
-        msg.attach(MIMEText(html, 'html'))
-
-        # Send email
-        with smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT) as server:
-            server.starttls()
-            server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
-            server.send_message(msg)
+        await ServiceFactory.get_mail_service().send_gift_card(
+            recipient_email, message, gift_card_link, image_data
+        )
 
         return JSONResponse({
             "status": "success",
@@ -179,12 +425,115 @@ async def send_gift_card(request: Request):
         })
         
     except Exception as e:
-        logger.error(f"Failed to send gift card: {str(e)}")
+        logger.error("Failed to send gift card: %s", e)
         return JSONResponse({
             "status": "error",
             "message": str(e)
         }, status_code=500)
 
+@app.post("/send-gift-cards")
+async def send_gift_cards(request: Request):
+    data = await request.json()
+    recipients = data.get('recipients')
+    if not isinstance(recipients, list) or not recipients:
+        return JSONResponse({
+            "status": "error",
+            "message": "recipients must be a non-empty list"
+        }, status_code=400)
+    if len(recipients) > settings.MAX_BULK_RECIPIENTS:
+        return JSONResponse({
+            "status": "error",
+            "message": f"At most {settings.MAX_BULK_RECIPIENTS} recipients per request"
+        }, status_code=400)
+    
+    # Top-level message and link apply to every recipient that doesn't override them
+    recipients = [
+        {
+            "email": recipient.get('email'),
+            "message": recipient.get('message', data.get('message')),
+            "gift_card_link": recipient.get('gift_card_link', data.get('gift_card_link'))
+        }
+        for recipient in (r if isinstance(r, dict) else {} for r in recipients)
+    ]
+    results = await ServiceFactory.get_mail_service().send_gift_cards(recipients)
+    
+    sent = sum(1 for result in results if result["status"] == "sent")
+    if sent == len(results):
+        status = "success"
+    elif sent:
+        status = "partial"
+    else:
+        status = "error"
+    return JSONResponse({
+        "status": status,
+        "sent": sent,
+        "failed": len(results) - sent,
+        "results": results
+    })
+
+@app.post("/batch/gift-cards")
+async def create_gift_card_batch(request: Request, gift_card_link: Optional[str] = None):
+    """Generate cards for a CSV or JSON recipient list, streaming back a ZIP of PDFs"""
+    try:
+        recipients = parse_recipients(
+            await request.body(), request.headers.get("content-type", ""), gift_card_link
+        )
+    except (ValueError, UnicodeDecodeError) as e:
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=400)
+    if len(recipients) > settings.MAX_BATCH_RECIPIENTS:
+        return JSONResponse({
+            "status": "error",
+            "message": f"At most {settings.MAX_BATCH_RECIPIENTS} recipients per batch"
+        }, status_code=400)
+    
+    batch_service = ServiceFactory.get_batch_service()
+    batch_id = await batch_service.create(recipients)
+    return await _stream_batch(batch_id)
+
+@app.get("/batch/{batch_id}")
+async def get_gift_card_batch(batch_id: str):
+    try:
+        return JSONResponse(await ServiceFactory.get_batch_service().progress(batch_id))
+    except BatchNotFound:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+@app.post("/batch/{batch_id}/resume")
+async def resume_gift_card_batch(batch_id: str):
+    """Stream the batch again, generating only the cards that are missing or failed"""
+    return await _stream_batch(batch_id)
+
+class _ClaimedStreamingResponse(StreamingResponse):
+    """Streaming response that runs ``on_close`` however it ends, even if the body was never iterated"""
+
+    def __init__(self, content, on_close: Callable[[], None], **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
+
+async def _stream_batch(batch_id: str) -> StreamingResponse:
+    batch_service = ServiceFactory.get_batch_service()
+    try:
+        progress = await batch_service.open(batch_id)
+    except BatchNotFound:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    except BatchInProgress:
+        raise HTTPException(status_code=409, detail="Batch is already being generated")
+    
+    return _ClaimedStreamingResponse(
+        batch_service.stream_zip(progress),
+        on_close=lambda: batch_service.release(progress),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f"attachment;filename=gift-cards-{batch_id}.zip",
+            "X-Batch-Id": batch_id
+        }
+    )
+
 @app.post("/generate-pdf")
 async def generate_pdf(request: Request):
     try:
@@ -193,82 +542,13 @@ async def generate_pdf(request: Request):
         image_path = data.get('image_path')
         gift_card_link = data.get('gift_card_link')
 
-        # Create PDF
-        pdf = FPDF()
-        pdf.add_page()
-        
-        # Use Arial instead of DejaVu (Arial is built-in)
-        pdf.set_font('Arial', 'B', 16)
-        
-        # Add title
-        pdf.cell(0, 10, 'Your Gift Card', 0, 1, 'C')
-        
-        # Add message
-        pdf.set_font('Arial', '', 12)
-        # Split message into lines to handle long text
-        lines = [line.strip() for line in message.split('\n') if line.strip()]
-        for line in lines:
-            pdf.multi_cell(0, 10, line)
-        
-        # Add some spacing
-        pdf.ln(10)
-        
-        try:
-            # Add gift card image
-            if image_path.startswith('data:image'):
-                # Handle base64 image
-                image_data = image_path.split(',')[1]
-                image = Image.open(BytesIO(base64.b64decode(image_data)))
-                temp_path = "temp_image.png"
-                image.save(temp_path)
-                pdf.image(temp_path, x=10, w=190)
-                os.remove(temp_path)
-            else:
-                # Handle regular image path
-                full_path = os.path.join(os.getcwd(), image_path.lstrip('/'))
-                if os.path.exists(full_path):
-                    pdf.image(full_path, x=10, w=190)
-                else:
-                    logger.error(f"Image file not found: {full_path}")
-        except Exception as img_error:
-            logger.error(f"Error adding image to PDF: {str(img_error)}")
-        
-        # Add QR code
-        try:
-            qr = qrcode.QRCode(version=1, box_size=10, border=5)
-            qr.add_data(gift_card_link)
-            qr.make(fit=True)
-            qr_img = qr.make_image(fill_color="black", back_color="white")
-            
-            qr_path = "temp_qr.png"
-            qr_img.save(qr_path)
-            
-            # Add QR code to PDF
-            pdf.add_page()
-            pdf.set_font('Arial', 'B', 14)
-            pdf.cell(0, 10, 'Scan to Redeem Your Gift Card', 0, 1, 'C')
-            pdf.image(qr_path, x=70, y=pdf.get_y()+10, w=70)
-            os.remove(qr_path)
-            
-            # Add gift card link text
-            pdf.set_y(pdf.get_y()+90)
-            pdf.set_font('Arial', '', 12)
-            pdf.cell(0, 10, 'Or click this link to redeem:', 0, 1, 'C')
-            pdf.set_text_color(0, 0, 255)
-            pdf.cell(0, 10, gift_card_link, 0, 1, 'C', link=gift_card_link)
-        except Exception as qr_error:
-            logger.error(f"Error adding QR code to PDF: {str(qr_error)}")
-        
-        # Save PDF to a temporary file first
-        temp_pdf_path = "temp_gift_card.pdf"
-        pdf.output(temp_pdf_path)
-        
-        # Read the PDF file and return it
-        with open(temp_pdf_path, 'rb') as pdf_file:
-            pdf_content = pdf_file.read()
-        
-        # Clean up the temporary PDF file
-        os.remove(temp_pdf_path)
+        image_path = await _resolve_pending_image(image_path)
+        image_data = await asyncio.to_thread(_load_image_bytes, image_path)
+        if image_data:
+            image_data = await ServiceFactory.get_image_service().rendition(image_data, "print")
+        pdf_content = await ServiceFactory.get_render_executor().submit(
+            render_gift_card_pdf, message, image_data, gift_card_link
+        )
         
         return Response(
             content=pdf_content,
@@ -278,8 +558,52 @@ async def generate_pdf(request: Request):
             }
         )
         
+    except RenderQueueFull as e:
+        logger.warning("PDF generation rejected: %s", e)
+        return JSONResponse(
+            {"status": "error", "message": "Server is busy, please retry shortly"},
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
-        logger.error(f"PDF generation error: {str(e)}")
+        logger.error("PDF generation error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+def _load_image_bytes(image_path: Optional[str]) -> Optional[bytes]:
+    """Resolve an image reference from the preview page to raw image bytes
+
+    Only data URLs, image store references and files under static/ are
+    accepted: the reference comes from the client and the bytes may be
+    emailed to an address of its choosing. Pending images are resolved to
+    store references by _resolve_pending_image beforehand.
+    """
+    if not image_path:
+        return None
+    try:
+        if image_path.startswith('data:image'):
+            # Handle base64 image
+            return base64.b64decode(image_path.split(',')[1])
+        if image_path.startswith('/images/'):
+            # Handle image from the image store
+            stored = ServiceFactory.get_image_store().get(image_path[len('/images/'):])
+            if stored:
+                return stored[0].read_bytes()
+            logger.error("Stored image not found: %s", image_path)
+            return None
+        if image_path.startswith('/static/'):
+            # Handle a bundled static image; the path comes from the client, so keep it inside static/
+            static_dir = (settings.BASE_DIR / "static").resolve()
+            full_path = (settings.BASE_DIR / image_path.lstrip('/')).resolve()
+            if not full_path.is_relative_to(static_dir):
+                logger.warning("Rejected image path outside static/: %s", image_path)
+                return None
+            if full_path.is_file():
+                return full_path.read_bytes()
+            logger.error("Image file not found: %s", full_path)
+            return None
+        logger.warning("Rejected unsupported image reference: %s", image_path[:100])
+    except Exception as img_error:
+        logger.error("Error loading image for PDF: %s", img_error)
+    return None
+
 # ... (rest of your routes) 
\ No newline at end of file
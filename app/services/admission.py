@@ -0,0 +1,251 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+from app.services import telemetry
+
+logger = logging.getLogger(__name__)
+
+class Overloaded(Exception):
+    """Raised instead of queueing when a backend's admission queue is too long"""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"{provider} is overloaded, request shed")
+        self.provider = provider
+        self.retry_after = retry_after
+
+class RetryableError(Exception):
+    """A failure worth retrying (timeouts, 429s, 5xx), optionally with the server's Retry-After"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header given as seconds or an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def parse_admission_limits(spec: str) -> Dict[str, Tuple[float, int]]:
+    """Parse 'provider=requests_per_second:max_concurrency,...'; a rate of 0 means unlimited"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        provider, _, values = item.partition("=")
+        rate, _, concurrency = values.partition(":")
+        limits[provider.strip()] = (float(rate), int(concurrency) if concurrency else 0)
+    return limits
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff, never shorter than the server's Retry-After"""
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after is not None:
+        # Spread the herd slightly past the time the server asked for
+        delay = retry_after + random.uniform(0, base)
+    return delay
+
+async def retry_with_backoff(
+    fn: Callable[[], Awaitable[Any]],
+    max_retries: int = 2,
+    base: float = 0.5,
+    cap: float = 10.0,
+    provider: str = "default"
+) -> Any:
+    """Call fn, retrying RetryableError with jittered exponential backoff"""
+    for attempt in range(max_retries + 1):
+        try:
+            return await fn()
+        except RetryableError as e:
+            if attempt == max_retries:
+                raise
+            delay = backoff_delay(attempt, base, cap, e.retry_after)
+            telemetry.PROVIDER_RETRIES.labels(provider).inc()
+            logger.warning("%s attempt %s failed (%s), retrying in %.2fs", provider, attempt + 1, e, delay)
+            await asyncio.sleep(delay)
+
+class TokenBucket:
+    """Requests-per-second limiter; callers reserve a token and sleep until it is theirs"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """Take a token, possibly borrowing from the future; return how long to wait for it"""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def refund(self):
+        self._tokens = min(self.burst, self._tokens + 1)
+
+class AdmissionController:
+    """Admission for one backend: rate limit, concurrency cap, FIFO queue and load shedding
+
+    Callers beyond ``max_concurrency`` wait in strict arrival order. A caller
+    is shed with Overloaded when its expected wait (queue position and rate
+    limit) exceeds ``max_queue_wait``, or when it has waited that long, so
+    a burst fails fast instead of piling up latency for everyone.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        rate: float = 0.0,
+        max_concurrency: int = 0,
+        max_queue_wait: float = 10.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 10.0
+    ):
+        self.provider = provider
+        self.max_concurrency = max_concurrency
+        self.max_queue_wait = max_queue_wait
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._bucket = TokenBucket(rate, burst=max(1, max_concurrency)) if rate > 0 else None
+        self._active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Smoothed time a caller holds a slot, used to estimate queue wait
+        self._hold_time = 0.0
+        self.admitted = 0
+        self.shed = 0
+
+    def _expected_wait(self) -> float:
+        if not self.max_concurrency or self._active < self.max_concurrency:
+            return 0.0
+        return (len(self._waiters) + 1) * self._hold_time / self.max_concurrency
+
+    def _reject(self) -> Overloaded:
+        self.shed += 1
+        telemetry.ADMISSION_SHED.labels(self.provider).inc()
+        return Overloaded(self.provider, retry_after=max(1.0, self._expected_wait()))
+
+    async def _acquire_slot(self):
+        if not self.max_concurrency or (self._active < self.max_concurrency and not self._waiters):
+            self._active += 1
+            return
+        if self._expected_wait() > self.max_queue_wait:
+            raise self._reject()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_queue_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self._release_slot()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._reject()
+            raise
+
+    def _release_slot(self):
+        # Hand the slot straight to the oldest waiter so nobody can barge in ahead of it
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one admitted request for the duration of the block"""
+        start = time.monotonic()
+        await self._acquire_slot()
+        try:
+            if self._bucket is not None:
+                delay = self._bucket.reserve()
+                if time.monotonic() - start + delay > self.max_queue_wait:
+                    self._bucket.refund()
+                    raise self._reject()
+                if delay:
+                    await asyncio.sleep(delay)
+            self.admitted += 1
+            admitted_at = time.monotonic()
+            telemetry.ADMISSION_WAIT.labels(self.provider).observe(admitted_at - start)
+            try:
+                yield
+            finally:
+                held = time.monotonic() - admitted_at
+                self._hold_time = held if not self._hold_time else 0.8 * self._hold_time + 0.2 * held
+        finally:
+            self._release_slot()
+
+    async def call(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn under admission, retrying RetryableError with backoff outside the slot"""
+        async def attempt():
+            async with self.slot():
+                return await fn()
+
+        return await retry_with_backoff(
+            attempt, self.max_retries, self.backoff_base, self.backoff_max, self.provider
+        )
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "queued": len(self._waiters),
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "hold_time": self._hold_time
+        }
+
+class AdmissionManager:
+    """One AdmissionController per backend, shared by everything calling it"""
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Tuple[float, int]]] = None,
+        max_queue_wait: float = 10.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 10.0
+    ):
+        self.limits = limits or {}
+        self.max_queue_wait = max_queue_wait
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._controllers: Dict[str, AdmissionController] = {}
+
+    def get(self, provider: str) -> AdmissionController:
+        controller = self._controllers.get(provider)
+        if controller is None:
+            rate, max_concurrency = self.limits.get(provider, (0.0, 0))
+            controller = AdmissionController(
+                provider,
+                rate=rate,
+                max_concurrency=max_concurrency,
+                max_queue_wait=self.max_queue_wait,
+                max_retries=self.max_retries,
+                backoff_base=self.backoff_base,
+                backoff_max=self.backoff_max
+            )
+            self._controllers[provider] = controller
+            logger.info("Admission for %s: %s req/s, concurrency %s", provider, rate or "unlimited", max_concurrency or "unlimited")
+        return controller
+
+    def stats(self) -> dict:
+        return {provider: controller.stats() for provider, controller in self._controllers.items()}
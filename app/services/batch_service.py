@@ -0,0 +1,340 @@
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from app.services.llm_service import LLMService
+from app.services.image_service import ImageService
+from app.services.render_executor import RenderExecutor, RenderQueueFull
+from app.services.card_renderer import render_gift_card_pdf
+
+logger = logging.getLogger(__name__)
+
+RECIPIENT_FIELDS = ("recipient_name", "relationship", "occasion", "emotion", "memories", "gift_card_link")
+RECIPIENT_DEFAULTS = {"relationship": "other", "occasion": "other", "emotion": "joy", "memories": ""}
+
+_BATCH_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+class BatchNotFound(Exception):
+    pass
+
+class BatchInProgress(Exception):
+    """Raised when a batch is resumed while it is still being generated"""
+    pass
+
+def parse_recipients(body: bytes, content_type: str, default_link: Optional[str] = None) -> List[Dict[str, str]]:
+    """Parse a CSV (with a header row) or JSON recipient list into normalized rows
+
+    JSON may be a list of recipients or an object with "recipients" and an
+    optional top-level "gift_card_link". Raises ValueError on bad input.
+    """
+    if "csv" in content_type:
+        rows = list(csv.DictReader(io.StringIO(body.decode("utf-8-sig"))))
+    else:
+        data = json.loads(body)
+        if isinstance(data, dict):
+            default_link = data.get("gift_card_link", default_link)
+            data = data.get("recipients")
+        rows = data
+    if not isinstance(rows, list) or not rows:
+        raise ValueError("recipients must be a non-empty list")
+
+    recipients = []
+    for number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            raise ValueError(f"Recipient {number} is not an object")
+        recipient = {field: str(row.get(field) or "").strip() for field in RECIPIENT_FIELDS}
+        for field, default in RECIPIENT_DEFAULTS.items():
+            recipient[field] = recipient[field] or default
+        recipient["gift_card_link"] = recipient["gift_card_link"] or default_link or ""
+        if not recipient["recipient_name"]:
+            raise ValueError(f"Recipient {number} is missing recipient_name")
+        if not recipient["gift_card_link"]:
+            raise ValueError(f"Recipient {number} is missing gift_card_link")
+        recipients.append(recipient)
+    return recipients
+
+class _ZipStream:
+    """Write-only file object that hands zip output to the response as it is produced
+
+    zipfile detects that it can't seek and writes data descriptors instead of
+    going back to patch local headers, so entries can be sent as they complete.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+class BatchProgress:
+    """Per-batch progress file plus the PDFs finished so far, kept on disk for resuming"""
+
+    def __init__(self, directory: Path, state: dict):
+        self.directory = directory
+        self.state = state
+        # Cards finish on worker threads; serialize updates so a stale write never wins
+        self._lock = threading.Lock()
+
+    @property
+    def id(self) -> str:
+        return self.state["id"]
+
+    @property
+    def items(self) -> List[dict]:
+        return self.state["items"]
+
+    @classmethod
+    def create(cls, root: Path, recipients: List[Dict[str, str]]) -> "BatchProgress":
+        batch_id = uuid.uuid4().hex
+        directory = root / batch_id
+        directory.mkdir(parents=True)
+        progress = cls(directory, {
+            "id": batch_id,
+            "created_at": time.time(),
+            "updated_at": time.time(),
+            "items": [
+                {"recipient": recipient, "file": cls._file_name(index, recipient), "status": "pending", "error": None}
+                for index, recipient in enumerate(recipients)
+            ]
+        })
+        progress.save()
+        return progress
+
+    @classmethod
+    def load(cls, root: Path, batch_id: str) -> "BatchProgress":
+        path = root / batch_id / "progress.json"
+        if not _BATCH_ID_RE.match(batch_id) or not path.exists():
+            raise BatchNotFound(batch_id)
+        return cls(path.parent, json.loads(path.read_text()))
+
+    @staticmethod
+    def _file_name(index: int, recipient: Dict[str, str]) -> str:
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", recipient["recipient_name"]).strip("-").lower() or "card"
+        return f"{index + 1:04d}-{slug[:40]}.pdf"
+
+    def save(self):
+        """Atomically rewrite the progress file"""
+        self.state["updated_at"] = time.time()
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.state, f)
+        os.replace(temp_path, self.directory / "progress.json")
+
+    def write_card(self, index: int, pdf: bytes):
+        item = self.items[index]
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf)
+        os.replace(temp_path, self.directory / item["file"])
+        with self._lock:
+            item["status"] = "completed"
+            item["error"] = None
+            self.save()
+
+    def read_card(self, index: int) -> bytes:
+        return (self.directory / self.items[index]["file"]).read_bytes()
+
+    def mark_failed(self, index: int, error: str):
+        with self._lock:
+            self.items[index]["status"] = "failed"
+            self.items[index]["error"] = error
+            self.save()
+
+    def summary(self) -> dict:
+        counts = {"pending": 0, "completed": 0, "failed": 0}
+        for item in self.items:
+            counts[item["status"]] += 1
+        return {
+            "id": self.id,
+            "total": len(self.items),
+            **counts,
+            "created_at": self.state["created_at"],
+            "updated_at": self.state["updated_at"],
+            "failures": [
+                {"index": index, "recipient_name": item["recipient"]["recipient_name"], "error": item["error"]}
+                for index, item in enumerate(self.items) if item["status"] == "failed"
+            ]
+        }
+
+class BatchService:
+    """Generate gift cards for many recipients and stream them back as a ZIP of PDFs
+
+    Each card goes through the LLM, image generator and PDF renderer under
+    semaphores shared by every batch, so a large batch can't monopolize a
+    backend. Finished PDFs are written to the batch directory as they
+    complete, which lets an interrupted or partially failed batch be resumed
+    without regenerating what's already done.
+    """
+
+    def __init__(
+        self,
+        llm_service: LLMService,
+        image_service: ImageService,
+        render_executor: RenderExecutor,
+        directory: Path,
+        concurrency: int = 8,
+        llm_concurrency: int = 4,
+        image_concurrency: int = 4,
+        render_concurrency: int = 2
+    ):
+        self.llm_service = llm_service
+        self.image_service = image_service
+        self.render_executor = render_executor
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.concurrency = concurrency
+        self._llm_slots = asyncio.Semaphore(llm_concurrency)
+        self._image_slots = asyncio.Semaphore(image_concurrency)
+        self._render_slots = asyncio.Semaphore(render_concurrency)
+        # Batch id -> the BatchProgress that claimed it
+        self._running: Dict[str, Optional[BatchProgress]] = {}
+
+    async def create(self, recipients: List[Dict[str, str]]) -> str:
+        """Persist a new batch and return its id"""
+        progress = await asyncio.to_thread(BatchProgress.create, self.directory, recipients)
+        logger.info("Created batch %s with %s recipients", progress.id, len(recipients))
+        return progress.id
+
+    async def progress(self, batch_id: str) -> dict:
+        progress = await asyncio.to_thread(BatchProgress.load, self.directory, batch_id)
+        summary = progress.summary()
+        summary["running"] = batch_id in self._running
+        return summary
+
+    async def open(self, batch_id: str) -> BatchProgress:
+        """Load a batch for streaming, claiming it so it isn't generated twice at once
+
+        stream_zip releases the claim when it ends; a response that is never
+        streamed must call `release` itself.
+        """
+        if batch_id in self._running:
+            raise BatchInProgress(batch_id)
+        # Claimed before the first await, so concurrent opens can't both get through
+        self._running[batch_id] = None
+        try:
+            progress = await asyncio.to_thread(BatchProgress.load, self.directory, batch_id)
+        except BaseException:
+            del self._running[batch_id]
+            raise
+        self._running[batch_id] = progress
+        return progress
+
+    def release(self, progress: BatchProgress):
+        """Give up the claim taken by `open`; releasing twice is harmless"""
+        if self._running.get(progress.id) is progress:
+            del self._running[progress.id]
+
+    async def stream_zip(self, progress: BatchProgress) -> AsyncIterator[bytes]:
+        """Yield ZIP bytes: cards already on disk first, then the rest as each one finishes
+
+        The batch must have been claimed with `open`. Only a bounded number of
+        finished PDFs is held in memory; if the client goes away, workers are
+        cancelled and the batch can be resumed later.
+        """
+        results: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency)
+        todo: asyncio.Queue = asyncio.Queue()
+        for index, item in enumerate(progress.items):
+            if item["status"] != "completed":
+                todo.put_nowait(index)
+        remaining = todo.qsize()
+
+        async def worker():
+            while True:
+                try:
+                    index = todo.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await results.put(await self._build_card(progress, index))
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.concurrency, remaining))]
+        sink = _ZipStream()
+        try:
+            with zipfile.ZipFile(sink, mode="w") as archive:
+                for index, item in enumerate(progress.items):
+                    if item["status"] == "completed":
+                        pdf = await asyncio.to_thread(progress.read_card, index)
+                        self._add_entry(archive, item["file"], pdf)
+                        yield sink.drain()
+
+                for _ in range(remaining):
+                    index, pdf = await results.get()
+                    if pdf is not None:
+                        self._add_entry(archive, progress.items[index]["file"], pdf)
+                        yield sink.drain()
+
+                # Always last, so the client knows what failed and how to resume
+                self._add_entry(archive, "manifest.json", json.dumps(progress.summary(), indent=2).encode())
+            yield sink.drain()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self.release(progress)
+
+    @staticmethod
+    def _add_entry(archive: zipfile.ZipFile, name: str, data: bytes):
+        info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        # PDFs are already compressed; storing avoids burning CPU for nothing
+        info.compress_type = zipfile.ZIP_STORED if name.endswith(".pdf") else zipfile.ZIP_DEFLATED
+        archive.writestr(info, data)
+
+    async def _build_card(self, progress: BatchProgress, index: int) -> Tuple[int, Optional[bytes]]:
+        """Generate one card, record the outcome and return its PDF (None on failure)"""
+        recipient = progress.items[index]["recipient"]
+        try:
+            async with self._llm_slots:
+                content = await self.llm_service.generate_message(
+                    recipient["recipient_name"],
+                    recipient["relationship"],
+                    recipient["occasion"],
+                    recipient["emotion"],
+                    recipient["memories"]
+                )
+            async with self._image_slots:
+                image_data = await self.image_service.generate_image_data(
+                    content["image_prompt"], recipient["occasion"]
+                )
+            async with self._render_slots:
+                pdf = await self._render_pdf(content["message"], image_data, recipient["gift_card_link"])
+            await asyncio.to_thread(progress.write_card, index, pdf)
+            return index, pdf
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Batch %s card %s failed: %s", progress.id, index + 1, e)
+            await asyncio.to_thread(progress.mark_failed, index, str(e))
+            return index, None
+
+    async def _render_pdf(self, message: str, image_data: bytes, gift_card_link: str) -> bytes:
+        image_data = await self._with_render_retry(self.image_service.rendition, image_data, "print")
+        return await self._with_render_retry(
+            self.render_executor.submit, render_gift_card_pdf, message, image_data, gift_card_link
+        )
+
+    @staticmethod
+    async def _with_render_retry(fn, *args):
+        """Batches aren't latency sensitive, so wait out a full render queue instead of failing"""
+        while True:
+            try:
+                return await fn(*args)
+            except RenderQueueFull as e:
+                await asyncio.sleep(e.retry_after)
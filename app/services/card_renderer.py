@@ -0,0 +1,104 @@
+import logging
+from io import BytesIO
+from typing import Optional
+from app.services import telemetry
+
+# fpdf, qrcode and PIL are imported inside the functions: they only run in the
+# render workers, so the web process doesn't pay for them at startup
+
+logger = logging.getLogger(__name__)
+
+def encode_png(image) -> bytes:
+    """Encode a PIL image as PNG bytes"""
+    buffered = BytesIO()
+    image.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+def render_default_image(occasion: Optional[str]) -> bytes:
+    """Render the default card image used when generation fails, as PNG bytes"""
+    from PIL import Image, ImageDraw
+    
+    # Create a new image with a solid background
+    img = Image.new('RGB', (512, 512), color='#f0f0f0')
+    draw = ImageDraw.Draw(img)
+    
+    # Add some text
+    text = f"Gift Card - {occasion.title() if occasion else 'Default'}"
+    
+    # Try to center the text (rough estimation)
+    w, h = draw.textsize(text) if hasattr(draw, 'textsize') else (200, 20)
+    draw.text(
+        ((512 - w) / 2, (512 - h) / 2),
+        text,
+        fill='#333333'
+    )
+    
+    return encode_png(img)
+
+def build_qr_png(data: str) -> bytes:
+    """Render a QR code for the data as PNG bytes"""
+    import qrcode
+    
+    with telemetry.stage("qr_build"):
+        qr = qrcode.QRCode(version=1, box_size=10, border=5)
+        qr.add_data(data)
+        qr.make(fit=True)
+        qr_img = qr.make_image(fill_color="black", back_color="white")
+        
+        buffered = BytesIO()
+        qr_img.save(buffered)
+        return buffered.getvalue()
+
+def render_gift_card_pdf(message: str, image_data: Optional[bytes], gift_card_link: str) -> bytes:
+    """Build the gift card PDF entirely in memory and return its bytes"""
+    with telemetry.stage("pdf_build"):
+        return _render_gift_card_pdf(message, image_data, gift_card_link)
+
+def _render_gift_card_pdf(message: str, image_data: Optional[bytes], gift_card_link: str) -> bytes:
+    from fpdf import FPDF
+    from fpdf.enums import XPos, YPos
+    
+    pdf = FPDF()
+    pdf.add_page()
+    
+    pdf.set_font('Helvetica', 'B', 16)
+    
+    # Add title
+    pdf.cell(0, 10, 'Your Gift Card', align='C', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    
+    # Add message
+    pdf.set_font('Helvetica', '', 12)
+    # Split message into lines to handle long text
+    lines = [line.strip() for line in message.split('\n') if line.strip()]
+    for line in lines:
+        pdf.multi_cell(0, 10, line, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    
+    # Add some spacing
+    pdf.ln(10)
+    
+    if image_data:
+        try:
+            # Add gift card image
+            pdf.image(BytesIO(image_data), x=10, w=190)
+        except Exception as img_error:
+            logger.error("Error adding image to PDF: %s", img_error)
+    
+    # Add QR code
+    try:
+        qr_png = build_qr_png(gift_card_link)
+        
+        pdf.add_page()
+        pdf.set_font('Helvetica', 'B', 14)
+        pdf.cell(0, 10, 'Scan to Redeem Your Gift Card', align='C', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        pdf.image(BytesIO(qr_png), x=70, y=pdf.get_y()+10, w=70)
+        
+        # Add gift card link text
+        pdf.set_y(pdf.get_y()+90)
+        pdf.set_font('Helvetica', '', 12)
+        pdf.cell(0, 10, 'Or click this link to redeem:', align='C', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        pdf.set_text_color(0, 0, 255)
+        pdf.cell(0, 10, gift_card_link, align='C', link=gift_card_link, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    except Exception as qr_error:
+        logger.error("Error adding QR code to PDF: %s", qr_error)
+    
+    return bytes(pdf.output())
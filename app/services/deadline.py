@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Monotonic time by which the current request should have answered
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when the request's latency budget runs out"""
+    pass
+
+def parse_budgets(spec: str) -> Dict[str, float]:
+    """Parse '/path=seconds,...' into a dict"""
+    budgets = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        path, _, seconds = item.partition("=")
+        budgets[path.strip()] = float(seconds)
+    return budgets
+
+@contextmanager
+def budget(seconds: Optional[float]):
+    """Run the block under a latency budget; nested budgets can only tighten the deadline"""
+    if seconds is None:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current budget, or None when there is no budget"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+async def wait(aw: Awaitable[Any]) -> Any:
+    """Await within the remaining budget, raising DeadlineExceeded when it runs out"""
+    left = remaining()
+    if left is None:
+        return await aw
+    try:
+        return await asyncio.wait_for(aw, left)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded("Request budget exceeded") from None
+
+async def iterate(source: AsyncIterable) -> AsyncIterator:
+    """Yield from the source until it ends or the budget runs out (DeadlineExceeded)
+
+    Each item is awaited separately, so the budget never spans the caller's
+    own work between items.
+    """
+    iterator = source.__aiter__()
+    try:
+        while True:
+            try:
+                item = await wait(iterator.__anext__())
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+class DeadlineMiddleware:
+    """Give requests to the configured paths a latency budget"""
+
+    def __init__(self, app, budgets: Dict[str, float]):
+        self.app = app
+        self.budgets = budgets
+
+    async def __call__(self, scope, receive, send):
+        seconds = self.budgets.get(scope["path"]) if scope["type"] == "http" else None
+        with budget(seconds):
+            await self.app(scope, receive, send)
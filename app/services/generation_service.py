@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional
+from app.config import settings
+from app.services.llm_service import LLMService
+from app.services.image_service import ImageService
+
+logger = logging.getLogger(__name__)
+
+# Called with ("message_ready", {...}) and ("image_ready", {...}) as the stages finish
+ProgressCallback = Callable[[str, dict], Awaitable[None]]
+
+class GenerationService:
+    """Produce the message and card image for a gift card
+
+    Modes:
+    - sequential: generate the message, then the image from its prompt
+    - pipelined: stream the message and start the image as soon as the
+      image prompt is complete, overlapping it with the rest of the message
+    - speculative: start an image from the occasion/emotion right away and
+      replace it if the LLM's prompt arrives before that image is done
+    """
+
+    MODES = ("sequential", "pipelined", "speculative")
+
+    def __init__(self, llm_service: LLMService, image_service: ImageService, mode: Optional[str] = None):
+        self.llm_service = llm_service
+        self.image_service = image_service
+        self.mode = (mode or settings.GENERATION_MODE).lower()
+        if self.mode not in self.MODES:
+            raise ValueError(f"Unknown generation mode: {self.mode}. Expected one of {self.MODES}")
+
+    async def generate(
+        self,
+        recipient_name: str,
+        relationship: str,
+        occasion: str,
+        emotion: str,
+        memories: str,
+        on_progress: Optional[ProgressCallback] = None
+    ) -> Dict[str, str]:
+        """Generate the card and return its message, image prompt and image path"""
+        start = time.perf_counter()
+        args = (recipient_name, relationship, occasion, emotion, memories, on_progress or _no_progress)
+        if self.mode == "pipelined":
+            result = await self._generate_pipelined(*args)
+        elif self.mode == "speculative":
+            result = await self._generate_speculative(*args)
+        else:
+            result = await self._generate_sequential(*args)
+        await (on_progress or _no_progress)("image_ready", {"image_path": result["image_path"]})
+        logger.info("Generated card in %.2fs (%s mode)", time.perf_counter() - start, self.mode)
+        return result
+
+    async def _generate_sequential(self, recipient_name, relationship, occasion, emotion, memories, on_progress) -> Dict[str, str]:
+        content = await self.llm_service.generate_message(
+            recipient_name, relationship, occasion, emotion, memories
+        )
+        await on_progress("message_ready", content)
+        image_path = await self.image_service.generate_image(content["image_prompt"], occasion=occasion)
+        return {**content, "image_path": image_path}
+
+    async def _generate_pipelined(self, recipient_name, relationship, occasion, emotion, memories, on_progress) -> Dict[str, str]:
+        image_task = None
+
+        def start_image(image_prompt: str):
+            nonlocal image_task
+            image_task = asyncio.create_task(
+                self.image_service.generate_image(image_prompt, occasion=occasion)
+            )
+
+        try:
+            content = await self.llm_service.generate_message_pipelined(
+                recipient_name, relationship, occasion, emotion, memories,
+                on_image_prompt=start_image
+            )
+            await on_progress("message_ready", content)
+            image_path = await image_task
+        except BaseException:
+            if image_task is not None:
+                image_task.cancel()
+            raise
+        return {**content, "image_path": image_path}
+
+    async def _generate_speculative(self, recipient_name, relationship, occasion, emotion, memories, on_progress) -> Dict[str, str]:
+        speculative_prompt = LLMService._get_fallback_message(
+            recipient_name, occasion, emotion, ""
+        )["image_prompt"]
+        image_task = asyncio.create_task(
+            self.image_service.generate_image(speculative_prompt, occasion=occasion)
+        )
+
+        def upgrade_image(image_prompt: str):
+            nonlocal image_task
+            if image_task.done():
+                logger.info("Speculative image finished before the LLM prompt, keeping it")
+                return
+            image_task.cancel()
+            image_task = asyncio.create_task(
+                self.image_service.generate_image(image_prompt, occasion=occasion)
+            )
+
+        try:
+            content = await self.llm_service.generate_message_pipelined(
+                recipient_name, relationship, occasion, emotion, memories,
+                on_image_prompt=upgrade_image
+            )
+            await on_progress("message_ready", content)
+            image_path = await image_task
+        except BaseException:
+            image_task.cancel()
+            raise
+        return {**content, "image_path": image_path}
+
+async def _no_progress(event: str, data: dict):
+    pass
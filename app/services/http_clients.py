@@ -0,0 +1,65 @@
+import logging
+from typing import Dict, Optional, Tuple
+import httpx
+
+logger = logging.getLogger(__name__)
+
+def http2_available() -> bool:
+    """Return True when the optional h2 package needed for HTTP/2 is installed"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def parse_limits(spec: str) -> Dict[str, Tuple[int, int]]:
+    """Parse 'provider=max_connections:max_keepalive,...' into a dict"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        provider, _, values = item.partition("=")
+        max_connections, _, max_keepalive = values.partition(":")
+        limits[provider.strip()] = (int(max_connections), int(max_keepalive or max_connections))
+    return limits
+
+class HTTPClientManager:
+    """Long-lived httpx clients shared by everything talking to the same provider
+
+    One client per provider keeps its connection pool (and TLS sessions) alive
+    between requests, with per-provider connection limits.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Tuple[int, int]]] = None,
+        default_limits: Tuple[int, int] = (10, 5),
+        timeout: float = 60.0,
+        http2: Optional[bool] = None
+    ):
+        self.limits = limits or {}
+        self.default_limits = default_limits
+        self.timeout = timeout
+        self.http2 = http2_available() if http2 is None else http2
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def get(self, provider: str) -> httpx.AsyncClient:
+        """Return the shared client for the provider, creating it on first use"""
+        client = self._clients.get(provider)
+        if client is None or client.is_closed:
+            max_connections, max_keepalive = self.limits.get(provider, self.default_limits)
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive
+                ),
+                timeout=httpx.Timeout(timeout=self.timeout, connect=30.0),
+                http2=self.http2
+            )
+            self._clients[provider] = client
+            logger.info("Created HTTP client for %s (limits %s/%s, http2=%s)", provider, max_connections, max_keepalive, self.http2)
+        return client
+
+    async def aclose(self):
+        """Close every client and its connection pool"""
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients = {}
@@ -1,10 +1,56 @@
 from abc import ABC, abstractmethod
 from pathlib import Path
+from typing import Optional, Tuple
+import httpx
+from app.services.http_clients import HTTPClientManager
+from app.services.admission import AdmissionController, AdmissionManager
 
 class ImageGenerator(ABC):
     """Abstract base class for image generators"""
     
+    # Key for the shared HTTP client and its connection limits
+    provider_name = "default"
+    
+    # Together with the prompt and occasion, these determine the generated image
+    model_id: Optional[str] = None
+    image_size = "512x512"
+    
+    # True when the image ignores the prompt, so pre-generated images can be served
+    prompt_independent = False
+    
+    # Set at application startup; created on demand for standalone use
+    client_manager: Optional[HTTPClientManager] = None
+    admission_manager: Optional[AdmissionManager] = None
+    
+    @classmethod
+    def use_client_manager(cls, manager: HTTPClientManager):
+        """Share the given client manager between all generators"""
+        ImageGenerator.client_manager = manager
+    
+    @classmethod
+    def use_admission_manager(cls, manager: AdmissionManager):
+        """Share the given rate and concurrency limits between all generators"""
+        ImageGenerator.admission_manager = manager
+    
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """Long-lived HTTP client shared by every generator of this provider"""
+        if ImageGenerator.client_manager is None:
+            ImageGenerator.client_manager = HTTPClientManager()
+        return ImageGenerator.client_manager.get(self.provider_name)
+    
+    @property
+    def admission(self) -> AdmissionController:
+        """Admission control for calls to this provider"""
+        if ImageGenerator.admission_manager is None:
+            ImageGenerator.admission_manager = AdmissionManager()
+        return ImageGenerator.admission_manager.get(self.provider_name)
+    
+    def cache_key_parts(self) -> Tuple:
+        """Generator settings that distinguish its images in the image cache"""
+        return (type(self).__name__, self.model_id, self.image_size)
+    
     @abstractmethod
     async def generate(self, prompt: str, occasion: str = None) -> bytes:
         """Generate an image and return the image data"""
-        pass
\ No newline at end of file
+        pass
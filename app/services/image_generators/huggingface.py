@@ -1,50 +1,214 @@
+import asyncio
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from typing import List, Optional
 import torch
 from pathlib import Path
 from diffusers import StableDiffusionPipeline
 from .base import ImageGenerator
 from io import BytesIO
+from app.config import settings
+from app.services.structured_logging import Payload
 
 logger = logging.getLogger(__name__)
 
-class HuggingFaceGenerator(ImageGenerator):
-    def __init__(self, model_id: str, images_dir: Path):
-        self.model_id = model_id
-        
-        # Initialize the pipeline
-        logger.info(f"Loading model: {model_id}")
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.pipe = StableDiffusionPipeline.from_pretrained(
+NEGATIVE_PROMPT = "blurry, low quality, distorted, deformed"
+
+# Quality tiers trade detail for latency; "draft" suits quick previews
+QUALITY_TIERS = {
+    "draft": {"num_inference_steps": settings.HF_DRAFT_STEPS, "size": settings.HF_DRAFT_SIZE},
+    "final": {"num_inference_steps": settings.HF_FINAL_STEPS, "size": settings.HF_FINAL_SIZE},
+}
+
+# Scheduler name -> diffusers class; "default" keeps the model's own scheduler
+SCHEDULERS = {
+    "dpm": "DPMSolverMultistepScheduler",
+    "euler": "EulerDiscreteScheduler",
+    "euler_a": "EulerAncestralDiscreteScheduler",
+    "lcm": "LCMScheduler",
+}
+
+def load_pipeline(model_id: str):
+    """Load the diffusion pipeline with the configured backend, scheduler and CPU optimizations"""
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    if device == "cpu" and settings.HF_NUM_THREADS > 0:
+        torch.set_num_threads(settings.HF_NUM_THREADS)
+
+    pipe = None
+    if settings.HF_BACKEND == "onnx":
+        try:
+            from optimum.onnxruntime import ORTStableDiffusionPipeline
+            pipe = ORTStableDiffusionPipeline.from_pretrained(model_id, export=True)
+            device = "onnx"
+        except ImportError:
+            logger.warning("optimum[onnxruntime] is not installed, falling back to the torch backend")
+
+    if pipe is None:
+        pipe = StableDiffusionPipeline.from_pretrained(
             model_id,
-            torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
+            torch_dtype=torch.float16 if device == "cuda" else torch.float32,
             safety_checker=None
         )
-        self.pipe = self.pipe.to(self.device)
-        
-        if self.device == "cuda":
-            self.pipe.enable_attention_slicing()
-            
-        logger.info(f"Model loaded on {self.device}")
+        pipe = pipe.to(device)
+
+        if device == "cuda":
+            pipe.enable_attention_slicing()
+        else:
+            if settings.HF_CHANNELS_LAST:
+                pipe.unet.to(memory_format=torch.channels_last)
+                pipe.vae.to(memory_format=torch.channels_last)
+            if settings.HF_TORCH_COMPILE and hasattr(torch, "compile"):
+                pipe.unet = torch.compile(pipe.unet)
+
+    scheduler_name = SCHEDULERS.get(settings.HF_SCHEDULER)
+    if scheduler_name:
+        import diffusers
+        pipe.scheduler = getattr(diffusers, scheduler_name).from_config(pipe.scheduler.config)
+
+    pipe.set_progress_bar_config(disable=True)
+    logger.info("Model loaded on %s (scheduler=%s)", device, settings.HF_SCHEDULER)
+    return pipe, device
+
+class DiffusionBatcher:
+    """Micro-batches concurrent prompts into single pipeline calls
+
+    Inference runs on a dedicated thread so the event loop stays responsive.
+    Prompts arriving within ``batch_window`` seconds of each other (up to
+    ``max_batch_size``) share one call; prompts of different tiers never mix.
+    """
+
+    def __init__(self, pipe, max_batch_size: int = 4, batch_window: float = 0.05):
+        self.pipe = pipe
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="diffusion")
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
 
-    async def generate(self, prompt: str, occasion: str = None) -> bytes:
+    async def submit(self, prompt: str, tier: str) -> bytes:
+        """Queue a prompt and wait for its PNG bytes"""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((tier, prompt, future))
+        return await future
+
+    async def _collect_batch(self, batch: list):
+        loop = asyncio.get_running_loop()
+        batch.append(await self._queue.get())
+        deadline = loop.time() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        batch = []
         try:
-            logger.info(f"Generating image with prompt: {prompt}")
-            
-            # Generate the image
-            image = self.pipe(
-                prompt=prompt,
-                negative_prompt="blurry, low quality, distorted, deformed",
-                num_inference_steps=30,
-                guidance_scale=7.5,
-                height=512,
-                width=512
-            ).images[0]
-            
-            # Convert PIL Image to bytes
+            while True:
+                batch = []
+                await self._collect_batch(batch)
+                batch.sort(key=lambda item: item[0])
+                for tier, items in groupby(batch, key=lambda item: item[0]):
+                    # Skip prompts whose callers already gave up
+                    items = [item for item in items if not item[2].done()]
+                    if not items:
+                        continue
+                    try:
+                        images = await loop.run_in_executor(
+                            self._executor, self._infer, [prompt for _, prompt, _ in items], tier
+                        )
+                    except Exception as e:
+                        for _, _, future in items:
+                            if not future.done():
+                                future.set_exception(e)
+                        continue
+                    for (_, _, future), image in zip(items, images):
+                        if not future.done():
+                            future.set_result(image)
+        except asyncio.CancelledError:
+            # Closing: don't leave the callers of the current batch waiting
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("Diffusion batcher closed"))
+            raise
+
+    def _infer(self, prompts: List[str], tier: str) -> List[bytes]:
+        """Run one pipeline call for the prompts and encode the results as PNG"""
+        params = QUALITY_TIERS[tier]
+        start = time.perf_counter()
+        images = self.pipe(
+            prompt=prompts,
+            negative_prompt=[NEGATIVE_PROMPT] * len(prompts),
+            num_inference_steps=params["num_inference_steps"],
+            guidance_scale=7.5,
+            height=params["size"],
+            width=params["size"]
+        ).images
+        logger.info("Generated %s %s image(s) in %.1fs", len(prompts), tier, time.perf_counter() - start)
+
+        results = []
+        for image in images:
             buffered = BytesIO()
             image.save(buffered, format="PNG")
-            return buffered.getvalue()
+            results.append(buffered.getvalue())
+        return results
+
+    def shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def aclose(self):
+        """Stop batching, fail queued prompts and join the inference thread"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        while self._queue is not None and not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Diffusion batcher closed"))
+        # Waits for a pipeline call already running on the thread to finish
+        await asyncio.to_thread(self._executor.shutdown, wait=True, cancel_futures=True)
+
+class HuggingFaceGenerator(ImageGenerator):
+    provider_name = "huggingface"
+
+    def __init__(self, model_id: str, images_dir: Path, tier: Optional[str] = None):
+        self.model_id = model_id
+        self.tier = tier or settings.HF_QUALITY_TIER
+        if self.tier not in QUALITY_TIERS:
+            raise ValueError(f"Unknown quality tier: {self.tier}. Expected one of {sorted(QUALITY_TIERS)}")
+        
+        # Initialize the pipeline
+        logger.info("Loading model: %s", model_id)
+        self.pipe, self.device = load_pipeline(model_id)
+        self.batcher = DiffusionBatcher(
+            self.pipe,
+            max_batch_size=settings.HF_MAX_BATCH_SIZE,
+            batch_window=settings.HF_BATCH_WINDOW_MS / 1000
+        )
+
+    def cache_key_parts(self) -> tuple:
+        params = QUALITY_TIERS[self.tier]
+        return (type(self).__name__, self.model_id, params["size"], params["num_inference_steps"], settings.HF_SCHEDULER)
+
+    async def generate(self, prompt: str, occasion: str = None, tier: Optional[str] = None) -> bytes:
+        try:
+            logger.debug("Generating image with prompt: %s", Payload(prompt))
+            return await self.batcher.submit(prompt, tier or self.tier)
 
         except Exception as e:
-            logger.error(f"HuggingFace generation error: {str(e)}")
-            raise
\ No newline at end of file
+            logger.error("HuggingFace generation error: %s", e)
+            raise
+
+    async def aclose(self):
+        await self.batcher.aclose()
@@ -0,0 +1,118 @@
+import asyncio
+import itertools
+import logging
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from .base import ImageGenerator
+from app.config import settings
+from app.services.model_server import encode_frame, read_frame
+from app.services.structured_logging import Payload
+
+logger = logging.getLogger(__name__)
+
+class ModelServerGenerator(ImageGenerator):
+    """Generate images through the shared model server process over its Unix socket
+
+    One connection per web worker is multiplexed: requests carry an id and
+    replies are matched to waiting callers as they arrive, in any order.
+    """
+    provider_name = "model_server"
+
+    def __init__(self, socket_path: Path, model_id: Optional[str] = None, tier: Optional[str] = None, timeout: float = 300.0):
+        self.socket_path = Path(socket_path)
+        self.model_id = model_id or settings.HF_MODEL_ID
+        self.tier = tier or settings.HF_QUALITY_TIER
+        if self.tier not in ("draft", "final"):
+            raise ValueError(f"Unknown quality tier: {self.tier}. Expected one of ['draft', 'final']")
+        self.timeout = timeout
+        self._ids = itertools.count()
+        # Requests waiting on the current connection, by id
+        self._waiters: Dict[int, asyncio.Future] = {}
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connect_lock = asyncio.Lock()
+
+    def cache_key_parts(self) -> tuple:
+        # Same key as an in-process HuggingFaceGenerator, so cached images carry over
+        if self.tier == "draft":
+            size, steps = settings.HF_DRAFT_SIZE, settings.HF_DRAFT_STEPS
+        else:
+            size, steps = settings.HF_FINAL_SIZE, settings.HF_FINAL_STEPS
+        return ("HuggingFaceGenerator", self.model_id, size, steps, settings.HF_SCHEDULER)
+
+    async def _connect(self) -> Tuple[asyncio.StreamWriter, Dict[int, asyncio.Future]]:
+        async with self._connect_lock:
+            if self._writer is None or self._writer.is_closing():
+                reader, writer = await asyncio.open_unix_connection(str(self.socket_path))
+                self._writer, self._waiters = writer, {}
+                self._reader_task = asyncio.create_task(self._read_replies(reader, writer, self._waiters))
+                logger.info("Connected to model server at %s", self.socket_path)
+            return self._writer, self._waiters
+
+    async def _read_replies(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        waiters: Dict[int, asyncio.Future]
+    ):
+        error: Exception = ConnectionError("Model server closed the connection")
+        try:
+            while True:
+                header, payload = await read_frame(reader)
+                future = waiters.pop(header.get("id"), None)
+                if future is None or future.done():
+                    continue
+                if header.get("ok"):
+                    future.set_result((header, payload))
+                else:
+                    future.set_exception(Exception(f"Model server error: {header.get('error')}"))
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            error = ConnectionError(f"Lost connection to model server: {str(e)}")
+        except Exception as e:
+            # An unreadable reply leaves the stream out of step; reconnect on the next request
+            logger.exception("Model server reply reader failed: %s", e)
+            error = ConnectionError(f"Model server reply reader failed: {str(e)}")
+        finally:
+            writer.close()
+            # A newer connection may already have replaced this one
+            if self._writer is writer:
+                self._writer = None
+        # Fail the requests sent on this connection; the next request reconnects
+        for future in waiters.values():
+            if not future.done():
+                future.set_exception(error)
+        waiters.clear()
+
+    async def _request(self, header: dict):
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        writer, waiters = await self._connect()
+        waiters[request_id] = future
+        try:
+            writer.write(encode_frame({"id": request_id, **header}))
+            await writer.drain()
+            return await asyncio.wait_for(future, self.timeout)
+        finally:
+            waiters.pop(request_id, None)
+
+    async def generate(self, prompt: str, occasion: str = None) -> bytes:
+        try:
+            logger.debug("Generating image via model server with prompt: %s", Payload(prompt))
+            _, image = await self._request({"op": "generate", "prompt": prompt, "tier": self.tier})
+            return image
+
+        except Exception as e:
+            logger.error("Model server generation error: %s", e)
+            raise
+
+    async def stats(self) -> dict:
+        """Queue and throughput counters reported by the model server"""
+        header, _ = await self._request({"op": "stats"})
+        return header["stats"]
+
+    async def aclose(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
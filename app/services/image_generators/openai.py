@@ -3,20 +3,24 @@ import httpx
 from pathlib import Path
 import os
 from .base import ImageGenerator
-import json
-import asyncio
+from app.config import settings
+from app.services.admission import RetryableError, parse_retry_after, retry_with_backoff
+from app.services.structured_logging import Payload
 
 logger = logging.getLogger(__name__)
 
 class OpenAIGenerator(ImageGenerator):
+    provider_name = "openai"
+    model_id = "dall-e-3"
+    image_size = "1024x1024"
+
     def __init__(self, api_key: str, images_dir: Path):
         self.api_key = api_key
-        self.api_url = "https://api.openai.com/v1/images/generations"
+        self.api_url = settings.OPENAI_API_URL
 
     async def generate(self, prompt: str, occasion: str = None) -> bytes:
         try:
-            logger.info(f"Generating image with prompt: {prompt}")
-            logger.info(f"Using API key: {self.api_key[:6]}...")
+            logger.debug("Generating image with prompt: %s", Payload(prompt))
             
             headers = {
                 "Authorization": f"Bearer {self.api_key}",
@@ -26,60 +30,65 @@ class OpenAIGenerator(ImageGenerator):
             data = {
                 "prompt": prompt,
                 "n": 1,
-                "size": "1024x1024",
+                "size": self.image_size,
                 "response_format": "url",
-                "model": "dall-e-3"  # Changed to DALL-E 2 which is faster
+                "model": self.model_id
             }
             
-            logger.info(f"Sending request to OpenAI with data: {json.dumps(data, indent=2)}")
-            
-            # Increased timeout and added limits
-            limits = httpx.Limits(max_keepalive_connections=5, max_connections=10)
+            # Connections come from the shared, long-lived client pool
             timeout = httpx.Timeout(timeout=60.0, connect=30.0)
+            client = self.http_client
             
-            async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
-                # Add retry logic
-                for attempt in range(3):  # Try up to 3 times
-                    try:
-                        response = await client.post(
-                            self.api_url,
-                            headers=headers,
-                            json=data
-                        )
-                        break  # If successful, break the retry loop
-                    except (httpx.TimeoutException, httpx.NetworkError) as e:
-                        if attempt == 2:  # Last attempt
-                            raise  # Re-raise the last error
-                        logger.warning(f"Attempt {attempt + 1} failed, retrying...")
-                        await asyncio.sleep(1)  # Wait before retrying
-                
-                logger.info(f"OpenAI Response Status: {response.status_code}")
-                logger.info(f"OpenAI Response Headers: {dict(response.headers)}")
-                logger.info(f"OpenAI Response Body: {response.text}")
-                
-                if response.status_code != 200:
-                    error_detail = response.json() if response.text else "No error details"
-                    raise Exception(f"OpenAI API error: Status {response.status_code}, Details: {error_detail}")
-
-                response_data = response.json()
-                image_url = response_data["data"][0]["url"]
-                logger.info(f"Got image URL: {image_url}")
-                
-                # Download the image with retry logic
-                for attempt in range(3):
-                    try:
-                        image_response = await client.get(image_url)
-                        if image_response.status_code == 200:
-                            return image_response.content
-                        else:
-                            raise Exception(f"Failed to download image: Status {image_response.status_code}")
-                    except (httpx.TimeoutException, httpx.NetworkError) as e:
-                        if attempt == 2:
-                            raise
-                        logger.warning(f"Download attempt {attempt + 1} failed, retrying...")
-                        await asyncio.sleep(1)
+            # Rate limited, queued and retried with backoff by the provider's admission controller
+            response = await self.admission.call(
+                lambda: self._post_generation(client, headers, data, timeout)
+            )
+            
+            response_data = response.json()
+            image_url = response_data["data"][0]["url"]
+            logger.debug("Got image URL: %s", Payload(image_url, limit=200))
+            
+            # The image comes from a CDN, so downloading it doesn't count against the API limits
+            return await retry_with_backoff(
+                lambda: self._download(client, image_url, timeout),
+                max_retries=self.admission.max_retries,
+                base=self.admission.backoff_base,
+                cap=self.admission.backoff_max,
+                provider=self.provider_name
+            )
 
         except Exception as e:
-            logger.error(f"OpenAI generation error: {str(e)}")
-            logger.exception("Full traceback:")
-            raise
\ No newline at end of file
+            logger.exception("OpenAI generation error: %s", e)
+            raise
+
+    async def _post_generation(self, client: httpx.AsyncClient, headers: dict, data: dict, timeout: httpx.Timeout) -> httpx.Response:
+        try:
+            response = await client.post(
+                self.api_url,
+                headers=headers,
+                json=data,
+                timeout=timeout
+            )
+        except (httpx.TimeoutException, httpx.NetworkError) as e:
+            raise RetryableError(f"OpenAI request failed: {str(e)}") from e
+        if response.status_code == 429 or response.status_code >= 500:
+            raise RetryableError(
+                f"OpenAI API error: Status {response.status_code}",
+                retry_after=parse_retry_after(response.headers.get("retry-after"))
+            )
+        if response.status_code != 200:
+            error_detail = response.json() if response.text else "No error details"
+            raise Exception(f"OpenAI API error: Status {response.status_code}, Details: {error_detail}")
+        return response
+
+    @staticmethod
+    async def _download(client: httpx.AsyncClient, image_url: str, timeout: httpx.Timeout) -> bytes:
+        try:
+            image_response = await client.get(image_url, timeout=timeout)
+        except (httpx.TimeoutException, httpx.NetworkError) as e:
+            raise RetryableError(f"Image download failed: {str(e)}") from e
+        if image_response.status_code >= 500:
+            raise RetryableError(f"Failed to download image: Status {image_response.status_code}")
+        if image_response.status_code != 200:
+            raise Exception(f"Failed to download image: Status {image_response.status_code}")
+        return image_response.content
\ No newline at end of file
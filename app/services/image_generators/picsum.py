@@ -2,32 +2,42 @@ import logging
 import httpx
 from pathlib import Path
 from .base import ImageGenerator
+from app.config import settings
+from app.services.admission import RetryableError, parse_retry_after
 
 logger = logging.getLogger(__name__)
 
 class PicsumGenerator(ImageGenerator):
+    provider_name = "picsum"
+    prompt_independent = True
+
     def __init__(self, api_key: str = None, images_dir: Path = None):
-        self.base_url = "https://picsum.photos"
+        self.base_url = settings.PICSUM_BASE_URL
         
     async def generate(self, prompt: str, occasion: str = None) -> bytes:
         try:
-            logger.info(f"Generating image with Lorem Picsum")
-            
             # Use simple URL format
             image_url = f"{self.base_url}/512"
-            logger.info(f"Picsum URL: {image_url}")
+            logger.debug("Downloading Picsum image from %s", image_url)
             
-            # Download the image
-            async with httpx.AsyncClient() as client:
-                # Follow redirects automatically
-                response = await client.get(image_url, follow_redirects=True)
-                
-                if response.status_code != 200:
-                    raise Exception(f"Picsum API error: Status {response.status_code}")
-                
-                return response.content
+            # Download the image, following redirects automatically
+            response = await self.admission.call(lambda: self._download(image_url))
+            return response.content
 
         except Exception as e:
-            logger.error(f"Picsum generation error: {str(e)}")
-            logger.exception("Full traceback:")
-            raise 
\ No newline at end of file
+            logger.exception("Picsum generation error: %s", e)
+            raise
+
+    async def _download(self, image_url: str) -> httpx.Response:
+        try:
+            response = await self.http_client.get(image_url, follow_redirects=True)
+        except (httpx.TimeoutException, httpx.NetworkError) as e:
+            raise RetryableError(f"Picsum request failed: {str(e)}") from e
+        if response.status_code == 429 or response.status_code >= 500:
+            raise RetryableError(
+                f"Picsum API error: Status {response.status_code}",
+                retry_after=parse_retry_after(response.headers.get("retry-after"))
+            )
+        if response.status_code != 200:
+            raise Exception(f"Picsum API error: Status {response.status_code}")
+        return response
@@ -0,0 +1,20 @@
+import importlib
+from typing import Type
+from .base import ImageGenerator
+
+# Generator name -> "module:class". Modules are only imported when selected, so
+# heavy backends (torch/diffusers for huggingface) never load unless used.
+GENERATORS = {
+    "picsum": "app.services.image_generators.picsum:PicsumGenerator",
+    "runware": "app.services.image_generators.runware:RunwareGenerator",
+    "openai": "app.services.image_generators.openai:OpenAIGenerator",
+    "huggingface": "app.services.image_generators.huggingface:HuggingFaceGenerator",
+    "model_server": "app.services.image_generators.model_server:ModelServerGenerator",
+}
+
+def load_generator_class(name: str) -> Type[ImageGenerator]:
+    """Import and return the generator class registered under the name"""
+    if name not in GENERATORS:
+        raise ValueError(f"Unknown image generator: {name}. Expected one of {sorted(GENERATORS)}")
+    module_path, class_name = GENERATORS[name].split(":")
+    return getattr(importlib.import_module(module_path), class_name)
@@ -1,84 +1,363 @@
+import asyncio
+import base64
+import json
 import logging
+import uuid
+from collections import OrderedDict
 import httpx
 from pathlib import Path
-import json
+from typing import Dict, List, Optional, Union
 from .base import ImageGenerator
-import base64
+from app.config import settings
+from app.services.admission import RetryableError, parse_retry_after
+from app.services.structured_logging import Payload
+
+# The WebSocket API is optional; without the websockets package tasks go over HTTP
+try:
+    import websockets
+except ImportError:
+    websockets = None
 
 logger = logging.getLogger(__name__)
 
+# Results per task, or the error the API reported for it
+TaskResults = Dict[str, Union[List[dict], Exception]]
+
+def _task_error(error: dict) -> Exception:
+    return Exception(f"Runware task error: {error.get('code', 'unknown')}: {error.get('message', error)}")
+
+def _collect_results(response_data: dict, results: TaskResults):
+    """Sort a response's result items and errors into results by taskUUID"""
+    for item in response_data.get("data") or []:
+        task_results = results.setdefault(item.get("taskUUID"), [])
+        if isinstance(task_results, list):
+            task_results.append(item)
+    errors = response_data.get("errors") or []
+    if "error" in response_data:
+        errors = [*errors, response_data["error"]]
+    for error in errors:
+        if isinstance(error, dict):
+            results[error.get("taskUUID")] = _task_error(error)
+
+class RunwareSession:
+    """One authenticated WebSocket connection to Runware, multiplexing tasks by taskUUID
+
+    Authenticates once per connection and reconnects on demand, resuming the
+    server-side session with its connectionSessionUUID. Results arrive as
+    separate messages in any order and are matched to the waiting tasks.
+    """
+
+    def __init__(self, url: str, api_key: str, timeout: float = 60.0):
+        self.url = url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.session_uuid: Optional[str] = None
+        self._ws = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connect_lock = asyncio.Lock()
+        # taskUUID -> (expected result count, results so far, future)
+        self._waiters: Dict[str, tuple] = {}
+
+    async def _connect(self):
+        async with self._connect_lock:
+            if self._ws is not None:
+                return self._ws
+            try:
+                # Base64 images are far bigger than the default 1 MiB frame limit
+                ws = await websockets.connect(self.url, max_size=None, open_timeout=self.timeout)
+                auth = {"taskType": "authentication", "apiKey": self.api_key}
+                if self.session_uuid:
+                    auth["connectionSessionUUID"] = self.session_uuid
+                await ws.send(json.dumps([auth]))
+                response = json.loads(await asyncio.wait_for(ws.recv(), self.timeout))
+            except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException) as e:
+                raise RetryableError(f"Runware connection failed: {str(e)}") from e
+
+            results: TaskResults = {}
+            _collect_results(response, results)
+            errors = [result for result in results.values() if isinstance(result, Exception)]
+            if errors:
+                await ws.close()
+                raise Exception(f"Runware authentication failed: {errors[0]}")
+            for items in results.values():
+                for item in items:
+                    if item.get("taskType") == "authentication":
+                        self.session_uuid = item.get("connectionSessionUUID")
+
+            self._ws = ws
+            self._reader_task = asyncio.create_task(self._read_results(ws))
+            logger.info("Connected to Runware WebSocket API")
+            return ws
+
+    async def _read_results(self, ws):
+        error: Exception = RetryableError("Runware connection closed")
+        try:
+            async for message in ws:
+                results: TaskResults = {}
+                _collect_results(json.loads(message), results)
+                if isinstance(results.get(None), Exception):
+                    # An error for no task concerns everything in flight on this connection
+                    logger.warning("Runware reported an error for no task: %s", results[None])
+                    self._fail_waiters(results.pop(None))
+                for task_uuid, result in results.items():
+                    waiter = self._waiters.get(task_uuid)
+                    if waiter is None or waiter[2].done():
+                        continue
+                    expected, items, future = waiter
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                        continue
+                    items.extend(result)
+                    if len(items) >= expected:
+                        future.set_result(items)
+        except websockets.exceptions.WebSocketException as e:
+            error = RetryableError(f"Lost connection to Runware: {str(e)}")
+        except Exception as e:
+            # A frame we can't parse leaves the connection in an unknown state; start over
+            logger.exception("Runware reader failed: %s", e)
+            error = RetryableError(f"Runware reader failed: {str(e)}")
+            await ws.close()
+        finally:
+            if self._ws is ws:
+                self._ws = None
+        # Fail the tasks still waiting on this connection; the next call reconnects
+        self._fail_waiters(error)
+
+    def _fail_waiters(self, error: Exception):
+        for _, _, future in self._waiters.values():
+            if not future.done():
+                future.set_exception(error)
+
+    async def run(self, tasks: List[dict]) -> TaskResults:
+        """Send the tasks in one message and wait for all of their results"""
+        ws = await self._connect()
+        loop = asyncio.get_running_loop()
+        futures = {}
+        for task in tasks:
+            futures[task["taskUUID"]] = loop.create_future()
+            self._waiters[task["taskUUID"]] = (task.get("numberResults", 1), [], futures[task["taskUUID"]])
+        try:
+            try:
+                await ws.send(json.dumps(tasks))
+            except websockets.exceptions.WebSocketException as e:
+                raise RetryableError(f"Runware send failed: {str(e)}") from e
+            done, _ = await asyncio.wait(futures.values(), timeout=self.timeout)
+            if len(done) < len(futures):
+                raise RetryableError("Runware tasks timed out")
+            results = {}
+            for task_uuid, future in futures.items():
+                try:
+                    results[task_uuid] = future.result()
+                except RetryableError:
+                    raise
+                except Exception as e:
+                    results[task_uuid] = e
+            return results
+        finally:
+            for task_uuid, future in futures.items():
+                self._waiters.pop(task_uuid, None)
+                # Mark errors on tasks we didn't get to as retrieved
+                if future.done() and not future.cancelled():
+                    future.exception()
+
+    async def aclose(self):
+        if self._ws is not None:
+            await self._ws.close()
+            self._ws = None
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+
 class RunwareGenerator(ImageGenerator):
-    def __init__(self, api_key: str, images_dir: Path = None):
+    """Generate images with Runware, batching concurrent prompts into one request
+
+    Tasks go over a persistent WebSocket session when the websockets package
+    is installed (RUNWARE_TRANSPORT=auto), otherwise over HTTP with the API key
+    in the Authorization header. Prompts arriving within ``batch_window`` of
+    each other share a request, each as its own task with a unique taskUUID.
+    Images come back base64 encoded, so there is no second download. With
+    ``number_results > 1`` each task asks for several variants; the spares
+    are handed out to later requests for the same prompt.
+    """
+    provider_name = "runware"
+
+    def __init__(
+        self,
+        api_key: str,
+        images_dir: Path = None,
+        transport: Optional[str] = None,
+        number_results: Optional[int] = None
+    ):
         self.api_key = api_key
-        self.api_url = "https://api.runware.ai/v1"
+        self.api_url = settings.RUNWARE_API_URL
         self.model_id = "runware:100@1"  # Default model ID
+        self.number_results = max(1, number_results or settings.RUNWARE_NUMBER_RESULTS)
+        self.max_batch_size = settings.RUNWARE_MAX_BATCH_SIZE
+        self.batch_window = settings.RUNWARE_BATCH_WINDOW_MS / 1000
+        self.timeout = settings.RUNWARE_TIMEOUT
+
+        transport = transport or settings.RUNWARE_TRANSPORT
+        if transport == "auto":
+            transport = "websocket" if websockets is not None else "http"
+        if transport not in ("websocket", "http"):
+            raise ValueError(f"Unknown Runware transport: {transport}. Expected one of ['auto', 'http', 'websocket']")
+        if transport == "websocket" and websockets is None:
+            raise ValueError("RUNWARE_TRANSPORT=websocket requires the websockets package")
+        self.transport = transport
+        self.session = RunwareSession(settings.RUNWARE_WS_URL, api_key, self.timeout) if transport == "websocket" else None
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._batches = set()
+        # Unused variants by prompt, oldest prompts dropped first
+        self._spares: "OrderedDict[str, List[bytes]]" = OrderedDict()
+        self._max_spare_prompts = 64
 
     async def generate(self, prompt: str, occasion: str = None) -> bytes:
         try:
-            logger.info(f"Generating image with Runware API. Prompt: {prompt}")
-            
-            # Prepare the request payload
-            payload = [
-                {
-                    "taskType": "authentication",
-                    "apiKey": self.api_key
-                },
-                {
-                    "taskType": "imageInference",
-                    "taskUUID": "39d7207a-87ef-4c93-8082-1431f9c1dc97",
-                    "positivePrompt": prompt,
-                    "width": 512,
-                    "height": 512,
-                    "modelId": self.model_id,
-                    "numberResults": 1
-                }
-            ]
-            
-            headers = {
-                "Content-Type": "application/json"
-            }
-            
-            logger.info("Sending request to Runware API")
-            
-            # Set up timeout and limits
-            timeout = httpx.Timeout(timeout=60.0)
-            limits = httpx.Limits(max_keepalive_connections=5, max_connections=10)
-            
-            async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
-                response = await client.post(
-                    self.api_url,
-                    headers=headers,
-                    json=payload
-                )
-                
-                logger.info(f"Runware Response Status: {response.status_code}")
-                
-                if response.status_code != 200:
-                    error_detail = response.text
-                    raise Exception(f"Runware API error: Status {response.status_code}, Details: {error_detail}")
-
-                # Parse the response
-                response_data = response.json()
-                logger.info(f"Runware response: {json.dumps(response_data, indent=2)}")
-
-                # Extract the image URL from the response
-                if "data" in response_data and len(response_data["data"]) > 0:
-                    image_url = response_data["data"][0].get("imageURL")
-                    if not image_url:
-                        raise Exception("No image URL in response")
-                        
-                    logger.info(f"Got image URL: {image_url}")
-                    
-                    # Download the image
-                    image_response = await client.get(image_url)
-                    if image_response.status_code != 200:
-                        raise Exception(f"Failed to download image: Status {image_response.status_code}")
-                    
-                    return image_response.content
-                else:
-                    raise Exception("No data in response")
+            spares = self._spares.get(prompt)
+            if spares:
+                self._spares.move_to_end(prompt)
+                return spares.pop()
+
+            logger.debug("Generating image with Runware API. Prompt: %s", Payload(prompt))
+            images = await self.generate_variants(prompt, self.number_results)
+            if len(images) > 1:
+                self._spares[prompt] = images[1:]
+                while len(self._spares) > self._max_spare_prompts:
+                    self._spares.popitem(last=False)
+            return images[0]
+
+        except Exception as e:
+            logger.exception("Runware generation error: %s", e)
+            raise
+
+    async def generate_variants(self, prompt: str, count: int = 1) -> List[bytes]:
+        """Generate ``count`` images for the prompt in a single task"""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((prompt, max(1, count), future))
+        items = await future
+        return [await self._decode(item) for item in items]
+
+    async def _collect_batch(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
 
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            # Skip prompts whose callers already gave up
+            batch = [item for item in batch if not item[2].done()]
+            if batch:
+                # Send without waiting, so the next batch collects while this one is in flight
+                task = asyncio.create_task(self._send_batch(batch))
+                self._batches.add(task)
+                task.add_done_callback(self._batches.discard)
+
+    async def _send_batch(self, batch: list):
+        async def attempt():
+            # Fresh task ids per attempt, so a retry never collides with a task the API already saw
+            tasks = [self._inference_task(prompt, count) for prompt, count, _ in batch]
+            results = await self._run_tasks(tasks)
+            # Errors without a taskUUID concern the whole request
+            return [results.get(task["taskUUID"], results.get(None)) for task in tasks]
+
+        try:
+            # Rate limited, queued and retried with backoff by the provider's admission controller
+            outcomes = await self.admission.call(attempt)
         except Exception as e:
-            logger.error(f"Runware generation error: {str(e)}")
-            logger.exception("Full traceback:")
-            raise 
\ No newline at end of file
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, _, future), outcome in zip(batch, outcomes):
+            if future.done():
+                continue
+            if isinstance(outcome, Exception):
+                future.set_exception(outcome)
+            elif not outcome:
+                future.set_exception(Exception("No data in response"))
+            else:
+                future.set_result(outcome)
+
+    def _inference_task(self, prompt: str, count: int) -> dict:
+        width, _, height = self.image_size.partition("x")
+        return {
+            "taskType": "imageInference",
+            "taskUUID": str(uuid.uuid4()),
+            "positivePrompt": prompt,
+            "width": int(width),
+            "height": int(height),
+            "model": self.model_id,
+            "numberResults": count,
+            "outputType": "base64Data",
+            "outputFormat": "PNG"
+        }
+
+    async def _run_tasks(self, tasks: List[dict]) -> TaskResults:
+        if self.session is not None:
+            return await self.session.run(tasks)
+
+        response = await self._post_tasks(tasks)
+        response_data = response.json()
+        logger.debug("Runware response: %s", Payload(response_data))
+        results: TaskResults = {}
+        _collect_results(response_data, results)
+        return results
+
+    async def _post_tasks(self, payload: list) -> httpx.Response:
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        try:
+            # Connections come from the shared, long-lived client pool
+            response = await self.http_client.post(
+                self.api_url,
+                headers=headers,
+                json=payload,
+                timeout=httpx.Timeout(timeout=self.timeout)
+            )
+        except (httpx.TimeoutException, httpx.NetworkError) as e:
+            raise RetryableError(f"Runware request failed: {str(e)}") from e
+        if response.status_code == 429 or response.status_code >= 500:
+            raise RetryableError(
+                f"Runware API error: Status {response.status_code}",
+                retry_after=parse_retry_after(response.headers.get("retry-after"))
+            )
+        if response.status_code != 200:
+            error_detail = response.text
+            raise Exception(f"Runware API error: Status {response.status_code}, Details: {error_detail}")
+        return response
+
+    async def _decode(self, item: dict) -> bytes:
+        if item.get("imageBase64Data"):
+            return base64.b64decode(item["imageBase64Data"])
+        image_url = item.get("imageURL")
+        if not image_url:
+            raise Exception("No image data in response")
+        # Older models may ignore outputType; fall back to downloading the URL
+        image_response = await self.http_client.get(image_url, timeout=httpx.Timeout(timeout=self.timeout))
+        if image_response.status_code != 200:
+            raise Exception(f"Failed to download image: Status {image_response.status_code}")
+        return image_response.content
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+        for task in list(self._batches):
+            task.cancel()
+        if self.session is not None:
+            await self.session.aclose()
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set
+from app.services.image_generators.base import ImageGenerator
+from app.services import telemetry
+
+logger = logging.getLogger(__name__)
+
+class ImagePool:
+    """Keeps a bounded pool of ready images per occasion, refilled in the background
+
+    Only useful for generators whose output doesn't depend on the prompt,
+    where any image for the occasion is as good as a freshly generated one.
+    """
+
+    def __init__(
+        self,
+        generator: ImageGenerator,
+        occasions: List[str],
+        size_per_occasion: int = 3,
+        refill_concurrency: int = 2,
+        max_bytes: int = 50 * 1024 * 1024
+    ):
+        self.generator = generator
+        self.size_per_occasion = size_per_occasion
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._pools: Dict[str, Deque[bytes]] = {occasion: deque() for occasion in occasions}
+        self._in_flight: Dict[str, int] = {occasion: 0 for occasion in occasions}
+        self._bytes = 0
+        self._semaphore = asyncio.Semaphore(refill_concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+
+    def start(self):
+        """Begin filling every occasion's pool"""
+        for occasion in self._pools:
+            self.refill(occasion)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def take(self, occasion: Optional[str]) -> Optional[bytes]:
+        """Return a ready image for the occasion without waiting, or None"""
+        pool = self._pools.get(occasion)
+        if pool is None:
+            return None
+        if not pool:
+            self.misses += 1
+            self.refill(occasion)
+            return None
+        image_data = pool.popleft()
+        self._bytes -= len(image_data)
+        self.hits += 1
+        self.refill(occasion)
+        return image_data
+
+    def refill(self, occasion: str):
+        """Schedule enough background generations to top the pool back up"""
+        missing = self.size_per_occasion - len(self._pools[occasion]) - self._in_flight[occasion]
+        for _ in range(missing):
+            self._in_flight[occasion] += 1
+            task = asyncio.create_task(self._fill_one(occasion))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _fill_one(self, occasion: str):
+        try:
+            async with self._semaphore:
+                image_data = await telemetry.traced_generate(
+                    self.generator, f"A greeting card design for {occasion.replace('_', ' ')}", occasion
+                )
+            if not isinstance(image_data, bytes):
+                logger.warning("Image pool only holds encoded images, got %s", type(image_data).__name__)
+            elif self._bytes + len(image_data) > self.max_bytes:
+                logger.info("Image pool is at its memory limit, not storing image for %s", occasion)
+            else:
+                self._pools[occasion].append(image_data)
+                self._bytes += len(image_data)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # The next take() retries; no retry loop here so a dead provider isn't hammered
+            logger.warning("Image pool refill for %s failed: %s", occasion, e)
+        finally:
+            self._in_flight[occasion] -= 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "bytes": self._bytes,
+            "ready": {occasion: len(pool) for occasion, pool in self._pools.items()}
+        }
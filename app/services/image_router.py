@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import statistics
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+from app.services.image_generators.base import ImageGenerator
+from app.services import telemetry
+from app.services.admission import Overloaded
+
+logger = logging.getLogger(__name__)
+
+class CircuitBreaker:
+    """Stops sending traffic to a provider after repeated failures
+
+    closed -> open after ``failure_threshold`` consecutive failures;
+    open -> half_open once ``reset_timeout`` has passed, letting one probe
+    request through at a time; half_open -> closed on success or back to open
+    on failure.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+
+    def available(self) -> bool:
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+        return self.state == "closed" or (self.state == "half_open" and not self.probing)
+
+    def acquire(self) -> bool:
+        """Claim the right to send a request; in half_open this makes it the probe"""
+        if not self.available():
+            return False
+        if self.state == "half_open":
+            self.probing = True
+        return True
+
+    def release(self):
+        """Give up a probe that ended without telling us anything about the provider"""
+        self.probing = False
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning("Circuit opened after %s failure(s)", self.failures)
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def to_dict(self) -> dict:
+        return {"state": self.state, "failures": self.failures, "probing": self.probing}
+
+class ProviderHealth:
+    """Rolling latency and success statistics for one provider"""
+
+    def __init__(self, window: int = 100):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+
+    def record(self, latency: float, ok: bool):
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(latency)
+
+    def success_rate(self) -> float:
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 1.0
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def score(self) -> float:
+        """Higher is better: success rate discounted by median latency
+
+        Providers without data score as healthy so they get explored.
+        """
+        median = statistics.median(self.latencies) if self.latencies else 0.0
+        return self.success_rate() / (1.0 + median)
+
+    def to_dict(self) -> dict:
+        return {
+            "score": self.score(),
+            "success_rate": self.success_rate(),
+            "samples": len(self.outcomes),
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95)
+        }
+
+class ImageRouter(ImageGenerator):
+    """Routes generations across several providers
+
+    Providers are tried in order of health score, skipping those whose
+    circuit is open. If the chosen provider hasn't answered within its p95
+    latency, a hedge request goes to the next provider; the first success
+    wins and the rest are cancelled. Failures fail over immediately.
+    """
+
+    provider_name = "router"
+
+    def __init__(
+        self,
+        providers: Dict[str, ImageGenerator],
+        hedge: bool = True,
+        hedge_delay: float = 5.0,
+        hedge_min_samples: int = 10,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0
+    ):
+        self.providers = providers
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.breakers = {name: CircuitBreaker(failure_threshold, reset_timeout) for name in providers}
+        self.health = {name: ProviderHealth() for name in providers}
+        self.decisions: Deque[dict] = deque(maxlen=50)
+        self.model_id = "+".join(providers)
+        self.prompt_independent = all(p.prompt_independent for p in providers.values())
+
+    def _candidates(self) -> List[str]:
+        available = [name for name in self.providers if self.breakers[name].available()]
+        return sorted(available, key=lambda name: self.health[name].score(), reverse=True)
+
+    def _hedge_after(self, name: str) -> float:
+        """How long to wait for the provider before hedging: its p95 once known"""
+        health = self.health[name]
+        if len(health.latencies) < self.hedge_min_samples:
+            return self.hedge_delay
+        return health.percentile(0.95)
+
+    async def _run(self, name: str, prompt: str, occasion: str):
+        start = time.perf_counter()
+        try:
+            result = await telemetry.traced_generate(self.providers[name], prompt, occasion)
+        except (asyncio.CancelledError, Overloaded):
+            # Losing a hedge race or being shed locally says nothing about the provider's health
+            self.breakers[name].release()
+            raise
+        except Exception:
+            self.health[name].record(time.perf_counter() - start, False)
+            self.breakers[name].record_failure()
+            raise
+        self.health[name].record(time.perf_counter() - start, True)
+        self.breakers[name].record_success()
+        return result
+
+    async def generate(self, prompt: str, occasion: str = None) -> bytes:
+        candidates = self._candidates()
+        if not candidates:
+            raise Exception("All image providers are unavailable (circuits open)")
+
+        decision = {"at": time.time(), "order": candidates, "started": [], "winner": None}
+        self.decisions.append(decision)
+        pending: Dict[asyncio.Task, str] = {}
+        last_error: Optional[Exception] = None
+
+        def start_next() -> bool:
+            while candidates:
+                name = candidates.pop(0)
+                # Another request may have taken the half-open probe meanwhile
+                if not self.breakers[name].acquire():
+                    continue
+                decision["started"].append(name)
+                pending[asyncio.create_task(self._run(name, prompt, occasion))] = name
+                return True
+            return False
+
+        if not start_next():
+            raise Exception("All image providers are unavailable (circuits open)")
+        try:
+            while pending:
+                timeout = None
+                if self.hedge and candidates:
+                    timeout = self._hedge_after(decision["started"][-1])
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    logger.info("Hedging image request to %s after %.1fs", candidates[0], timeout)
+                    start_next()
+                    continue
+
+                for task in done:
+                    name = pending.pop(task)
+                    if task.exception() is None:
+                        decision["winner"] = name
+                        return task.result()
+                    last_error = task.exception()
+                    logger.warning("Image provider %s failed: %s", name, last_error)
+
+                if not pending:
+                    # Everything in flight failed: fail over to the next provider
+                    start_next()
+
+            raise last_error or Exception("No image provider succeeded")
+        finally:
+            for task in pending:
+                task.cancel()
+            # Wait for the losers so they release their connections and their errors are retrieved
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def aclose(self):
+        for provider in self.providers.values():
+            aclose = getattr(provider, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    def state(self) -> dict:
+        """Breaker state, health and recent routing decisions for the admin endpoint"""
+        return {
+            "hedge": self.hedge,
+            "providers": {
+                name: {
+                    "breaker": self.breakers[name].to_dict(),
+                    "health": self.health[name].to_dict(),
+                    "hedge_after": self._hedge_after(name)
+                }
+                for name in self.providers
+            },
+            "recent_decisions": list(self.decisions)
+        }
@@ -1,16 +1,25 @@
+import asyncio
+import hashlib
 import logging
 from pathlib import Path
 import tempfile
+from typing import Callable, Optional
 from app.config import settings
-from .image_generators.huggingface import HuggingFaceGenerator
-from .image_generators.openai import OpenAIGenerator
-from .image_generators.runware import RunwareGenerator
-from .image_generators.picsum import PicsumGenerator
+from app.services.image_store import ImageStore, IMAGE_FORMATS, detect_image_format
+from app.services.image_cache import ImageCache
+from app.services.image_pool import ImagePool
+from app.services.image_router import ImageRouter
+from app.services.single_flight import SingleFlight
+from app.services.pending_images import PendingImages
+from app.services import deadline
+from app.services import telemetry
+from app.services.render_executor import RenderExecutor, RenderQueueFull
+from app.services.card_renderer import encode_png, render_default_image
+from app.services.renditions import build_renditions, render_rendition
+from .image_generators.registry import load_generator_class
 import os
 from dotenv import load_dotenv
 import base64
-from io import BytesIO
-from PIL import Image, ImageDraw, ImageFont
 
 # Load environment variables from .env file
 load_dotenv()
@@ -18,80 +27,194 @@ load_dotenv()
 logger = logging.getLogger(__name__)
 
 class ImageService:
-    def __init__(self):
+    def __init__(
+        self,
+        image_store: Optional[ImageStore] = None,
+        render_executor: Optional[RenderExecutor] = None,
+        image_cache: Optional[ImageCache] = None,
+        rendition_cache: Optional[ImageCache] = None
+    ):
         # Initialize the selected generator
         self.generator = self._initialize_generator()
+        # Without a store (or with IMAGE_URL_MODE=data) images are inlined as data URLs
+        self.image_store = image_store if settings.IMAGE_URL_MODE == "store" else None
+        # Without an executor, PIL work runs inline
+        self.render_executor = render_executor
+        self.image_cache = image_cache
+        self.rendition_cache = rendition_cache
+        self.renditions = build_renditions(
+            settings.IMAGE_PREVIEW_FORMAT,
+            settings.IMAGE_PREVIEW_SIZE,
+            settings.IMAGE_EMAIL_SIZE,
+            settings.IMAGE_PRINT_SIZE
+        )
+        # Set by the service factory when the generator allows pre-generated images
+        self.image_pool: Optional[ImagePool] = None
+        # Identical prompts already in flight share one generator call
+        self.inflight = SingleFlight("image")
+        # Generations that finish after their request's budget ran out
+        self.pending = PendingImages(ttl=settings.PENDING_IMAGE_TTL, directory=settings.PENDING_IMAGE_DIR)
+        # Rendered fallback images per occasion; they never change
+        self._default_images = {}
 
     def _initialize_generator(self):
         """Initialize the appropriate generator based on configuration"""
-        generator_type = os.getenv("IMAGE_GENERATOR", "picsum").lower()
+        generator_types = [name.strip().lower() for name in settings.IMAGE_GENERATORS.split(",") if name.strip()]
+        if len(generator_types) > 1:
+            logger.info("Initializing image router over %s", generator_types)
+            return ImageRouter(
+                {name: self._create_generator(name) for name in generator_types},
+                hedge=settings.IMAGE_HEDGE_ENABLED,
+                hedge_delay=settings.IMAGE_HEDGE_DELAY,
+                hedge_min_samples=settings.IMAGE_HEDGE_MIN_SAMPLES,
+                failure_threshold=settings.BREAKER_FAILURE_THRESHOLD,
+                reset_timeout=settings.BREAKER_RESET_TIMEOUT
+            )
         
+        generator_type = generator_types[0] if generator_types else os.getenv("IMAGE_GENERATOR", "picsum").lower()
+        return self._create_generator(generator_type)
+
+    @staticmethod
+    def _create_generator(generator_type: str):
+        """Create a single generator by name"""
         if generator_type == "picsum":
             logger.info("Initializing Picsum generator")
-            return PicsumGenerator()
+            return load_generator_class("picsum")()
         elif generator_type == "runware":
             api_key = os.getenv("RUNWARE_API_KEY")
             if not api_key:
                 logger.error("RUNWARE_API_KEY not found in environment variables")
                 raise ValueError("RUNWARE_API_KEY environment variable is required for Runware generator")
             logger.info("Initializing Runware generator")
-            return RunwareGenerator(api_key)
+            return load_generator_class("runware")(api_key)
         elif generator_type == "openai":
             api_key = os.getenv("OPENAI_API_KEY")
             if not api_key:
                 logger.error("OPENAI_API_KEY not found in environment variables")
                 raise ValueError("OPENAI_API_KEY environment variable is required for OpenAI generator")
             logger.info("Initializing OpenAI generator")
-            return OpenAIGenerator(api_key, None)
+            return load_generator_class("openai")(api_key, None)
+        elif generator_type == "model_server":
+            logger.info("Initializing model server client on %s", settings.MODEL_SERVER_SOCKET)
+            return load_generator_class("model_server")(
+                settings.MODEL_SERVER_SOCKET, timeout=settings.MODEL_SERVER_TIMEOUT
+            )
         else:
             logger.info("Initializing HuggingFace generator")
-            return HuggingFaceGenerator("runwayml/stable-diffusion-v1-5", None)
+            return load_generator_class("huggingface")(settings.HF_MODEL_ID, None)
 
     async def generate_image(self, prompt: str, occasion: str = None) -> str:
-        """Generate an image using the configured generator"""
-        try:
-            # Generate and get the image data
-            image_data = await self.generator.generate(prompt, occasion)
-            
-            # Convert image data to base64
-            if isinstance(image_data, bytes):
-                image_b64 = base64.b64encode(image_data).decode('utf-8')
-            else:
-                # If it's a PIL Image
-                buffered = BytesIO()
-                image_data.save(buffered, format="PNG")
-                image_b64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
+        """Generate an image using the configured generator
+
+        Under a request budget, returns a placeholder URL under /images/pending/
+        if the image isn't ready in time; generation carries on in the background.
+        """
+        with telemetry.stage("image_service", occasion=occasion or ""):
+            if deadline.remaining() is None:
+                return await self._generate_and_publish(prompt, occasion)
             
-            # Return data URL
-            return f"data:image/png;base64,{image_b64}"
+            task = asyncio.create_task(self._generate_and_publish(prompt, occasion))
+            try:
+                return await deadline.wait(asyncio.shield(task))
+            except deadline.DeadlineExceeded:
+                logger.info("Image not ready within the request budget, serving a placeholder")
+                return self.pending.track(task)
+            except asyncio.CancelledError:
+                # The caller no longer wants this image (e.g. a speculative one was superseded)
+                task.cancel()
+                raise
+
+    async def _generate_and_publish(self, prompt: str, occasion: str = None) -> str:
+        return await self._publish(await self._generate_image_data(prompt, occasion))
+
+    async def generate_image_data(self, prompt: str, occasion: str = None) -> bytes:
+        """Generate an image and return its bytes instead of a URL"""
+        with telemetry.stage("image_service", occasion=occasion or ""):
+            return await self._generate_image_data(prompt, occasion)
+
+    async def _generate_image_data(self, prompt: str, occasion: str = None) -> bytes:
+        try:
+            image_data = self.image_pool.take(occasion) if self.image_pool else None
+            if image_data is None:
+                image_data = await self.inflight.do(
+                    (*self.generator.cache_key_parts(), prompt, occasion),
+                    lambda: self._generate_cached(prompt, occasion)
+                )
+            return image_data
             
         except Exception as e:
-            logger.error(f"Image generation failed: {str(e)}")
-            return self._get_default_image(occasion)
+            logger.error("Image generation failed: %s", e)
+            return await self._get_default_image_data(occasion)
 
-    def _get_default_image(self, occasion: str) -> str:
-        """Create and return a default image when generation fails"""
-        # Create a new image with a solid background
-        img = Image.new('RGB', (512, 512), color='#f0f0f0')
-        draw = ImageDraw.Draw(img)
+    async def _generate_cached(self, prompt: str, occasion: str = None) -> bytes:
+        """Return image bytes from the cache, or generate and cache them"""
+        key = None
+        if self.image_cache is not None:
+            key = ImageCache.make_key(*self.generator.cache_key_parts(), prompt, occasion)
+            cached = await asyncio.to_thread(self.image_cache.get, key)
+            if cached is not None:
+                logger.debug("Image cache hit")
+                return cached
         
-        # Add some text
-        text = f"Gift Card - {occasion.title() if occasion else 'Default'}"
+        # Generate and get the image data
+        image_data = await telemetry.traced_generate(self.generator, prompt, occasion)
         
-        # Try to center the text (rough estimation)
-        w, h = draw.textsize(text) if hasattr(draw, 'textsize') else (200, 20)
-        draw.text(
-            ((512 - w) / 2, (512 - h) / 2),
-            text,
-            fill='#333333'
-        )
+        if not isinstance(image_data, bytes):
+            # If it's a PIL Image
+            image_data = await self._render(encode_png, image_data)
         
-        # Convert to base64
-        buffered = BytesIO()
-        img.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
+        if key is not None:
+            await asyncio.to_thread(self.image_cache.put, key, image_data)
+        return image_data
+
+    async def _publish(self, image_data: bytes) -> str:
+        """Return a URL for the image: a store URL, or a data URL as fallback"""
+        if self.image_store is not None:
+            digest = await asyncio.to_thread(self.image_store.put, image_data)
+            return f"/images/{digest}"
+        
+        media_type = IMAGE_FORMATS[detect_image_format(image_data)]
+        with telemetry.stage("base64_encode"):
+            image_b64 = base64.b64encode(image_data).decode('utf-8')
+        return f"data:{media_type};base64,{image_b64}"
+
+    async def rendition(self, image_data: bytes, name: str, digest: Optional[str] = None) -> bytes:
+        """Return the named rendition of the image, cached by the source hash"""
+        rendition = self.renditions[name]
+        key = None
+        if self.rendition_cache is not None:
+            digest = digest or hashlib.sha256(image_data).hexdigest()
+            key = ImageCache.make_key("rendition", digest, rendition)
+            cached = await asyncio.to_thread(self.rendition_cache.get, key)
+            if cached is not None:
+                # An empty entry records that the source is already suitable as-is
+                return cached or image_data
         
-        return f"data:image/png;base64,{img_str}"
+        output = await self._render(render_rendition, image_data, rendition)
+        
+        if key is not None:
+            await asyncio.to_thread(self.rendition_cache.put, key, b"" if output == image_data else output)
+        return output
+
+    async def _render(self, fn: Callable, *args):
+        """Run CPU-bound image work on the render executor when one is configured"""
+        if self.render_executor is None:
+            return fn(*args)
+        return await self.render_executor.submit(fn, *args)
+
+    async def _get_default_image_data(self, occasion: str) -> bytes:
+        """Create and return a default image when generation fails"""
+        image_data = self._default_images.get(occasion)
+        if image_data is None:
+            try:
+                image_data = await self._render(render_default_image, occasion)
+                # Occasions are free text, so only keep a bounded number around
+                if len(self._default_images) < 32:
+                    self._default_images[occasion] = image_data
+            except RenderQueueFull:
+                # Under load, serve the pre-rendered default card instead of queueing more work
+                image_data = settings.DEFAULT_CARD_PATH.read_bytes()
+        return image_data
 
 if __name__ == "__main__":
     import asyncio
@@ -108,6 +231,6 @@ if __name__ == "__main__":
         for prompt, occasion in test_prompts:
             print(f"\nGenerating image for: {prompt}")
             image_path = await service.generate_image(prompt, occasion)
-            print(f"Generated image data URL length: {len(image_path)}")
+            print(f"Generated image URL length: {len(image_path)}")
 
     asyncio.run(test_image_service())
\ No newline at end of file
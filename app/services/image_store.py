@@ -0,0 +1,131 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Extension and media type for each supported image format
+IMAGE_FORMATS = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "gif": "image/gif",
+    "webp": "image/webp",
+    "avif": "image/avif",
+}
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+def detect_image_format(data: bytes) -> str:
+    """Return the file extension for the image data based on its magic bytes"""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    if data[4:12] in (b"ftypavif", b"ftypavis"):
+        return "avif"
+    # Providers only hand back the formats above; treat anything else as PNG
+    return "png"
+
+class ImageStore(ABC):
+    """Abstract base class for content-addressed image stores"""
+
+    @abstractmethod
+    def put(self, data: bytes) -> str:
+        """Store the image data and return its content hash"""
+        pass
+
+    @abstractmethod
+    def get(self, digest: str) -> Optional[Tuple[Path, str]]:
+        """Return the file path and media type of a stored image, or None"""
+        pass
+
+    @abstractmethod
+    def evict(self):
+        """Remove images that are too old or over the size budget"""
+        pass
+
+class FileSystemImageStore(ImageStore):
+    """Image store keeping one file per image, named by its SHA-256 hash"""
+
+    def __init__(self, directory: Path, max_bytes: int, max_age: float, evict_interval: float = 60.0):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.evict_interval = evict_interval
+        self._last_evict = 0.0
+        self._approx_bytes = sum(path.stat().st_size for path, _ in self._iter_images())
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.directory / f"{digest}.{detect_image_format(data)}"
+
+        if path.exists():
+            # Refresh the age so frequently produced images survive eviction
+            os.utime(path)
+        else:
+            # Write to a temporary file first so readers never see a partial image
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+            self._approx_bytes += len(data)
+
+        if self._approx_bytes > self.max_bytes or time.time() - self._last_evict > self.evict_interval:
+            self.evict()
+        return digest
+
+    def get(self, digest: str) -> Optional[Tuple[Path, str]]:
+        if not _DIGEST_RE.match(digest):
+            return None
+        for ext, media_type in IMAGE_FORMATS.items():
+            path = self.directory / f"{digest}.{ext}"
+            if path.exists():
+                return path, media_type
+        return None
+
+    def evict(self):
+        now = time.time()
+        self._last_evict = now
+        images = []
+        for path, stat in self._iter_images():
+            if now - stat.st_mtime > self.max_age:
+                self._remove(path)
+            else:
+                images.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in images)
+        # Oldest first until we are back under budget
+        for _, size, path in sorted(images):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+        self._approx_bytes = total
+
+    def _iter_images(self):
+        for path in self.directory.iterdir():
+            name, _, ext = path.name.partition(".")
+            if ext in IMAGE_FORMATS and _DIGEST_RE.match(name):
+                try:
+                    yield path, path.stat()
+                except FileNotFoundError:
+                    continue
+
+    @staticmethod
+    def _remove(path: Path):
+        try:
+            path.unlink()
+            logger.info("Evicted stored image %s", path.name)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,421 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+# Handlers receive the job payload and an async progress callback(event, data)
+ProgressCallback = Callable[[str, dict], Awaitable[None]]
+JobHandler = Callable[[dict, ProgressCallback], Awaitable[Any]]
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already waiting"""
+    pass
+
+class Job:
+    """A unit of background work, its progress events and its outcome"""
+
+    def __init__(
+        self,
+        kind: str,
+        payload: dict,
+        id: Optional[str] = None,
+        status: str = "queued",
+        events: Optional[List[dict]] = None,
+        result: Any = None,
+        error: Optional[str] = None,
+        created_at: Optional[float] = None,
+        updated_at: Optional[float] = None,
+        owner: Optional[str] = None,
+        lease_until: Optional[float] = None
+    ):
+        self.id = id or uuid.uuid4().hex
+        self.kind = kind
+        self.payload = payload
+        self.status = status
+        self.events = events or []
+        self.result = result
+        self.error = error
+        self.created_at = created_at or time.time()
+        self.updated_at = updated_at or self.created_at
+        # The queue running the job, and until when its claim holds without a renewal
+        self.owner = owner
+        self.lease_until = lease_until
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "events": self.events,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at
+        }
+
+class JobBackend(ABC):
+    """Abstract base class for job storage"""
+
+    # True when other processes write to the same jobs, so their events must be polled for
+    shared = False
+
+    @abstractmethod
+    async def save(self, job: Job):
+        pass
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[Job]:
+        pass
+
+    @abstractmethod
+    async def unfinished(self) -> List[Job]:
+        """Return jobs that were queued or running, oldest first"""
+        pass
+
+    @abstractmethod
+    async def claim(self, job_id: str, owner: str, lease_until: float) -> Optional[Job]:
+        """Mark a queued job as running for the owner; None if it isn't queued anymore"""
+        pass
+
+    @abstractmethod
+    async def renew(self, job_id: str, owner: str, lease_until: float):
+        """Extend the owner's claim on a running job"""
+        pass
+
+    @abstractmethod
+    async def recover(self, now: float) -> List[str]:
+        """Requeue running jobs whose lease expired and return their ids"""
+        pass
+
+    @abstractmethod
+    async def purge(self, older_than: float):
+        """Delete finished jobs last updated before the given timestamp"""
+        pass
+
+class InMemoryJobBackend(JobBackend):
+    """Keeps jobs in process memory; they are lost on restart"""
+
+    def __init__(self):
+        self._jobs: Dict[str, Job] = {}
+
+    async def save(self, job: Job):
+        self._jobs[job.id] = job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def unfinished(self) -> List[Job]:
+        jobs = [job for job in self._jobs.values() if job.status not in TERMINAL_STATUSES]
+        return sorted(jobs, key=lambda job: job.created_at)
+
+    async def claim(self, job_id: str, owner: str, lease_until: float) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is None or job.status != "queued":
+            return None
+        job.status, job.owner, job.lease_until = "running", owner, lease_until
+        return job
+
+    async def renew(self, job_id: str, owner: str, lease_until: float):
+        job = self._jobs.get(job_id)
+        if job is not None and job.owner == owner:
+            job.lease_until = lease_until
+
+    async def recover(self, now: float) -> List[str]:
+        recovered = []
+        for job in await self.unfinished():
+            if job.status == "running" and (job.lease_until or 0) < now:
+                job.status, job.owner, job.lease_until = "queued", None, None
+                recovered.append(job.id)
+        return recovered
+
+    async def purge(self, older_than: float):
+        for job_id in [
+            job.id for job in self._jobs.values()
+            if job.status in TERMINAL_STATUSES and job.updated_at < older_than
+        ]:
+            del self._jobs[job_id]
+
+class SQLiteJobBackend(JobBackend):
+    """Persists jobs in a SQLite database so they survive restarts
+
+    Every web worker can share the database: jobs are claimed atomically, so
+    each runs once, and subscribers poll it for events recorded elsewhere.
+    """
+
+    shared = True
+
+    def __init__(self, db_path: Path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT, payload TEXT, status TEXT, events TEXT, "
+                "result TEXT, error TEXT, created_at REAL, updated_at REAL, owner TEXT, lease_until REAL)"
+            )
+            # Databases created before jobs were leased
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for column, column_type in (("owner", "TEXT"), ("lease_until", "REAL")):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+
+    def _execute(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _update(self, sql: str, params: tuple = ()) -> int:
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).rowcount
+
+    @staticmethod
+    def _to_job(row: tuple) -> Job:
+        id, kind, payload, status, events, result, error, created_at, updated_at, owner, lease_until = row
+        return Job(
+            kind, json.loads(payload), id=id, status=status, events=json.loads(events),
+            result=json.loads(result), error=error, created_at=created_at, updated_at=updated_at,
+            owner=owner, lease_until=lease_until
+        )
+
+    async def save(self, job: Job):
+        await asyncio.to_thread(
+            self._execute,
+            "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job.id, job.kind, json.dumps(job.payload), job.status, json.dumps(job.events),
+             json.dumps(job.result), job.error, job.created_at, job.updated_at, job.owner, job.lease_until)
+        )
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        rows = await asyncio.to_thread(self._execute, "SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return self._to_job(rows[0]) if rows else None
+
+    async def unfinished(self) -> List[Job]:
+        rows = await asyncio.to_thread(
+            self._execute,
+            "SELECT * FROM jobs WHERE status NOT IN (?, ?) ORDER BY created_at",
+            TERMINAL_STATUSES
+        )
+        return [self._to_job(row) for row in rows]
+
+    async def claim(self, job_id: str, owner: str, lease_until: float) -> Optional[Job]:
+        # Only one process gets to flip a queued job to running
+        claimed = await asyncio.to_thread(
+            self._update,
+            "UPDATE jobs SET status = 'running', owner = ?, lease_until = ? WHERE id = ? AND status = 'queued'",
+            (owner, lease_until, job_id)
+        )
+        return await self.get(job_id) if claimed else None
+
+    async def renew(self, job_id: str, owner: str, lease_until: float):
+        await asyncio.to_thread(
+            self._update,
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND owner = ? AND status = 'running'",
+            (lease_until, job_id, owner)
+        )
+
+    async def recover(self, now: float) -> List[str]:
+        rows = await asyncio.to_thread(
+            self._execute,
+            "SELECT id FROM jobs WHERE status = 'running' AND (lease_until IS NULL OR lease_until < ?) "
+            "ORDER BY created_at",
+            (now,)
+        )
+        recovered = []
+        for (job_id,) in rows:
+            # Re-checked per job, so a job renewed or recovered meanwhile is left alone
+            requeued = await asyncio.to_thread(
+                self._update,
+                "UPDATE jobs SET status = 'queued', owner = NULL, lease_until = NULL "
+                "WHERE id = ? AND status = 'running' AND (lease_until IS NULL OR lease_until < ?)",
+                (job_id, now)
+            )
+            if requeued:
+                recovered.append(job_id)
+        return recovered
+
+    async def purge(self, older_than: float):
+        await asyncio.to_thread(
+            self._execute,
+            "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+            (*TERMINAL_STATUSES, older_than)
+        )
+
+class JobQueue:
+    """Runs registered job handlers on a fixed number of background workers
+
+    A worker claims a job before running it and renews the claim's ``lease``
+    while it runs. Jobs whose lease ran out (their process died) are
+    requeued, by this queue or any other sharing the backend.
+    """
+
+    def __init__(
+        self,
+        backend: JobBackend,
+        workers: int = 2,
+        max_queued: int = 100,
+        ttl: float = 3600.0,
+        lease: float = 60.0,
+        poll_interval: float = 1.0
+    ):
+        self.backend = backend
+        self.workers = workers
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, JobHandler] = {}
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._last_purge = 0.0
+
+    def register(self, kind: str, handler: JobHandler):
+        """Register the coroutine that runs jobs of the given kind"""
+        self._handlers[kind] = handler
+
+    async def start(self):
+        """Start the workers, picking up queued jobs and those whose owner went away"""
+        if self._tasks:
+            return
+        await self.backend.recover(time.time())
+        for job in await self.backend.unfinished():
+            if job.status == "queued":
+                # Other queues may pick the same ids; the claim decides who runs them
+                self._queue.put_nowait(job.id)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._recover_expired()))
+        logger.info("Job queue started with %s workers", self.workers)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, kind: str, payload: dict) -> Job:
+        """Queue a job and return it immediately"""
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind: {kind}")
+        if self._queue.qsize() >= self.max_queued:
+            raise JobQueueFull(f"{self._queue.qsize()} jobs already queued")
+
+        now = time.time()
+        if now - self._last_purge > 60:
+            self._last_purge = now
+            await self.backend.purge(now - self.ttl)
+
+        job = Job(kind, payload)
+        await self.backend.save(job)
+        self._queue.put_nowait(job.id)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await self.backend.get(job_id)
+
+    async def subscribe(self, job_id: str) -> AsyncIterator[dict]:
+        """Yield the job's events, replaying past ones, until it finishes"""
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, []).append(queue)
+        try:
+            job = await self.backend.get(job_id)
+            if job is None:
+                return
+            last_seq = 0
+            for event in job.events:
+                last_seq = event["seq"]
+                yield event
+            if job.status in TERMINAL_STATUSES:
+                return
+            while True:
+                if not self.backend.shared:
+                    events = [await queue.get()]
+                else:
+                    try:
+                        events = [await asyncio.wait_for(queue.get(), self.poll_interval)]
+                    except asyncio.TimeoutError:
+                        # Another process may be running the job; its events are only in the backend
+                        job = await self.backend.get(job_id)
+                        if job is None:
+                            return
+                        events = job.events
+                for event in events:
+                    if event["seq"] <= last_seq:
+                        continue
+                    last_seq = event["seq"]
+                    yield event
+                    if event["event"] in TERMINAL_STATUSES:
+                        return
+        finally:
+            self._subscribers[job_id].remove(queue)
+            if not self._subscribers[job_id]:
+                del self._subscribers[job_id]
+
+    async def _record(self, job: Job, event: str, data: dict):
+        """Append a progress event, persist it and notify subscribers"""
+        now = time.time()
+        entry = {"seq": len(job.events) + 1, "event": event, "data": data, "at": now}
+        job.events.append(entry)
+        job.updated_at = now
+        await self.backend.save(job)
+        for queue in self._subscribers.get(job.id, []):
+            queue.put_nowait(entry)
+
+    async def _recover_expired(self):
+        while True:
+            await asyncio.sleep(self.lease)
+            try:
+                for job_id in await self.backend.recover(time.time()):
+                    logger.warning("Requeueing job %s, its worker stopped renewing it", job_id)
+                    self._queue.put_nowait(job_id)
+            except Exception as e:
+                logger.error("Job recovery failed: %s", e)
+
+    async def _renew_lease(self, job: Job):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            # Kept on the job too, so saving its events doesn't roll the lease back
+            job.lease_until = time.time() + self.lease
+            await self.backend.renew(job.id, self.owner, job.lease_until)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            job = await self.backend.claim(job_id, self.owner, time.time() + self.lease)
+            if job is None:
+                # Gone, finished or claimed by another worker
+                continue
+
+            await self._record(job, "running", {})
+
+            async def progress(event: str, data: dict):
+                await self._record(job, event, data)
+
+            renewal = asyncio.create_task(self._renew_lease(job))
+            try:
+                job.result = await self._handlers[job.kind](job.payload, progress)
+                job.status = "completed"
+                await self._record(job, "completed", {"result": job.result})
+            except asyncio.CancelledError:
+                # Shutting down: hand the job back so the next start runs it right away
+                job.status, job.owner, job.lease_until = "queued", None, None
+                await self.backend.save(job)
+                raise
+            except Exception as e:
+                logger.error("Job %s (%s) failed: %s", job.id, job.kind, e)
+                job.error = str(e)
+                job.status = "failed"
+                await self._record(job, "failed", {"error": job.error})
+            finally:
+                renewal.cancel()
@@ -0,0 +1,131 @@
+import json
+import re
+from typing import Dict, List, Optional
+
+# A \uXXXX escape cut off at the end of a buffer
+_PARTIAL_UNICODE_RE = re.compile(r"\\u[0-9a-fA-F]{0,3}$")
+# A complete high surrogate escape whose low surrogate hasn't arrived yet
+_HIGH_SURROGATE_RE = re.compile(r"\\u[dD][89abAB][0-9a-fA-F]{2}$")
+
+class JsonFieldExtractor:
+    """Incrementally pull top-level string fields out of a streamed JSON object
+
+    Text before the opening brace is ignored, so chatty LLM preambles are fine.
+    Non-string values are skipped without being parsed.
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, str] = {}
+        self._state = "seek"
+        self._buffer: List[str] = []
+        self._key = None
+        self._escape = False
+        self._depth = 0
+        self._in_nested_string = False
+
+    @property
+    def done(self) -> bool:
+        return self._state == "done"
+
+    def partial(self, field: str) -> Optional[str]:
+        """Return the decoded text received so far for a string field still being streamed"""
+        if self._state != "in_value" or self._key != field:
+            return None
+        raw = "".join(self._buffer)
+        # Hold back an escape sequence that hasn't fully arrived yet, and a
+        # high surrogate until its pair does, so no delta splits a character
+        if self._escape:
+            raw = raw[:-1]
+        else:
+            raw = self._strip_escape(raw, _PARTIAL_UNICODE_RE)
+        raw = self._strip_escape(raw, _HIGH_SURROGATE_RE)
+        return self._decode(raw)
+
+    @staticmethod
+    def _strip_escape(raw: str, pattern: re.Pattern) -> str:
+        """Drop a trailing escape matching pattern, unless its backslash is itself escaped"""
+        match = pattern.search(raw)
+        if match:
+            prefix = raw[:match.start()]
+            if (len(prefix) - len(prefix.rstrip("\\"))) % 2 == 0:
+                return prefix
+        return raw
+
+    def feed(self, chunk: str) -> List[str]:
+        """Consume a chunk of text and return the names of fields it completed"""
+        completed = []
+        for char in chunk:
+            state = self._state
+            if state == "seek":
+                if char == "{":
+                    self._state = "key"
+            elif state == "key":
+                if char == '"':
+                    self._state = "in_key"
+                    self._buffer = []
+                elif char == "}":
+                    self._state = "done"
+            elif state in ("in_key", "in_value"):
+                if self._escape:
+                    self._buffer.append(char)
+                    self._escape = False
+                elif char == "\\":
+                    self._buffer.append(char)
+                    self._escape = True
+                elif char == '"':
+                    value = self._decode("".join(self._buffer))
+                    if state == "in_key":
+                        self._key = value
+                        self._state = "colon"
+                    else:
+                        self.fields[self._key] = value
+                        completed.append(self._key)
+                        self._state = "after_value"
+                else:
+                    self._buffer.append(char)
+            elif state == "colon":
+                if char == ":":
+                    self._state = "value"
+            elif state == "value":
+                if char == '"':
+                    self._state = "in_value"
+                    self._buffer = []
+                elif not char.isspace():
+                    self._state = "skip_value"
+                    self._depth = 1 if char in "{[" else 0
+            elif state == "skip_value":
+                self._skip_char(char)
+            elif state == "after_value":
+                if char == ",":
+                    self._state = "key"
+                elif char == "}":
+                    self._state = "done"
+        return completed
+
+    def _skip_char(self, char: str):
+        """Advance through a non-string value, tracking nesting and strings"""
+        if self._in_nested_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_nested_string = False
+        elif char == '"':
+            self._in_nested_string = True
+        elif char in "{[":
+            self._depth += 1
+        elif char in "}]" and self._depth > 0:
+            self._depth -= 1
+        elif self._depth == 0 and char == ",":
+            self._state = "key"
+        elif self._depth == 0 and char == "}":
+            self._state = "done"
+
+    @staticmethod
+    def _decode(raw: str) -> str:
+        """Decode JSON string escapes, keeping the raw text if they are malformed"""
+        try:
+            return json.loads(f'"{raw}"')
+        except ValueError:
+            return raw
@@ -1,26 +1,50 @@
-import ollama
 import json
 import logging
 from app.config import settings
-from typing import Dict, Optional, Any
-import httpx
+from app.services.json_stream import JsonFieldExtractor
+from app.services.ollama_client import OllamaClient
+from app.services.admission import AdmissionController
+from app.services.response_cache import ResponseCache
+from app.services.single_flight import SingleFlight
+from app.services import telemetry
+from app.services import deadline
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
 class LLMService:
-    def __init__(self):
+    def __init__(self, cache: Optional[ResponseCache] = None, admission: Optional[AdmissionController] = None):
         self.model = settings.LLM_MODEL
-        self.api_url = "http://127.0.0.1:11434/api/chat"  # Ollama API endpoint
+        self.api_url = settings.OLLAMA_API_URL  # Ollama API endpoint
+        self.client = OllamaClient(
+            self.api_url,
+            max_connections=settings.OLLAMA_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OLLAMA_MAX_KEEPALIVE,
+            max_concurrency=settings.OLLAMA_MAX_CONCURRENCY,
+            timeout=settings.OLLAMA_TIMEOUT,
+            admission=admission
+        )
+        # Only successfully parsed responses are cached, never fallbacks
+        self.cache = cache
+        # Identical prompts already in flight share one Ollama call
+        self.inflight = SingleFlight("llm")
 
     async def analyze_input(self, recipient_name: str, initial_thoughts: str) -> dict:
         """Analyze initial input and suggest options"""
         prompt = self._create_analysis_prompt(recipient_name, initial_thoughts)
         
+        cached = await self._cache_get(prompt)
+        if cached is not None:
+            return cached
+        
         try:
-            response = self._get_llm_response(prompt)
-            return self._extract_json(response['message']['content'])
+            response = await self._get_llm_response(prompt)
+            result = self._extract_json(response['message']['content'])
+            await self._cache_put(prompt, result)
+            return result
         except Exception as e:
-            logger.error(f"LLM Analysis Error: {str(e)}")
+            logger.error("LLM Analysis Error: %s", e)
             return self._get_fallback_analysis(initial_thoughts)
 
     async def generate_message(
@@ -36,21 +60,148 @@ class LLMService:
             recipient_name, relationship, occasion, emotion, memories
         )
         
+        cached = await self._cache_get(prompt)
+        if cached is not None:
+            return cached
+        
         try:
-            response = self._get_llm_response(prompt)
+            response = await self._get_llm_response(prompt)
             result = self._extract_json(response['message']['content'])
-            return self._validate_message_response(result, recipient_name, occasion, emotion)
+            result = self._validate_message_response(result, recipient_name, occasion, emotion)
+            await self._cache_put(prompt, result)
+            return result
         except Exception as e:
-            logger.error(f"Message Generation Error: {str(e)}")
+            logger.error("Message Generation Error: %s", e)
             return self._get_fallback_message(recipient_name, occasion, emotion, memories)
 
-    def _get_llm_response(self, prompt: str) -> dict:
-        """Get response from LLM"""
-        return ollama.chat(
-            model=self.model,
-            messages=[{'role': 'user', 'content': prompt}]
+    async def generate_message_pipelined(
+        self,
+        recipient_name: str,
+        relationship: str,
+        occasion: str,
+        emotion: str,
+        memories: str,
+        on_image_prompt: Callable[[str], None]
+    ) -> Dict[str, str]:
+        """Stream the message generation and hand over the image prompt as soon as it is complete
+
+        ``on_image_prompt`` is called exactly once: when the ``image_prompt`` field
+        closes in the stream, or with the final prompt if the stream never produced one.
+        """
+        result = None
+        async for event, data in self.stream_message(
+            recipient_name, relationship, occasion, emotion, memories
+        ):
+            if event == "image_prompt":
+                on_image_prompt(data)
+            elif event == "done":
+                result = data
+        return result
+
+    async def stream_message(
+        self,
+        recipient_name: str,
+        relationship: str,
+        occasion: str,
+        emotion: str,
+        memories: str
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Stream message generation as events
+
+        Yields ("message_delta", text) as the message grows, ("image_prompt", prompt)
+        once, and finally ("done", result). The final result is validated and may
+        fall back to a template, so it is authoritative over the streamed deltas;
+        a fallback keeps the image prompt already streamed.
+        """
+        prompt = self._create_message_prompt(
+            recipient_name, relationship, occasion, emotion, memories
+        )
+        cached = await self._cache_get(prompt)
+        if cached is not None:
+            yield "message_delta", cached["message"]
+            yield "image_prompt", cached["image_prompt"]
+            yield "done", cached
+            return
+        
+        extractor = JsonFieldExtractor()
+        chunks = []
+        message_sent = 0
+        streamed_image_prompt: Optional[str] = None
+        streamed = False
+        start = time.perf_counter()
+
+        try:
+            async for chunk in deadline.iterate(self.inflight.stream(
+                ("stream", self.model, prompt),
+                lambda: self.client.stream_chat(
+                    model=self.model,
+                    messages=[{'role': 'user', 'content': prompt}]
+                )
+            )):
+                chunks.append(chunk)
+                completed = extractor.feed(chunk)
+                
+                message = extractor.fields.get("message") or extractor.partial("message") or ""
+                if len(message) > message_sent:
+                    yield "message_delta", message[message_sent:]
+                    message_sent = len(message)
+                
+                if "image_prompt" in completed and streamed_image_prompt is None:
+                    streamed_image_prompt = self._ensure_detailed_image_prompt(
+                        extractor.fields["image_prompt"], occasion, emotion
+                    )
+                    yield "image_prompt", streamed_image_prompt
+            streamed = True
+            telemetry.observe_stage("llm_call", time.perf_counter() - start)
+            telemetry.PROVIDER_REQUESTS.labels("ollama", "success").inc()
+            result = self._extract_json("".join(chunks))
+            result = self._validate_message_response(result, recipient_name, occasion, emotion)
+            await self._cache_put(prompt, result)
+        except Exception as e:
+            if not streamed:
+                telemetry.PROVIDER_REQUESTS.labels("ollama", "error").inc()
+            logger.error("Message Generation Error: %s", e)
+            result = self._get_fallback_message(recipient_name, occasion, emotion, memories)
+            if streamed_image_prompt is not None:
+                # The client may already be generating the image from it
+                result["image_prompt"] = streamed_image_prompt
+
+        if streamed_image_prompt is None:
+            yield "image_prompt", result["image_prompt"]
+        yield "done", result
+
+    async def _get_llm_response(self, prompt: str) -> dict:
+        """Get response from LLM, joining an identical request already in flight"""
+        return await deadline.wait(
+            self.inflight.do(("chat", self.model, prompt), lambda: self._call_llm(prompt))
         )
 
+    async def _call_llm(self, prompt: str) -> dict:
+        try:
+            with telemetry.stage("llm_call", model=self.model):
+                response = await self.client.chat(
+                    model=self.model,
+                    messages=[{'role': 'user', 'content': prompt}]
+                )
+        except Exception:
+            telemetry.PROVIDER_REQUESTS.labels("ollama", "error").inc()
+            raise
+        telemetry.PROVIDER_REQUESTS.labels("ollama", "success").inc()
+        return response
+
+    async def _cache_get(self, prompt: str) -> Optional[dict]:
+        if self.cache is None:
+            return None
+        return await self.cache.get(self.model, prompt)
+
+    async def _cache_put(self, prompt: str, result: dict):
+        if self.cache is not None:
+            await self.cache.put(self.model, prompt, result)
+
+    async def aclose(self):
+        """Release the pooled Ollama connections"""
+        await self.client.aclose()
+
     def _create_analysis_prompt(self, recipient_name: str, initial_thoughts: str) -> str:
         """Create prompt for input analysis"""
         return f"""
@@ -88,7 +239,11 @@ class LLMService:
         emotion: str,
         memories: str
     ) -> str:
-        """Create prompt for message generation"""
+        """Create prompt for message generation
+
+        The image prompt comes first so that, when streaming, the image can
+        start while the message is still being written.
+        """
         return f"""
         Create a heartfelt gift card message and image description based on:
         
@@ -98,10 +253,10 @@ class LLMService:
         Emotion: {emotion}
         Memories: {memories}
         
-        Return ONLY a JSON object:
+        Return ONLY a JSON object, with the fields in this order:
         {{
-            "message": "A warm, personal message without placeholders",
-            "image_prompt": "A detailed visual description (20+ words)"
+            "image_prompt": "A detailed visual description (20+ words)",
+            "message": "A warm, personal message without placeholders"
         }}
         """
 
@@ -127,14 +282,22 @@ class LLMService:
             return LLMService._get_fallback_message(recipient_name, occasion, emotion, "")
         
         # Ensure image prompt is detailed enough
-        if len(result["image_prompt"].split()) < 20:
-            result["image_prompt"] = (
+        result["image_prompt"] = LLMService._ensure_detailed_image_prompt(
+            result["image_prompt"], occasion, emotion
+        )
+        
+        return result
+
+    @staticmethod
+    def _ensure_detailed_image_prompt(image_prompt: str, occasion: str, emotion: str) -> str:
+        """Replace image prompts that are too short to produce a good card"""
+        if len(image_prompt.split()) < 20:
+            return (
                 f"A professional greeting card design for {occasion}, "
                 f"conveying {emotion}, with warm colors and elegant composition. "
                 f"The scene should include elements that represent celebration and connection."
             )
-        
-        return result
+        return image_prompt
 
     @staticmethod
     def _get_fallback_message(recipient_name: str, occasion: str, emotion: str, memories: str) -> dict:
@@ -184,4 +347,6 @@ if __name__ == "__main__":
         )
         print(f"Message generation result: {json.dumps(message_result, indent=2)}")
 
+        await service.aclose()
+
     asyncio.run(test_llm_service()) 
\ No newline at end of file
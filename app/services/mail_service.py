@@ -0,0 +1,223 @@
+import asyncio
+import html
+import logging
+from email.mime.image import MIMEImage
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from typing import Dict, List, Optional
+import aiosmtplib
+from app.config import settings
+from app.services import telemetry
+from app.services.image_store import IMAGE_FORMATS, detect_image_format
+
+logger = logging.getLogger(__name__)
+
+class SMTPConnectionPool:
+    """Pool of authenticated SMTP sessions reused across messages"""
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        start_tls: bool = True,
+        size: int = 4,
+        timeout: float = 30.0
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.start_tls = start_tls
+        self.timeout = timeout
+        self.connections_opened = 0
+        self.reconnects = 0
+        self._semaphore = asyncio.Semaphore(size)
+        self._idle: List[aiosmtplib.SMTP] = []
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        """Open a new session, upgrading to TLS and logging in once"""
+        smtp = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            start_tls=self.start_tls,
+            timeout=self.timeout
+        )
+        await smtp.connect()
+        if self.username:
+            await smtp.login(self.username, self.password)
+        self.connections_opened += 1
+        return smtp
+
+    async def _checkout(self) -> aiosmtplib.SMTP:
+        """Return a live session, replacing idle ones the server has dropped"""
+        while self._idle:
+            smtp = self._idle.pop()
+            if smtp.is_connected:
+                try:
+                    # Checked up front: once send_message starts, retrying could deliver twice
+                    await smtp.noop()
+                    return smtp
+                except (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPResponseException):
+                    pass
+            await self._discard(smtp)
+            self.reconnects += 1
+            logger.warning("Pooled SMTP session was disconnected, reconnecting...")
+        return await self._connect()
+
+    @staticmethod
+    async def _discard(smtp: aiosmtplib.SMTP):
+        try:
+            smtp.close()
+        except Exception:
+            pass
+
+    async def send_message(self, message: MIMEMultipart):
+        """Send a message over a pooled session
+
+        A failure during sending is never retried, since the server may
+        already have accepted the message.
+        """
+        async with self._semaphore:
+            smtp = await self._checkout()
+            try:
+                await smtp.send_message(message)
+            except Exception:
+                await self._discard(smtp)
+                raise
+            self._idle.append(smtp)
+
+    async def aclose(self):
+        """Politely close every idle session"""
+        while self._idle:
+            smtp = self._idle.pop()
+            try:
+                await smtp.quit()
+            except Exception:
+                await self._discard(smtp)
+
+class MailService:
+    def __init__(self, pool: SMTPConnectionPool):
+        self.pool = pool
+
+    async def send_gift_card(
+        self,
+        recipient_email: str,
+        message: str,
+        gift_card_link: str,
+        image_data: Optional[bytes] = None
+    ):
+        """Send a single gift card email, with the card image inline when given"""
+        with telemetry.stage("smtp_send"):
+            await self.pool.send_message(
+                self._create_gift_card_email(recipient_email, message, gift_card_link, image_data)
+            )
+
+    async def send_gift_cards(self, recipients: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Send gift cards to many recipients concurrently and report per-recipient status
+
+        Concurrency is bounded by the pool size; one failure does not stop the others.
+        """
+        async def send(recipient: Dict[str, str]) -> Dict[str, str]:
+            email = recipient.get("email")
+            try:
+                if not email:
+                    raise ValueError("Missing email address")
+                await self.send_gift_card(email, recipient.get("message"), recipient.get("gift_card_link"))
+                return {"email": email, "status": "sent"}
+            except Exception as e:
+                logger.error("Failed to send gift card to %s: %s", email, e)
+                return {"email": email, "status": "error", "message": str(e)}
+
+        return await asyncio.gather(*[send(recipient) for recipient in recipients])
+
+    async def aclose(self):
+        await self.pool.aclose()
+
+    @staticmethod
+    def _create_gift_card_email(
+        recipient_email: str,
+        message: str,
+        gift_card_link: str,
+        image_data: Optional[bytes] = None
+    ) -> MIMEMultipart:
+        """Create the gift card email"""
+        msg = MIMEMultipart('related')
+        msg['Subject'] = "You've received a gift card!"
+        msg['From'] = settings.EMAIL_FROM
+        msg['To'] = recipient_email
+
+        image_html = ""
+        if image_data:
+            image_html = '<img src="cid:card-image" alt="Gift card" style="width: 100%; border-radius: 8px;">'
+
+        # The message and link come from the request, so escape them before they reach the HTML
+        safe_message = html.escape(message or "")
+        safe_link = html.escape(gift_card_link or "", quote=True)
+
+        # Create HTML content
+        html_body = f"""
+        <html>
+            <body>
+                <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+                    <h2>You've received a gift card!</h2>
+                    {image_html}
+                    <div style="margin: 20px 0; padding: 20px; background: #f8f9fa; border-radius: 8px;">
+                        {safe_message}
+                    </div>
+                    <div style="margin: 20px 0;">
+                        <a href="{safe_link}" 
+                           style="background: #007bff; color: white; padding: 12px 24px; 
+                                  text-decoration: none; border-radius: 6px;">
+                            Redeem Your Gift Card
+                        </a>
+                    </div>
+                </div>
+            </body>
+        </html>
+        """
+        
+        msg.attach(MIMEText(html_body, 'html'))
+        if image_data:
+            subtype = IMAGE_FORMATS[detect_image_format(image_data)].split('/')[1]
+            image = MIMEImage(image_data, _subtype=subtype)
+            image.add_header('Content-ID', '<card-image>')
+            image.add_header('Content-Disposition', 'inline', filename='gift-card-image')
+            msg.attach(image)
+        return msg
+
+if __name__ == "__main__":
+    # Exercise the pool against a local stand-in SMTP server
+    from aiosmtpd.controller import Controller
+
+    class CollectingHandler:
+        def __init__(self):
+            self.received = []
+
+        async def handle_DATA(self, server, session, envelope):
+            self.received.append(envelope)
+            return "250 Message accepted for delivery"
+
+    async def test_mail_service():
+        handler = CollectingHandler()
+        controller = Controller(handler, hostname="127.0.0.1", port=8025)
+        controller.start()
+        try:
+            pool = SMTPConnectionPool("127.0.0.1", 8025, start_tls=False, size=2)
+            service = MailService(pool)
+            
+            print("\nTesting bulk send:")
+            results = await service.send_gift_cards([
+                {"email": f"user{i}@example.com", "message": f"Hello {i}", "gift_card_link": "https://example.com"}
+                for i in range(10)
+            ] + [{"message": "No address"}])
+            for result in results:
+                print(result)
+            print(f"Messages received: {len(handler.received)}")
+            print(f"SMTP connections opened: {pool.connections_opened}")
+            await service.aclose()
+        finally:
+            controller.stop()
+
+    asyncio.run(test_mail_service())
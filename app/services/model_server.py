@@ -0,0 +1,172 @@
+"""Dedicated process that holds the diffusion model for every web worker on the node
+
+Web workers connect over a Unix socket (IMAGE_GENERATOR=model_server) instead
+of each loading its own StableDiffusionPipeline, so memory stays flat as
+uvicorn workers are added. Requests from all workers share one queue and are
+micro-batched by DiffusionBatcher.
+
+    python -m app.services.model_server --socket .cache/model_server.sock
+
+Wire format, both directions: an 8 byte header holding the JSON header length
+and the payload length (big-endian uint32 each), the JSON header, then the
+payload. Requests carry {"id", "op", ...}; responses echo the id and carry
+{"ok": true} with PNG bytes as payload, or {"ok": false, "error": "..."}.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import struct
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from app.config import settings
+from app.services.structured_logging import setup_logging
+
+logger = logging.getLogger(__name__)
+
+_FRAME_HEADER = struct.Struct("!II")
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[dict, bytes]:
+    """Read one frame; raises asyncio.IncompleteReadError when the peer closes"""
+    header_size, payload_size = _FRAME_HEADER.unpack(await reader.readexactly(_FRAME_HEADER.size))
+    header = json.loads(await reader.readexactly(header_size))
+    payload = await reader.readexactly(payload_size) if payload_size else b""
+    return header, payload
+
+def encode_frame(header: dict, payload: bytes = b"") -> bytes:
+    header_bytes = json.dumps(header).encode("utf-8")
+    return _FRAME_HEADER.pack(len(header_bytes), len(payload)) + header_bytes + payload
+
+class ModelServer:
+    """Serve image generation requests from a single shared DiffusionBatcher"""
+
+    def __init__(self, batcher, socket_path: Path, max_pending: int = 64, info: Optional[dict] = None):
+        self.batcher = batcher
+        self.socket_path = Path(socket_path)
+        self.max_pending = max_pending
+        self.info = info or {}
+        self.pending = 0
+        self.served = 0
+        self.rejected = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        # Connection handler task -> its writer
+        self._connections: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+
+    async def start(self):
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.socket_path.exists():
+            # Left behind by a previous run; binding would fail otherwise
+            self.socket_path.unlink()
+        self._server = await asyncio.start_unix_server(self._handle_connection, path=str(self.socket_path))
+        os.chmod(self.socket_path, 0o660)
+        logger.info("Model server listening on %s", self.socket_path)
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            # Closing the sockets lets the handlers finish on EOF instead of being cancelled mid-read
+            for writer in list(self._connections.values()):
+                writer.close()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+        self.batcher.shutdown()
+
+    def stats(self) -> dict:
+        return {"pending": self.pending, "served": self.served, "rejected": self.rejected, **self.info}
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # Requests on one connection run concurrently; replies are matched by id
+        write_lock = asyncio.Lock()
+        tasks = set()
+        connection = asyncio.current_task()
+        self._connections[connection] = writer
+
+        async def reply(header: dict, payload: bytes = b""):
+            async with write_lock:
+                writer.write(encode_frame(header, payload))
+                await writer.drain()
+
+        async def handle(request: dict):
+            try:
+                header, payload = await self._dispatch(request)
+            except Exception as e:
+                logger.error("Model server request failed: %s", e)
+                header, payload = {"ok": False, "error": str(e)}, b""
+            try:
+                await reply({"id": request.get("id"), **header}, payload)
+            except ConnectionError:
+                pass
+
+        try:
+            while True:
+                request, _ = await read_frame(reader)
+                task = asyncio.create_task(handle(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            # The worker went away; drop its queued prompts
+            for task in tasks:
+                task.cancel()
+            writer.close()
+            self._connections.pop(connection, None)
+
+    async def _dispatch(self, request: dict) -> Tuple[dict, bytes]:
+        op = request.get("op")
+        if op == "stats":
+            return {"ok": True, "stats": self.stats()}, b""
+        if op != "generate":
+            raise ValueError(f"Unknown op: {op}")
+
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            return {"ok": False, "error": "Model server is overloaded"}, b""
+        self.pending += 1
+        try:
+            image = await self.batcher.submit(request["prompt"], request["tier"])
+            self.served += 1
+            return {"ok": True}, image
+        finally:
+            self.pending -= 1
+
+async def serve(model_id: str, socket_path: Path, max_pending: int):
+    # Imported here so clients of this module never pull in torch
+    from app.services.image_generators.huggingface import DiffusionBatcher, load_pipeline
+
+    logger.info("Loading model: %s", model_id)
+    pipe, device = await asyncio.to_thread(load_pipeline, model_id)
+    batcher = DiffusionBatcher(
+        pipe,
+        max_batch_size=settings.HF_MAX_BATCH_SIZE,
+        batch_window=settings.HF_BATCH_WINDOW_MS / 1000
+    )
+    server = ModelServer(batcher, socket_path, max_pending, info={"model_id": model_id, "device": device})
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=settings.HF_MODEL_ID)
+    parser.add_argument("--socket", type=Path, default=settings.MODEL_SERVER_SOCKET)
+    parser.add_argument("--max-pending", type=int, default=settings.MODEL_SERVER_MAX_PENDING)
+    args = parser.parse_args()
+
+    setup_logging(
+        level=settings.LOG_LEVEL,
+        log_format=settings.LOG_FORMAT,
+        max_field_length=settings.LOG_MAX_FIELD_LENGTH,
+        queue_size=settings.LOG_QUEUE_SIZE
+    )
+    asyncio.run(serve(args.model, args.socket, args.max_pending))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import json
+import logging
+from typing import AsyncIterator, Dict, List, Optional
+import httpx
+from app.services.admission import AdmissionController, RetryableError, parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+class OllamaClient:
+    """Async client for the Ollama chat API backed by a pooled, reused httpx client"""
+
+    def __init__(
+        self,
+        api_url: str,
+        max_connections: int = 10,
+        max_keepalive_connections: int = 5,
+        max_concurrency: int = 4,
+        timeout: float = 120.0,
+        admission: Optional[AdmissionController] = None
+    ):
+        self.api_url = api_url
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections
+        )
+        self._timeout = httpx.Timeout(timeout=timeout, connect=10.0)
+        # Caps the number of chats in flight; further callers wait here (or are
+        # shed) instead of queueing inside the connection pool
+        self.admission = admission or AdmissionController("ollama", max_concurrency=max_concurrency)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the shared client, creating it on first use"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(limits=self._limits, timeout=self._timeout)
+        return self._client
+
+    async def chat(self, model: str, messages: List[Dict[str, str]]) -> dict:
+        """Send a non-streaming chat request and return the decoded response"""
+        payload = {"model": model, "messages": messages, "stream": False}
+        return await self.admission.call(lambda: self._post_chat(payload))
+
+    async def _post_chat(self, payload: dict) -> dict:
+        try:
+            response = await self._get_client().post(self.api_url, json=payload)
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            # Generation itself isn't retried on a read timeout: it would only queue more work on the model
+            raise RetryableError(f"Ollama connection failed: {str(e)}") from e
+        if response.status_code in (429, 503):
+            raise RetryableError(
+                f"Ollama API error: Status {response.status_code}",
+                retry_after=parse_retry_after(response.headers.get("retry-after"))
+            )
+        if response.status_code != 200:
+            raise Exception(f"Ollama API error: Status {response.status_code}, Details: {response.text}")
+        return response.json()
+
+    async def stream_chat(self, model: str, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Send a streaming chat request and yield content chunks as they arrive"""
+        payload = {"model": model, "messages": messages, "stream": True}
+        async with self.admission.slot():
+            async with self._get_client().stream("POST", self.api_url, json=payload) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    raise Exception(f"Ollama API error: Status {response.status_code}, Details: {response.text}")
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if data.get("error"):
+                        raise Exception(f"Ollama API error: {data['error']}")
+                    content = data.get("message", {}).get("content")
+                    if content:
+                        yield content
+                    if data.get("done"):
+                        break
+
+    async def aclose(self):
+        """Close the underlying connection pool"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PENDING_PREFIX = "/images/pending/"
+
+_TOKEN_RE = re.compile(r"^[0-9a-f]{32}$")
+
+class PendingImages:
+    """Image generations that outlived their request's budget, addressable by token
+
+    The preview renders with a placeholder at /images/pending/<token> and
+    swaps in the real image once the background task finishes. With a
+    ``directory`` shared by the web workers (like the image store), each
+    token's status is also written there, so whichever worker the follow-up
+    requests land on can answer them.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 600.0,
+        directory: Optional[Path] = None,
+        poll_interval: float = 0.25,
+        purge_interval: float = 30.0
+    ):
+        self.ttl = ttl
+        self.directory = Path(directory) if directory is not None else None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self.poll_interval = poll_interval
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+        self._tasks: Dict[str, Tuple[asyncio.Task, float]] = {}
+
+    def track(self, task: asyncio.Task) -> str:
+        """Register a task resolving to the image URL and return the path serving it"""
+        self._maybe_purge()
+        token = uuid.uuid4().hex
+        self._tasks[token] = (task, time.monotonic())
+        self._publish(token, {"status": "pending"})
+        task.add_done_callback(lambda done: self._publish(token, self._task_status(done)))
+        return f"{PENDING_PREFIX}{token}"
+
+    def status(self, token: str) -> Optional[dict]:
+        self._maybe_purge()
+        entry = self._tasks.get(token)
+        if entry is not None:
+            return self._task_status(entry[0])
+        # Tracked by another worker, if by anyone
+        return self._read(token)
+
+    async def wait(self, token: str, timeout: Optional[float]) -> Optional[dict]:
+        """Wait up to timeout seconds for the image and return its status"""
+        entry = self._tasks.get(token)
+        if entry is not None:
+            await asyncio.wait({entry[0]}, timeout=timeout)
+            return self.status(token)
+
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            status = self.status(token)
+            if status is None or status["status"] != "pending":
+                return status
+            delay = self.poll_interval
+            if deadline is not None:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return status
+                delay = min(delay, remaining)
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        self._maybe_purge()
+        pending = sum(1 for task, _ in self._tasks.values() if not task.done())
+        return {"tracked": len(self._tasks), "pending": pending}
+
+    @staticmethod
+    def _task_status(task: asyncio.Task) -> dict:
+        if not task.done():
+            return {"status": "pending"}
+        if task.cancelled() or task.exception() is not None:
+            return {"status": "failed"}
+        return {"status": "ready", "image_path": task.result()}
+
+    def _path(self, token: str) -> Optional[Path]:
+        if self.directory is None or not _TOKEN_RE.match(token):
+            return None
+        return self.directory / f"{token}.json"
+
+    def _publish(self, token: str, status: dict):
+        path = self._path(token)
+        if path is None:
+            return
+        try:
+            # Write to a temporary file first so other workers never read a partial status
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(status, f)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning("Could not share pending image %s: %s", token, e)
+
+    def _read(self, token: str) -> Optional[dict]:
+        path = self._path(token)
+        if path is None:
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _maybe_purge(self):
+        now = time.monotonic()
+        if now - self._last_purge >= self.purge_interval:
+            self._last_purge = now
+            self._purge()
+
+    def _purge(self):
+        cutoff = time.monotonic() - self.ttl
+        for token, (task, created) in list(self._tasks.items()):
+            if created < cutoff and task.done():
+                del self._tasks[token]
+        if self.directory is None:
+            return
+        # Also clears entries left behind by workers that exited
+        cutoff = time.time() - self.ttl
+        for path in self.directory.glob("*.json"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except FileNotFoundError:
+                continue
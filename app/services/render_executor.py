@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from app.config import settings
+from app.services import telemetry
+from app.services.structured_logging import setup_worker_logging
+
+logger = logging.getLogger(__name__)
+
+class RenderQueueFull(Exception):
+    """Raised when the render executor already has the maximum amount of pending work"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Render queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+def _init_worker():
+    setup_worker_logging(settings.LOG_LEVEL, settings.LOG_FORMAT, settings.LOG_MAX_FIELD_LENGTH)
+
+def _run_timed(fn: Callable, args: tuple, submitted_at: float):
+    """Run fn in the worker and report how long it queued, how long it ran and its stage timings"""
+    started_at = time.time()
+    telemetry.start_capture()
+    try:
+        result = fn(*args)
+    finally:
+        stages = telemetry.stop_capture()
+    return result, started_at - submitted_at, time.time() - started_at, stages
+
+class RenderExecutor:
+    """Run CPU-bound rendering (PDF, QR, PIL) off the event loop in a process pool
+
+    Work is rejected with RenderQueueFull once ``max_pending`` jobs are queued
+    or running, so callers can shed load instead of piling up latency.
+    With ``max_workers=0`` jobs run in the default thread pool instead.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, retry_after: int = 1):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._rejected = 0
+        self._metrics: Dict[str, Dict[str, float]] = {}
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self._pool is None and self.max_workers > 0:
+            # Spawned rather than forked: the parent already runs threads (log listener, thread pools)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+        return self._pool
+
+    async def submit(self, fn: Callable, *args) -> Any:
+        """Run fn(*args) in the pool and return its result"""
+        if self._pending >= self.max_pending:
+            self._rejected += 1
+            logger.warning("Render queue full (%s pending), rejecting %s", self._pending, fn.__name__)
+            raise RenderQueueFull(self.retry_after)
+
+        metrics = self._metrics.setdefault(fn.__name__, {
+            "completed": 0,
+            "failed": 0,
+            "queue_wait_total": 0.0,
+            "queue_wait_max": 0.0,
+            "render_time_total": 0.0,
+            "render_time_max": 0.0
+        })
+        self._pending += 1
+        telemetry.RENDER_PENDING.set(self._pending)
+        try:
+            loop = asyncio.get_running_loop()
+            result, queue_wait, render_time, stages = await loop.run_in_executor(
+                self._get_pool(), _run_timed, fn, args, time.time()
+            )
+        except Exception:
+            metrics["failed"] += 1
+            raise
+        finally:
+            self._pending -= 1
+            telemetry.RENDER_PENDING.set(self._pending)
+
+        telemetry.observe_stage("render_queue_wait", queue_wait)
+        for stage_name, seconds in stages:
+            telemetry.observe_stage(stage_name, seconds)
+
+        metrics["completed"] += 1
+        metrics["queue_wait_total"] += queue_wait
+        metrics["queue_wait_max"] = max(metrics["queue_wait_max"], queue_wait)
+        metrics["render_time_total"] += render_time
+        metrics["render_time_max"] = max(metrics["render_time_max"], render_time)
+        return result
+
+    def stats(self) -> dict:
+        """Return queue depth plus queue wait and render time per job type"""
+        jobs = {}
+        for name, metrics in self._metrics.items():
+            completed = metrics["completed"] or 1
+            jobs[name] = {
+                "completed": metrics["completed"],
+                "failed": metrics["failed"],
+                "queue_wait_avg": metrics["queue_wait_total"] / completed,
+                "queue_wait_max": metrics["queue_wait_max"],
+                "render_time_avg": metrics["render_time_total"] / completed,
+                "render_time_max": metrics["render_time_max"]
+            }
+        return {
+            "workers": self.max_workers,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "rejected": self._rejected,
+            "jobs": jobs
+        }
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,78 @@
+import logging
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Dict, Optional
+from app.services import telemetry
+from app.services.image_store import detect_image_format
+
+# PIL is imported inside the functions: renditions are encoded in the render
+# workers, so the web process doesn't pay for it at startup
+
+logger = logging.getLogger(__name__)
+
+# Pillow format names for the extensions detect_image_format returns
+_PIL_FORMATS = {"png": "PNG", "jpg": "JPEG", "gif": "GIF", "webp": "WEBP", "avif": "AVIF"}
+
+@dataclass(frozen=True)
+class Rendition:
+    """How to derive one output of a source image"""
+    name: str
+    max_size: int                 # longest edge in pixels; smaller sources are never upscaled
+    format: Optional[str] = None  # None keeps the source format when it's one of `keep_formats`
+    quality: int = 85
+    keep_formats: tuple = ("png", "jpg")
+
+    def target_format(self, source_format: str) -> str:
+        if self.format:
+            return self.format
+        return source_format if source_format in self.keep_formats else "png"
+
+def build_renditions(preview_format: str, preview_size: int, email_size: int, print_size: int) -> Dict[str, Rendition]:
+    """The renditions served to the preview page, email and PDF"""
+    return {
+        "preview": Rendition("preview", preview_size, preview_format, quality=80),
+        "email": Rendition("email", email_size, "jpg", quality=85),
+        # Print stays lossless PNG or the provider's own JPEG; fpdf embeds either directly
+        "print": Rendition("print", print_size),
+    }
+
+def _can_save(fmt: str) -> bool:
+    from PIL import Image
+    Image.init()
+    return _PIL_FORMATS[fmt] in Image.SAVE
+
+def render_rendition(data: bytes, rendition: Rendition) -> bytes:
+    """Resize and encode the image for the rendition
+
+    Returns the source bytes untouched when they already have the target
+    format and fit the size limit, so nothing is decoded or re-encoded.
+    """
+    from PIL import Image
+
+    with telemetry.stage("rendition"):
+        source_format = detect_image_format(data)
+        fmt = rendition.target_format(source_format)
+        if fmt == "avif" and not _can_save("avif"):
+            # AVIF needs Pillow 11.3+ or the pillow-avif-plugin
+            fmt = "webp"
+
+        # Opening only parses the header; pixels are decoded on first access
+        image = Image.open(BytesIO(data))
+        if fmt == source_format and max(image.size) <= rendition.max_size:
+            return data
+
+        image.thumbnail((rendition.max_size, rendition.max_size), Image.LANCZOS)
+        if fmt == "jpg" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        options = {}
+        if fmt in ("jpg", "webp", "avif"):
+            options["quality"] = rendition.quality
+        if fmt in ("jpg", "png"):
+            options["optimize"] = True
+        if fmt == "jpg":
+            options["progressive"] = True
+
+        buffered = BytesIO()
+        image.save(buffered, format=_PIL_FORMATS[fmt], **options)
+        return buffered.getvalue()
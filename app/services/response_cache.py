@@ -0,0 +1,175 @@
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+class CacheBackend(ABC):
+    """Abstract base class for response cache storage
+
+    Each key maps to a list of cached variants. Backends evict least recently
+    used entries beyond ``max_entries`` and drop entries older than ``ttl``.
+    """
+
+    # Whether calls do I/O and should run off the event loop
+    blocking = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[List[str]]:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, variants: List[str]):
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+class MemoryCacheBackend(CacheBackend):
+    """LRU + TTL cache held in process memory"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[List[str]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, variants = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return variants
+
+    def set(self, key: str, variants: List[str]):
+        self._entries[key] = (time.time() + self.ttl, variants)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class SQLiteCacheBackend(CacheBackend):
+    """LRU + TTL cache stored in SQLite so it survives restarts"""
+
+    blocking = True
+
+    def __init__(self, db_path: Path, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, variants TEXT, expires_at REAL, last_used REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+
+    def get(self, key: str) -> Optional[List[str]]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT variants, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key: str, variants: List[str]):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, json.dumps(variants), now + self.ttl, now)
+            )
+            self._conn.execute(
+                "DELETE FROM responses WHERE key NOT IN "
+                "(SELECT key FROM responses ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+class ResponseCache:
+    """Caches parsed LLM responses keyed on the model name and normalized prompt
+
+    With ``variants > 1`` the first few requests for a prompt still go to the
+    model, and later hits pick one of the stored responses at random so
+    repeated requests don't all get the same message.
+    """
+
+    def __init__(self, backend: CacheBackend, variants: int = 1):
+        self.backend = backend
+        self.variants = max(1, variants)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model: str, prompt: str) -> str:
+        """Key on the model and the prompt with whitespace normalized
+
+        Case is kept: the prompt carries free text such as the recipient's name
+        and memories, and "Ana" and "ANA" must not share a cached message.
+        """
+        normalized = " ".join(prompt.split())
+        return hashlib.sha256(f"{model}\0{normalized}".encode("utf-8")).hexdigest()
+
+    async def _call(self, method, *args):
+        if self.backend.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def get(self, model: str, prompt: str) -> Optional[dict]:
+        """Return a cached response, or None when the caller should ask the model"""
+        try:
+            variants = await self._call(self.backend.get, self.make_key(model, prompt))
+        except Exception as e:
+            logger.error("LLM cache read failed: %s", e)
+            variants = None
+        if not variants or len(variants) < self.variants:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(random.choice(variants))
+
+    async def put(self, model: str, prompt: str, response: dict):
+        """Store a response as one of the prompt's variants"""
+        key = self.make_key(model, prompt)
+        value = json.dumps(response)
+        try:
+            variants = await self._call(self.backend.get, key) or []
+            if value not in variants:
+                variants = (variants + [value])[-self.variants:]
+            await self._call(self.backend.set, key, variants)
+        except Exception as e:
+            logger.error("LLM cache write failed: %s", e)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "variants": self.variants
+        }
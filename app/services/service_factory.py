@@ -1,21 +1,210 @@
+from typing import Optional
 from app.services.llm_service import LLMService
 from app.services.image_service import ImageService
+from app.services.generation_service import GenerationService
+from app.services.batch_service import BatchService
+from app.services.image_store import ImageStore, FileSystemImageStore
+from app.services.image_cache import ImageCache
+from app.services.image_pool import ImagePool
+from app.services.render_executor import RenderExecutor
+from app.services.mail_service import MailService, SMTPConnectionPool
+from app.services.job_queue import JobQueue, InMemoryJobBackend, SQLiteJobBackend
+from app.services.http_clients import HTTPClientManager, parse_limits
+from app.services.admission import AdmissionManager, parse_admission_limits
+from app.services.image_generators.base import ImageGenerator
+from app.services.response_cache import ResponseCache, MemoryCacheBackend, SQLiteCacheBackend
+from app.config import settings
 
 class ServiceFactory:
     _llm_service: LLMService = None
     _image_service: ImageService = None
+    _generation_service: GenerationService = None
+    _batch_service: BatchService = None
+    _image_store: ImageStore = None
+    _image_cache: ImageCache = None
+    _rendition_cache: ImageCache = None
+    _render_executor: RenderExecutor = None
+    _mail_service: MailService = None
+    _job_queue: JobQueue = None
+    _http_clients: HTTPClientManager = None
+    _admission: AdmissionManager = None
 
     @classmethod
     def get_llm_service(cls) -> LLMService:
         if cls._llm_service is None:
-            cls._llm_service = LLMService()
+            cls._llm_service = LLMService(cls._create_llm_cache(), cls.get_admission().get("ollama"))
         return cls._llm_service
 
+    @staticmethod
+    def _create_llm_cache() -> Optional[ResponseCache]:
+        if settings.LLM_CACHE_BACKEND == "none":
+            return None
+        if settings.LLM_CACHE_BACKEND == "sqlite":
+            backend = SQLiteCacheBackend(
+                settings.LLM_CACHE_PATH, settings.LLM_CACHE_MAX_ENTRIES, settings.LLM_CACHE_TTL
+            )
+        else:
+            backend = MemoryCacheBackend(settings.LLM_CACHE_MAX_ENTRIES, settings.LLM_CACHE_TTL)
+        return ResponseCache(backend, variants=settings.LLM_CACHE_VARIANTS)
+
     @classmethod
     def get_image_service(cls) -> ImageService:
         if cls._image_service is None:
-            cls._image_service = ImageService()
-        return cls._image_service 
+            # Generators pick up the shared limits when they first call out
+            cls.get_admission()
+            cls._image_service = ImageService(
+                cls.get_image_store(),
+                cls.get_render_executor(),
+                cls.get_image_cache(),
+                cls.get_rendition_cache()
+            )
+            if settings.IMAGE_POOL_ENABLED and cls._image_service.generator.prompt_independent:
+                cls._image_service.image_pool = ImagePool(
+                    cls._image_service.generator,
+                    occasions=[o.strip() for o in settings.IMAGE_POOL_OCCASIONS.split(",") if o.strip()],
+                    size_per_occasion=settings.IMAGE_POOL_SIZE,
+                    refill_concurrency=settings.IMAGE_POOL_REFILL_CONCURRENCY,
+                    max_bytes=settings.IMAGE_POOL_MAX_BYTES
+                )
+        return cls._image_service
+
+    @classmethod
+    def get_http_clients(cls) -> HTTPClientManager:
+        if cls._http_clients is None:
+            cls._http_clients = HTTPClientManager(
+                limits=parse_limits(settings.HTTP_PROVIDER_LIMITS),
+                timeout=settings.HTTP_TIMEOUT
+            )
+            ImageGenerator.use_client_manager(cls._http_clients)
+        return cls._http_clients
+
+    @classmethod
+    def get_admission(cls) -> AdmissionManager:
+        if cls._admission is None:
+            limits = parse_admission_limits(settings.ADMISSION_LIMITS)
+            limits.setdefault("ollama", (0.0, settings.OLLAMA_MAX_CONCURRENCY))
+            cls._admission = AdmissionManager(
+                limits,
+                max_queue_wait=settings.ADMISSION_MAX_QUEUE_WAIT,
+                max_retries=settings.ADMISSION_MAX_RETRIES,
+                backoff_base=settings.ADMISSION_BACKOFF_BASE,
+                backoff_max=settings.ADMISSION_BACKOFF_MAX
+            )
+            ImageGenerator.use_admission_manager(cls._admission)
+        return cls._admission
+
+    @classmethod
+    def get_image_store(cls) -> ImageStore:
+        if cls._image_store is None:
+            cls._image_store = FileSystemImageStore(
+                settings.UPLOAD_FOLDER,
+                max_bytes=settings.IMAGE_STORE_MAX_BYTES,
+                max_age=settings.IMAGE_STORE_MAX_AGE
+            )
+        return cls._image_store
+
+    @classmethod
+    def get_image_cache(cls) -> Optional[ImageCache]:
+        if cls._image_cache is None and settings.IMAGE_CACHE_ENABLED:
+            cls._image_cache = ImageCache(settings.IMAGE_CACHE_DIR, settings.IMAGE_CACHE_MAX_BYTES)
+        return cls._image_cache
+
+    @classmethod
+    def get_rendition_cache(cls) -> ImageCache:
+        if cls._rendition_cache is None:
+            cls._rendition_cache = ImageCache(settings.RENDITION_CACHE_DIR, settings.RENDITION_CACHE_MAX_BYTES)
+        return cls._rendition_cache
+
+    @classmethod
+    def get_render_executor(cls) -> RenderExecutor:
+        if cls._render_executor is None:
+            cls._render_executor = RenderExecutor(
+                max_workers=settings.RENDER_WORKERS,
+                max_pending=settings.RENDER_MAX_PENDING,
+                retry_after=settings.RENDER_RETRY_AFTER
+            )
+        return cls._render_executor
+
+    @classmethod
+    def get_mail_service(cls) -> MailService:
+        if cls._mail_service is None:
+            cls._mail_service = MailService(SMTPConnectionPool(
+                settings.SMTP_SERVER,
+                settings.SMTP_PORT,
+                username=settings.SMTP_USERNAME,
+                password=settings.SMTP_PASSWORD,
+                start_tls=settings.SMTP_START_TLS,
+                size=settings.SMTP_POOL_SIZE,
+                timeout=settings.SMTP_TIMEOUT
+            ))
+        return cls._mail_service
+
+    @classmethod
+    def get_job_queue(cls) -> JobQueue:
+        if cls._job_queue is None:
+            if settings.JOB_BACKEND == "sqlite":
+                backend = SQLiteJobBackend(settings.JOB_DB_PATH)
+            else:
+                backend = InMemoryJobBackend()
+            cls._job_queue = JobQueue(
+                backend,
+                workers=settings.JOB_WORKERS,
+                max_queued=settings.JOB_MAX_QUEUED,
+                ttl=settings.JOB_TTL,
+                lease=settings.JOB_LEASE
+            )
+        return cls._job_queue
+
+    @classmethod
+    def get_generation_service(cls) -> GenerationService:
+        if cls._generation_service is None:
+            cls._generation_service = GenerationService(
+                cls.get_llm_service(), cls.get_image_service()
+            )
+        return cls._generation_service
+
+    @classmethod
+    def get_batch_service(cls) -> BatchService:
+        if cls._batch_service is None:
+            cls._batch_service = BatchService(
+                cls.get_llm_service(),
+                cls.get_image_service(),
+                cls.get_render_executor(),
+                settings.BATCH_DIR,
+                concurrency=settings.BATCH_CONCURRENCY,
+                llm_concurrency=settings.BATCH_LLM_CONCURRENCY,
+                image_concurrency=settings.BATCH_IMAGE_CONCURRENCY,
+                render_concurrency=settings.BATCH_RENDER_CONCURRENCY
+            )
+        return cls._batch_service
+
+    @classmethod
+    async def shutdown(cls):
+        """Release resources held by the service singletons"""
+        if cls._job_queue is not None:
+            await cls._job_queue.stop()
+            cls._job_queue = None
+        if cls._llm_service is not None:
+            await cls._llm_service.aclose()
+            cls._llm_service = None
+        if cls._image_service is not None:
+            if cls._image_service.image_pool is not None:
+                await cls._image_service.image_pool.stop()
+            # Generators holding connections of their own (model server, Runware WebSocket)
+            aclose = getattr(cls._image_service.generator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+        if cls._http_clients is not None:
+            await cls._http_clients.aclose()
+            cls._http_clients = None
+        if cls._mail_service is not None:
+            await cls._mail_service.aclose()
+            cls._mail_service = None
+        if cls._render_executor is not None:
+            cls._render_executor.shutdown()
+            cls._render_executor = None
+        cls._generation_service = None
+        cls._batch_service = None
 
 if __name__ == "__main__":
     import asyncio
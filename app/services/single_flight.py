@@ -0,0 +1,136 @@
+import asyncio
+import contextvars
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+from app.services import telemetry
+
+logger = logging.getLogger(__name__)
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class _SharedStream:
+    """Replays one source stream to every subscriber, including ones that join late"""
+
+    def __init__(self, source: AsyncIterator):
+        self.items: List[Any] = []
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        self.task = asyncio.create_task(self._pump(source), context=contextvars.Context())
+
+    async def _pump(self, source: AsyncIterator):
+        try:
+            async for item in source:
+                self.items.append(item)
+                self._notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished = True
+            self._notify()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def iterate(self) -> AsyncIterator:
+        position = 0
+        while True:
+            if position < len(self.items):
+                yield self.items[position]
+                position += 1
+            elif self.finished:
+                if self.error is not None:
+                    raise self.error
+                return
+            else:
+                await self._changed.wait()
+
+class SingleFlight:
+    """Collapse concurrent identical calls into one backend call
+
+    The first caller for a key starts the call as its own task; callers that
+    arrive while it is in flight await the same task. Each caller waits
+    through asyncio.shield, so one of them being cancelled (a client
+    disconnecting) doesn't cancel the call for the rest. The call itself is
+    cancelled only once every caller has gone away.
+
+    The call runs in an empty context rather than a copy of the first
+    caller's, so that caller's deadline and request id don't apply to the
+    others. Each caller enforces its own budget while waiting.
+    """
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.calls = 0
+        self.collapsed = 0
+        self._calls: Dict[Hashable, _Call] = {}
+        self._streams: Dict[Hashable, _SharedStream] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the result of fn(), shared with concurrent callers using the same key"""
+        call = self._calls.get(key)
+        if call is None or call.task.cancelled():
+            call = _Call(asyncio.create_task(fn(), context=contextvars.Context()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(self._calls, key, call))
+            self.calls += 1
+        else:
+            self._record_collapsed()
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                # Last one interested; stop the work and let the next caller start afresh
+                call.task.cancel()
+                self._forget(self._calls, key, call)
+            raise
+        finally:
+            call.waiters -= 1
+
+    async def stream(self, key: Hashable, fn: Callable[[], AsyncIterator]) -> AsyncIterator:
+        """Yield the items of fn(), shared with concurrent callers using the same key
+
+        Callers that join mid-stream first receive everything produced so far.
+        """
+        shared = self._streams.get(key)
+        if shared is None or shared.task.cancelled():
+            shared = _SharedStream(fn())
+            self._streams[key] = shared
+            shared.task.add_done_callback(lambda _: self._forget(self._streams, key, shared))
+            self.calls += 1
+        else:
+            self._record_collapsed()
+
+        shared.subscribers += 1
+        try:
+            async for item in shared.iterate():
+                yield item
+        finally:
+            shared.subscribers -= 1
+            if shared.subscribers == 0 and not shared.task.done():
+                shared.task.cancel()
+                self._forget(self._streams, key, shared)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "collapsed": self.collapsed,
+            "in_flight": len(self._calls) + len(self._streams)
+        }
+
+    def _record_collapsed(self):
+        self.collapsed += 1
+        telemetry.COALESCED_CALLS.labels(self.operation).inc()
+        logger.debug("Joined in-flight %s call", self.operation)
+
+    @staticmethod
+    def _forget(registry: dict, key: Hashable, entry):
+        if registry.get(key) is entry:
+            del registry[key]
@@ -0,0 +1,294 @@
+"""Application logging: JSON lines tagged with the request id, written off the event loop
+
+Records are handed to a background thread through a QueueHandler, so a slow
+stdout or log collector never stalls request handling. High-volume loggers can
+be sampled (LOG_SAMPLING="app.services.image_cache=0.1"); warnings and errors
+are always kept. Messages and fields are redacted and size-capped before they
+are written, and Payload defers serializing large values until a record is
+actually emitted.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+_UNSAFE_ID_CHARS = re.compile(r"[^A-Za-z0-9._:-]")
+_REDACTED = "[REDACTED]"
+_SENSITIVE_KEYS = re.compile(r"api[_-]?key|authorization|password|secret|token", re.IGNORECASE)
+_SENSITIVE_VALUES = [
+    (re.compile(r"(Bearer\s+)[A-Za-z0-9._~+/=-]+", re.IGNORECASE), r"\1" + _REDACTED),
+    (re.compile(r"\bsk-[A-Za-z0-9_-]{8,}"), _REDACTED),
+    (re.compile(r"""(["']?(?:api[_-]?key|apiKey|password|token)["']?\s*[:=]\s*["']?)[^"',\s}]+""", re.IGNORECASE), r"\1" + _REDACTED),
+    (re.compile(r"\b[\w.+-]+@[\w-]+\.[\w.-]+\b"), "[EMAIL]"),
+]
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+def redact(text: str) -> str:
+    """Mask credentials and email addresses in free text"""
+    for pattern, replacement in _SENSITIVE_VALUES:
+        text = pattern.sub(replacement, text)
+    return text
+
+def truncate(text: str, limit: int) -> str:
+    if limit and len(text) > limit:
+        return f"{text[:limit]}... [{len(text) - limit} more chars]"
+    return text
+
+class Payload:
+    """A value to log that is serialized, redacted and truncated only if the record is emitted
+
+        logger.debug("Runware response: %s", Payload(response_data))
+    """
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value: Any, limit: int = 500):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self) -> str:
+        value = self.value
+        if isinstance(value, bytes):
+            return f"<{len(value)} bytes>"
+        if not isinstance(value, str):
+            try:
+                value = json.dumps(_redact_fields(value), default=str, separators=(",", ":"))
+            except (TypeError, ValueError):
+                value = repr(value)
+        return truncate(redact(value), self.limit)
+
+def _redact_fields(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {
+            key: _REDACTED if isinstance(key, str) and _SENSITIVE_KEYS.search(key) else _redact_fields(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [_redact_fields(item) for item in value]
+    return value
+
+class TextFormatter(logging.Formatter):
+    """Plain text lines, redacted and size-capped"""
+
+    def __init__(self, max_field_length: int = 2000):
+        super().__init__("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s")
+        self.max_field_length = max_field_length
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        record.message = truncate(redact(record.message), self.max_field_length)
+        if not getattr(record, "request_id", None):
+            record.request_id = "-"
+        return super().formatMessage(record)
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with ``extra`` fields alongside the message"""
+
+    def __init__(self, max_field_length: int = 2000):
+        super().__init__()
+        self.max_field_length = max_field_length
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": self._field(record.getMessage()),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in vars(record).items():
+            if key in _RECORD_ATTRS or key.startswith("_"):
+                continue
+            if _SENSITIVE_KEYS.search(key):
+                entry[key] = _REDACTED
+            elif isinstance(value, (int, float, bool)) or value is None:
+                entry[key] = value
+            else:
+                entry[key] = self._field(str(value))
+        if record.exc_info:
+            record.exc_text = record.exc_text or self.formatException(record.exc_info)
+        if record.exc_text:
+            # Tracebacks are the one field worth keeping whole
+            entry["exc_info"] = redact(record.exc_text)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+    def _field(self, text: str) -> str:
+        return truncate(redact(text), self.max_field_length)
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of INFO-and-below records from the configured loggers and their children"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._resolved: Dict[str, float] = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate, prefix = 1.0, name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+class AsyncQueueHandler(QueueHandler):
+    """Enqueue records for the listener thread without ever blocking the caller
+
+    Nothing is formatted here: interpolating the arguments, redaction and JSON
+    encoding all happen in the listener thread, so log arguments must not be
+    mutated after the call. Records are dropped (and counted) rather than
+    waited on when the queue is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The contextvar is only visible from the logging task, so capture it now
+        record.request_id = _request_id.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def parse_sampling(spec: str) -> Dict[str, float]:
+    """Parse 'logger=rate,...' into a dict"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = item.partition("=")
+        rates[name.strip()] = float(rate)
+    return rates
+
+_listener: Optional[QueueListener] = None
+
+def _formatter(log_format: str, max_field_length: int) -> logging.Formatter:
+    return JsonFormatter(max_field_length) if log_format == "json" else TextFormatter(max_field_length)
+
+def setup_logging(
+    level: str = "INFO",
+    log_format: str = "json",
+    sampling: Optional[Dict[str, float]] = None,
+    max_field_length: int = 2000,
+    queue_size: int = 10000
+) -> AsyncQueueHandler:
+    """Route the root logger (and uvicorn's) through a queue to a stdout writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(_formatter(log_format, max_field_length))
+
+    handler = AsyncQueueHandler(queue.Queue(queue_size))
+    if sampling:
+        handler.addFilter(SamplingFilter(sampling))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level.upper())
+    # Let uvicorn's records reach the same handler instead of writing to stderr synchronously
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+
+    _listener = QueueListener(handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+    return handler
+
+def setup_worker_logging(level: str = "INFO", log_format: str = "json", max_field_length: int = 2000):
+    """Write straight to stdout, for worker processes that have no event loop to protect
+
+    A queue handler inherited from the parent has no listener thread in the
+    worker, so its records would silently pile up in the queue.
+    """
+    global _listener
+    if _listener is not None:
+        if _listener._thread is not None:
+            _listener.stop()
+        _listener = None
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(_formatter(log_format, max_field_length))
+    root = logging.getLogger()
+    root.handlers = [stream]
+    root.setLevel(level.upper())
+
+def _after_fork_in_child():
+    # The listener thread doesn't survive fork; write directly with the same format
+    global _listener
+    if _listener is None:
+        return
+    stream = _listener.handlers[0]
+    _listener = None
+    root = logging.getLogger()
+    root.handlers = [handler for handler in root.handlers if not isinstance(handler, AsyncQueueHandler)] + [stream]
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+@atexit.register
+def _flush():
+    # Drain whatever is still queued before the interpreter exits
+    if _listener is not None:
+        _listener.stop()
+
+class RequestIdMiddleware:
+    """Tag each request's log records with its X-Request-ID, generating one when absent"""
+
+    header = b"x-request-id"
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == self.header:
+                # Bounded and printable, since it ends up in every log line
+                request_id = _UNSAFE_ID_CHARS.sub("", value.decode("latin-1"))[:64] or None
+                break
+        request_id = request_id or uuid.uuid4().hex
+        token = _request_id.set(request_id)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (self.header, request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _request_id.reset(token)
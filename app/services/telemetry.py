@@ -0,0 +1,167 @@
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, List, Optional, Tuple
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily
+from starlette.routing import Match
+
+# OpenTelemetry is optional; without it (or without a configured SDK) spans are no-ops
+try:
+    from opentelemetry import trace
+    _tracer = trace.get_tracer("gift-card")
+except ImportError:
+    _tracer = None
+
+REQUEST_LATENCY = Histogram(
+    "giftcard_request_duration_seconds",
+    "HTTP request latency by route",
+    ["route", "method", "status"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "giftcard_requests_in_flight",
+    "HTTP requests currently being handled",
+    ["route"]
+)
+STAGE_LATENCY = Histogram(
+    "giftcard_stage_duration_seconds",
+    "Time spent in each pipeline stage",
+    ["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+PROVIDER_REQUESTS = Counter(
+    "giftcard_provider_requests",
+    "Calls to external generators by outcome",
+    ["provider", "outcome"]
+)
+PROVIDER_RETRIES = Counter(
+    "giftcard_provider_retries",
+    "Retried calls to external backends",
+    ["provider"]
+)
+ADMISSION_WAIT = Histogram(
+    "giftcard_admission_wait_seconds",
+    "Time spent queued for a backend's concurrency and rate limits",
+    ["provider"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+ADMISSION_SHED = Counter(
+    "giftcard_admission_shed",
+    "Calls rejected because a backend's admission queue was too long",
+    ["provider"]
+)
+COALESCED_CALLS = Counter(
+    "giftcard_coalesced_calls",
+    "Calls that joined an identical call already in flight instead of hitting the backend",
+    ["operation"]
+)
+RENDER_PENDING = Gauge(
+    "giftcard_render_pending",
+    "Render jobs queued or running"
+)
+
+_capture = threading.local()
+
+def start_capture():
+    """Collect stage timings on this thread instead of recording them
+
+    Used in render worker processes, whose metrics would otherwise be lost;
+    the parent records the captured timings.
+    """
+    _capture.timings = []
+
+def stop_capture() -> List[Tuple[str, float]]:
+    timings = getattr(_capture, "timings", None) or []
+    _capture.timings = None
+    return timings
+
+def observe_stage(name: str, seconds: float):
+    """Record a stage duration, or capture it when capturing is active"""
+    timings = getattr(_capture, "timings", None)
+    if timings is not None:
+        timings.append((name, seconds))
+    else:
+        STAGE_LATENCY.labels(name).observe(seconds)
+
+@contextmanager
+def stage(name: str, **attributes):
+    """Time a pipeline stage into the stage histogram, inside a span when tracing is available"""
+    span = _tracer.start_as_current_span(name, attributes=attributes) if _tracer else nullcontext()
+    start = time.perf_counter()
+    with span:
+        try:
+            yield
+        finally:
+            observe_stage(name, time.perf_counter() - start)
+
+async def traced_generate(generator, prompt: str, occasion: Optional[str] = None):
+    """Call generator.generate, recording its latency, outcome and span"""
+    provider = generator.provider_name
+    try:
+        with stage("image_provider", provider=provider):
+            result = await generator.generate(prompt, occasion)
+    except Exception:
+        PROVIDER_REQUESTS.labels(provider, "error").inc()
+        raise
+    PROVIDER_REQUESTS.labels(provider, "success").inc()
+    return result
+
+_cache_sources: Dict[str, Callable[[], Optional[dict]]] = {}
+
+def register_cache(name: str, stats: Callable[[], Optional[dict]]):
+    """Expose a cache's hit/miss counters; stats returns a dict with hits and misses"""
+    _cache_sources[name] = stats
+
+class _CacheCollector:
+    def collect(self):
+        hits = CounterMetricFamily("giftcard_cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("giftcard_cache_misses", "Cache misses", labels=["cache"])
+        for name, source in _cache_sources.items():
+            stats = source()
+            if stats:
+                hits.add_metric([name], stats["hits"])
+                misses.add_metric([name], stats["misses"])
+        yield hits
+        yield misses
+
+REGISTRY.register(_CacheCollector())
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and in-flight counts per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = self._route_template(scope)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(route)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            REQUEST_LATENCY.labels(route, scope["method"], str(status["code"])).observe(
+                time.perf_counter() - start
+            )
+
+    @staticmethod
+    def _route_template(scope) -> str:
+        # Label by template (/jobs/{job_id}) so ids don't explode label cardinality
+        for route in scope["app"].router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, "path", "unknown")
+        return "unmatched"
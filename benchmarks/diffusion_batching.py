@@ -0,0 +1,51 @@
+"""Measure local diffusion throughput at different micro-batch sizes
+
+Loads the model once (IMAGE_GENERATOR=huggingface settings apply), warms it
+up, then generates the same number of images at each batch size and reports
+images per minute as JSON. Needs torch, diffusers and the model weights.
+
+    python -m benchmarks.diffusion_batching --tier draft --prompts 8 --batch-sizes 1,2,4
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.config import settings
+
+PROMPT = "A warm birthday card with balloons and a cake, soft pastel colors"
+
+async def measure(model_id: str, tier: str, prompts: int, batch_sizes: list) -> dict:
+    from app.services.image_generators.huggingface import HuggingFaceGenerator
+
+    generator = HuggingFaceGenerator(model_id, None, tier=tier)
+    try:
+        # Model loading and compilation shouldn't count against the first batch size
+        await generator.generate(PROMPT)
+        results = {}
+        for batch_size in batch_sizes:
+            generator.batcher.max_batch_size = batch_size
+            start = time.perf_counter()
+            await asyncio.gather(*[generator.generate(PROMPT) for _ in range(prompts)])
+            elapsed = time.perf_counter() - start
+            results[str(batch_size)] = {
+                "elapsed": round(elapsed, 3),
+                "images_per_minute": round(prompts / elapsed * 60, 2)
+            }
+        return {"model": model_id, "tier": tier, "device": generator.device, "prompts": prompts, "batch_sizes": results}
+    finally:
+        await generator.aclose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=settings.HF_MODEL_ID)
+    parser.add_argument("--tier", default="draft", choices=["draft", "final"])
+    parser.add_argument("--prompts", type=int, default=8, help="images per batch size")
+    parser.add_argument("--batch-sizes", default="1,2,4")
+    args = parser.parse_args()
+
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",") if size.strip()]
+    print(json.dumps(asyncio.run(measure(args.model, args.tier, args.prompts, batch_sizes)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""Drive the application against local mock providers and report latency percentiles
+
+Starts the mock Ollama/OpenAI/Runware/Picsum server and an SMTP stand-in,
+launches the app in a fresh uvicorn process pointed at them, then fires each
+route at the requested concurrency. The JSON report records throughput and
+p50/p95/p99 per route along with the commit it was taken at, so runs can be
+compared across commits:
+
+    python -m benchmarks.load_test --concurrency 16 --requests 200 --output before.json
+    python -m benchmarks.load_test --concurrency 16 --requests 200 --compare before.json
+
+Generation modes are compared by running once per --generation-mode.
+"""
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import httpx
+
+from .mock_servers import MockConfig, MockProviderServer, MockSMTPServer, free_port
+
+ROOT = Path(__file__).resolve().parent.parent
+
+ROUTES = ["start-questionnaire", "generate-message", "generate-pdf", "send-gift-card"]
+
+def _sample_image_data_url() -> str:
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new("RGB", (512, 512), (230, 120, 80)).save(buffer, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+def build_requests() -> Dict[str, Callable[[int], dict]]:
+    """httpx request arguments for each route, keyed by route name"""
+    image_data_url = _sample_image_data_url()
+    message = "Happy birthday! Wishing you a year full of adventures and good company."
+    return {
+        "start-questionnaire": lambda i: {
+            "method": "POST", "url": "/start-questionnaire",
+            "data": {"recipient_name": f"Friend {i}", "initial_thoughts": "birthday card for my hiking buddy"}
+        },
+        "generate-message": lambda i: {
+            "method": "POST", "url": "/generate-message",
+            "data": {
+                "recipient_name": f"Friend {i}", "relationship": "friend", "occasion": "birthday",
+                "emotion": "joy", "memories": f"hiking trip number {i}"
+            }
+        },
+        "generate-pdf": lambda i: {
+            "method": "POST", "url": "/generate-pdf",
+            "json": {"message": message, "image_path": image_data_url, "gift_card_link": f"https://example.com/card/{i}"}
+        },
+        "send-gift-card": lambda i: {
+            "method": "POST", "url": "/send-gift-card",
+            "json": {"email": f"user{i}@example.com", "message": message, "gift_card_link": f"https://example.com/card/{i}"}
+        }
+    }
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    completed = len(latencies)
+    return {
+        "requests": completed + errors,
+        "errors": errors,
+        "elapsed": round(elapsed, 4),
+        "throughput": round(completed / elapsed, 3) if elapsed else 0.0,
+        "mean": round(sum(latencies) / completed, 4) if completed else 0.0,
+        "p50": round(percentile(latencies, 50), 4),
+        "p95": round(percentile(latencies, 95), 4),
+        "p99": round(percentile(latencies, 99), 4),
+        "max": round(max(latencies), 4) if latencies else 0.0
+    }
+
+async def run_route(client: httpx.AsyncClient, build: Callable[[int], dict],
+                    total: int, concurrency: int) -> dict:
+    """Send `total` requests with at most `concurrency` in flight"""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await client.request(**build(i))
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+async def drive(base_url: str, routes: List[str], total: int, concurrency: int, warmup: int) -> dict:
+    requests = build_requests()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300.0) as client:
+        results = {}
+        for route in routes:
+            if warmup:
+                await run_route(client, requests[route], warmup, min(warmup, concurrency))
+            results[route] = await run_route(client, requests[route], total, concurrency)
+            print(f"{route}: {json.dumps(results[route])}", file=sys.stderr)
+        return results
+
+def start_app(env: dict, timeout: float = 60.0) -> Tuple[subprocess.Popen, str]:
+    """Launch the application in its own interpreter so settings pick up `env`
+
+    It gets its own session, so stop_app can take down its render workers too.
+    """
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT, env={**os.environ, **env}, start_new_session=True
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise RuntimeError(f"Application exited with code {server.returncode}")
+            try:
+                with urllib.request.urlopen(f"{base_url}/", timeout=1):
+                    return server, base_url
+            except OSError:
+                time.sleep(0.05)
+        raise TimeoutError(f"Application did not answer within {timeout}s")
+    except BaseException:
+        stop_app(server)
+        raise
+
+def stop_app(server: subprocess.Popen, timeout: float = 10.0):
+    """Stop the application and every process it started"""
+    try:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait(timeout)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        pass
+    # Whatever is left in the group (a hung app, stray render workers) goes now
+    try:
+        os.killpg(server.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    server.wait()
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, check=True, capture_output=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(report: dict, baseline: dict) -> str:
+    """Render per-route deltas against an earlier report"""
+    lines = [f"{'route':<22}{'metric':<12}{baseline['commit']:>12}{report['commit']:>12}{'change':>10}"]
+    for route, current in report["routes"].items():
+        previous = baseline.get("routes", {}).get(route)
+        if not previous:
+            continue
+        for metric in ("throughput", "p50", "p95", "p99"):
+            before, after = previous[metric], current[metric]
+            change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+            lines.append(f"{route:<22}{metric:<12}{before:>12.4f}{after:>12.4f}{change:>10}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--routes", default=",".join(ROUTES), help="comma separated subset of " + ", ".join(ROUTES))
+    parser.add_argument("--requests", type=int, default=100, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured requests per route")
+    parser.add_argument("--generator", default="picsum", help="generator, or comma separated list to route between")
+    parser.add_argument("--generation-mode", default="pipelined", choices=["sequential", "pipelined", "speculative"])
+    parser.add_argument("--llm-latency", type=float, default=MockConfig.llm_latency)
+    parser.add_argument("--image-latency", type=float, default=MockConfig.image_latency)
+    parser.add_argument("--jitter", type=float, default=MockConfig.jitter)
+    parser.add_argument("--caches", action="store_true", help="keep LLM/image caches and the image pool enabled")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="baseline report to compare against")
+    args = parser.parse_args()
+
+    # Unwind through the finally blocks below, so the app and mocks don't outlive us
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+
+    routes = [route.strip() for route in args.routes.split(",") if route.strip()]
+    unknown = set(routes) - set(ROUTES)
+    if unknown:
+        parser.error(f"Unknown routes: {', '.join(sorted(unknown))}")
+
+    config = MockConfig(
+        llm_latency=args.llm_latency, image_latency=args.image_latency, jitter=args.jitter
+    )
+    env = {"IMAGE_GENERATORS": args.generator, "GENERATION_MODE": args.generation_mode}
+    if not args.caches:
+        # Every request should reach the mocks unless caching is what's being measured
+        env.update({"LLM_CACHE_BACKEND": "none", "IMAGE_CACHE_ENABLED": "false", "IMAGE_POOL_ENABLED": "false"})
+
+    with MockProviderServer(config) as providers, MockSMTPServer() as smtp:
+        env.update(providers.env())
+        env.update(smtp.env())
+        app, base_url = start_app(env)
+        try:
+            results = asyncio.run(drive(base_url, routes, args.requests, args.concurrency, args.warmup))
+        finally:
+            stop_app(app)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "generator": args.generator,
+            "generation_mode": args.generation_mode,
+            "caches": args.caches,
+            "llm_latency": args.llm_latency,
+            "image_latency": args.image_latency,
+            "jitter": args.jitter
+        },
+        "routes": results
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    if args.compare:
+        print(compare(report, json.loads(Path(args.compare).read_text())))
+
+if __name__ == "__main__":
+    main()
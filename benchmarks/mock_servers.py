@@ -0,0 +1,336 @@
+"""Local stand-ins for Ollama, OpenAI, Runware, Picsum and SMTP
+
+All HTTP mocks share one FastAPI app so a single port serves every provider:
+
+    POST /api/chat                  Ollama chat (NDJSON when "stream" is true)
+    POST /v1/images/generations     OpenAI image generation (returns a URL)
+    POST /v1                        Runware task API over HTTP (Bearer or authentication task)
+    WS   /v1/ws                     Runware task API over a persistent WebSocket session
+    GET  /512                       Picsum (redirects to the image like the real service)
+    GET  /files/image.png           The image every provider points at
+
+    python -m benchmarks.mock_servers --port 9100 --llm-latency 0.5
+"""
+import argparse
+import asyncio
+import base64
+import io
+import json
+import random
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+
+import uvicorn
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, RedirectResponse, Response, StreamingResponse
+
+ANALYSIS_RESPONSE = {
+    "relationship": "friend",
+    "occasion": "birthday",
+    "emotion": "joy",
+    "memories": "hiking trips together",
+    "explanation": "A birthday card for a close friend"
+}
+
+MESSAGE_RESPONSE = {
+    "message": (
+        "Happy birthday! Every trail we've walked together has been better for your company, "
+        "and I can't wait to see where the next year takes us."
+    ),
+    "image_prompt": (
+        "A sunlit mountain trail at golden hour with wildflowers along the path, two backpacks "
+        "resting on a rock, warm celebratory colours and soft painterly light"
+    )
+}
+
+@dataclass
+class MockConfig:
+    llm_latency: float = 0.2        # seconds until the full chat response is available
+    llm_chunks: int = 20            # streamed pieces per chat response
+    image_latency: float = 0.5      # seconds per image generation request
+    jitter: float = 0.1             # +/- fraction applied to every latency
+    image_size: int = 512
+    ws_drops: int = 0               # Runware WebSocket connections closed on receiving tasks
+
+    def delay(self, seconds: float) -> float:
+        return max(0.0, seconds * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+def _render_png(size: int) -> bytes:
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new("RGB", (size, size), (74, 144, 226)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def _runware_results(task: dict, image_bytes: bytes, image_url: str) -> list:
+    """Result items for one imageInference task, one per requested image"""
+    results = []
+    for _ in range(max(1, int(task.get("numberResults", 1)))):
+        item = {"taskType": "imageInference", "taskUUID": task["taskUUID"], "imageUUID": str(uuid.uuid4())}
+        if task.get("outputType") == "base64Data":
+            item["imageBase64Data"] = base64.b64encode(image_bytes).decode("ascii")
+        else:
+            item["imageURL"] = image_url
+        results.append(item)
+    return results
+
+def _runware_error(message: str, task_uuid: Optional[str] = None) -> dict:
+    return {"errors": [{"code": "invalidRequest", "message": message, "taskUUID": task_uuid}]}
+
+def _split(text: str, pieces: int) -> list:
+    step = max(1, -(-len(text) // max(1, pieces)))
+    return [text[i:i + step] for i in range(0, len(text), step)]
+
+def create_app(config: Optional[MockConfig] = None) -> FastAPI:
+    """Build the mock provider app"""
+    config = config or MockConfig()
+    image_bytes = _render_png(config.image_size)
+    app = FastAPI()
+    app.state.config = config
+    app.state.calls = {
+        "ollama": 0, "openai": 0, "runware": 0, "runware_tasks": 0, "runware_auth": 0, "picsum": 0
+    }
+    drops = {"remaining": config.ws_drops}
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        app.state.calls["ollama"] += 1
+        body = await request.json()
+        prompt = body["messages"][-1]["content"]
+        if "image_prompt" in prompt:
+            # Like a real model, write the fields in the order the prompt lists them
+            fields = sorted(MESSAGE_RESPONSE, key=lambda field: prompt.find(f'"{field}"'))
+            content = json.dumps({field: MESSAGE_RESPONSE[field] for field in fields})
+        else:
+            content = json.dumps(ANALYSIS_RESPONSE)
+        model = body.get("model", "mock")
+
+        if not body.get("stream", True):
+            await asyncio.sleep(config.delay(config.llm_latency))
+            return JSONResponse({
+                "model": model,
+                "message": {"role": "assistant", "content": content},
+                "done": True
+            })
+
+        chunks = _split(content, config.llm_chunks)
+
+        async def stream():
+            for chunk in chunks:
+                await asyncio.sleep(config.delay(config.llm_latency / len(chunks)))
+                yield json.dumps({
+                    "model": model,
+                    "message": {"role": "assistant", "content": chunk},
+                    "done": False
+                }) + "\n"
+            yield json.dumps({
+                "model": model,
+                "message": {"role": "assistant", "content": ""},
+                "done": True
+            }) + "\n"
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    @app.post("/v1/images/generations")
+    async def openai_generate(request: Request):
+        app.state.calls["openai"] += 1
+        await request.json()
+        await asyncio.sleep(config.delay(config.image_latency))
+        return {"created": int(time.time()), "data": [{"url": str(request.url_for("image_file"))}]}
+
+    @app.post("/v1")
+    async def runware_tasks(request: Request):
+        app.state.calls["runware"] += 1
+        tasks = await request.json()
+        authenticated = request.headers.get("authorization", "").startswith("Bearer ")
+        if any(task.get("taskType") == "authentication" for task in tasks):
+            app.state.calls["runware_auth"] += 1
+            authenticated = True
+        if not authenticated:
+            return JSONResponse(_runware_error("Missing API key"), status_code=401)
+
+        inference = [task for task in tasks if task.get("taskType") == "imageInference"]
+        app.state.calls["runware_tasks"] += len(inference)
+        # Tasks in one request run concurrently, so the request takes as long as one image
+        await asyncio.sleep(config.delay(config.image_latency))
+        image_url = str(request.url_for("image_file"))
+        data = []
+        for task in inference:
+            data.extend(_runware_results(task, image_bytes, image_url))
+        return {"data": data}
+
+    @app.websocket("/v1/ws")
+    async def runware_session(websocket: WebSocket):
+        await websocket.accept()
+        image_url = str(websocket.url_for("image_file"))
+        send_lock = asyncio.Lock()
+        authenticated = False
+        running = set()
+
+        async def send(message: dict):
+            async with send_lock:
+                await websocket.send_text(json.dumps(message))
+
+        async def infer(task: dict):
+            await asyncio.sleep(config.delay(config.image_latency))
+            # Like the real API, every image is its own message
+            for item in _runware_results(task, image_bytes, image_url):
+                await send({"data": [item]})
+
+        try:
+            while True:
+                tasks = json.loads(await websocket.receive_text())
+                app.state.calls["runware"] += 1
+                if drops["remaining"] and any(task.get("taskType") == "imageInference" for task in tasks):
+                    # Simulate a dropped connection with the tasks in flight
+                    drops["remaining"] -= 1
+                    await websocket.close(code=1011)
+                    return
+                for task in tasks:
+                    task_type = task.get("taskType")
+                    if task_type == "authentication":
+                        app.state.calls["runware_auth"] += 1
+                        authenticated = True
+                        await send({"data": [{
+                            "taskType": "authentication",
+                            "connectionSessionUUID": task.get("connectionSessionUUID") or str(uuid.uuid4())
+                        }]})
+                    elif not authenticated:
+                        await send(_runware_error("Not authenticated", task.get("taskUUID")))
+                    elif task_type == "imageInference":
+                        app.state.calls["runware_tasks"] += 1
+                        job = asyncio.create_task(infer(task))
+                        running.add(job)
+                        job.add_done_callback(running.discard)
+                    else:
+                        await send(_runware_error(f"Unsupported taskType: {task_type}", task.get("taskUUID")))
+        except WebSocketDisconnect:
+            pass
+        finally:
+            for job in running:
+                job.cancel()
+
+    @app.get("/{size:int}")
+    async def picsum(request: Request, size: int):
+        app.state.calls["picsum"] += 1
+        await asyncio.sleep(config.delay(config.image_latency))
+        return RedirectResponse(str(request.url_for("image_file")), status_code=302)
+
+    @app.get("/files/image.png", name="image_file")
+    async def image_file():
+        return Response(image_bytes, media_type="image/png")
+
+    @app.get("/calls")
+    async def calls():
+        return app.state.calls
+
+    return app
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class MockProviderServer:
+    """Run the mock provider app on a background thread"""
+
+    def __init__(self, config: Optional[MockConfig] = None, port: int = 0):
+        self.port = port or free_port()
+        self.app = create_app(config)
+        self._server = uvicorn.Server(uvicorn.Config(
+            self.app, host="127.0.0.1", port=self.port, log_level="warning"
+        ))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def env(self) -> dict:
+        """Settings that point the application at this server"""
+        return {
+            "OLLAMA_API_URL": f"{self.base_url}/api/chat",
+            "OPENAI_API_URL": f"{self.base_url}/v1/images/generations",
+            "RUNWARE_API_URL": f"{self.base_url}/v1",
+            "RUNWARE_WS_URL": f"ws://127.0.0.1:{self.port}/v1/ws",
+            "PICSUM_BASE_URL": self.base_url,
+            "OPENAI_API_KEY": "mock",
+            "RUNWARE_API_KEY": "mock"
+        }
+
+    def start(self, timeout: float = 10.0):
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise TimeoutError("Mock provider server did not start")
+            time.sleep(0.01)
+
+    def stop(self):
+        self._server.should_exit = True
+        self._thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+class MockSMTPServer:
+    """aiosmtpd stand-in that accepts and counts every message"""
+
+    def __init__(self, port: int = 0):
+        self.port = port or free_port()
+        self.received = 0
+        self._controller = None
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 Message accepted for delivery"
+
+    def env(self) -> dict:
+        return {
+            "SMTP_SERVER": "127.0.0.1",
+            "SMTP_PORT": str(self.port),
+            "SMTP_START_TLS": "false",
+            "SMTP_USERNAME": "",
+            "EMAIL_FROM": "benchmark@example.com"
+        }
+
+    def start(self):
+        from aiosmtpd.controller import Controller
+        self._controller = Controller(self, hostname="127.0.0.1", port=self.port)
+        self._controller.start()
+
+    def stop(self):
+        if self._controller:
+            self._controller.stop()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--llm-latency", type=float, default=MockConfig.llm_latency)
+    parser.add_argument("--llm-chunks", type=int, default=MockConfig.llm_chunks)
+    parser.add_argument("--image-latency", type=float, default=MockConfig.image_latency)
+    parser.add_argument("--jitter", type=float, default=MockConfig.jitter)
+    args = parser.parse_args()
+
+    config = MockConfig(args.llm_latency, args.llm_chunks, args.image_latency, args.jitter)
+    server = MockProviderServer(config, args.port)
+    for key, value in server.env().items():
+        print(f"{key}={value}")
+    uvicorn.run(server.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
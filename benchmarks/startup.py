@@ -0,0 +1,71 @@
+"""Measure application cold start: import time and time to first request
+
+Each run starts a fresh interpreter so module caches don't hide import cost.
+
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def measure_import_time() -> float:
+    """Seconds to import the application in a fresh interpreter"""
+    code = "import time; start = time.perf_counter(); import app; print(time.perf_counter() - start)"
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def measure_first_request(timeout: float = 60.0) -> float:
+    """Seconds from launching uvicorn until GET / answers"""
+    port = _free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError(f"Server did not answer within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--generator", default=os.getenv("IMAGE_GENERATOR", "picsum"))
+    args = parser.parse_args()
+    os.environ["IMAGE_GENERATOR"] = args.generator
+
+    import_times = [measure_import_time() for _ in range(args.runs)]
+    first_request_times = [measure_first_request() for _ in range(args.runs)]
+    print(json.dumps({
+        "generator": args.generator,
+        "runs": args.runs,
+        "import_time_median": statistics.median(import_times),
+        "first_request_median": statistics.median(first_request_times)
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import base64
+import io
+import pytest
+from PIL import Image
+from app.services.image_store import FileSystemImageStore
+from app.services.service_factory import ServiceFactory
+
+@pytest.fixture
+def services(tmp_path):
+    """Give each test fresh service singletons, restoring the real ones afterwards"""
+    saved = dict(vars(ServiceFactory))
+    # Keep stored images out of the source tree
+    ServiceFactory._image_store = FileSystemImageStore(tmp_path / "images", max_bytes=10 * 1024 * 1024, max_age=3600)
+    yield ServiceFactory
+    for name, value in saved.items():
+        if name.startswith("_") and not name.startswith("__"):
+            setattr(ServiceFactory, name, value)
+
+@pytest.fixture
+def png_bytes() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (74, 144, 226)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+@pytest.fixture
+def png_data_url(png_bytes) -> str:
+    return "data:image/png;base64," + base64.b64encode(png_bytes).decode("ascii")
@@ -0,0 +1,91 @@
+import asyncio
+import io
+import zipfile
+import pytest
+from starlette.requests import ClientDisconnect
+from app.main import _stream_batch
+from app.services.batch_service import BatchInProgress, BatchService
+from app.services.render_executor import RenderExecutor
+
+RECIPIENTS = [
+    {"recipient_name": f"Friend {i}", "relationship": "friend", "occasion": "birthday",
+     "emotion": "joy", "memories": "", "gift_card_link": f"https://example.com/card/{i}"}
+    for i in range(3)
+]
+
+class StubLLMService:
+    async def generate_message(self, recipient_name, relationship, occasion, emotion, memories):
+        return {"message": f"Happy birthday, {recipient_name}!", "image_prompt": "a cake"}
+
+class StubImageService:
+    def __init__(self, image_data: bytes):
+        self.image_data = image_data
+
+    async def generate_image_data(self, prompt, occasion=None):
+        return self.image_data
+
+    async def rendition(self, image_data, name, digest=None):
+        return image_data
+
+@pytest.fixture
+def batches(tmp_path, png_bytes):
+    return BatchService(
+        StubLLMService(),
+        StubImageService(png_bytes),
+        RenderExecutor(max_workers=0, max_pending=8),
+        tmp_path,
+        concurrency=2
+    )
+
+def test_concurrent_opens_claim_the_batch_once(batches):
+    async def scenario():
+        batch_id = await batches.create(RECIPIENTS)
+        return await asyncio.gather(batches.open(batch_id), batches.open(batch_id), return_exceptions=True)
+
+    outcomes = asyncio.run(scenario())
+    assert sum(isinstance(outcome, BatchInProgress) for outcome in outcomes) == 1
+
+def test_batch_response_never_streamed_releases_the_batch(services, batches):
+    services._batch_service = batches
+
+    async def disconnected(message):
+        raise OSError("client went away")
+
+    async def scenario():
+        batch_id = await batches.create(RECIPIENTS)
+        response = await _stream_batch(batch_id)
+        assert (await batches.progress(batch_id))["running"] is True
+        # The client is gone before the headers can be sent, so the body is never iterated
+        scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+        with pytest.raises(ClientDisconnect):
+            await response(scope, None, disconnected)
+        return await batches.progress(batch_id)
+
+    assert asyncio.run(scenario())["running"] is False
+
+def test_streaming_claims_the_batch_until_it_ends(batches):
+    async def scenario():
+        batch_id = await batches.create(RECIPIENTS)
+        stream = batches.stream_zip(await batches.open(batch_id))
+        data = [await stream.__anext__()]
+        assert (await batches.progress(batch_id))["running"] is True
+        with pytest.raises(BatchInProgress):
+            await batches.open(batch_id)
+        data.extend([chunk async for chunk in stream])
+        return b"".join(data), await batches.progress(batch_id)
+
+    archive, progress = asyncio.run(scenario())
+    assert progress["running"] is False
+    assert progress["completed"] == 3
+    names = zipfile.ZipFile(io.BytesIO(archive)).namelist()
+    assert names[-1] == "manifest.json" and len(names) == 4
+
+def test_abandoned_stream_releases_the_batch(batches):
+    async def scenario():
+        batch_id = await batches.create(RECIPIENTS)
+        stream = batches.stream_zip(await batches.open(batch_id))
+        await stream.__anext__()
+        await stream.aclose()
+        return await batches.progress(batch_id)
+
+    assert asyncio.run(scenario())["running"] is False
@@ -0,0 +1,82 @@
+import asyncio
+import re
+import time
+import zlib
+import httpx
+from app.main import app
+from app.services.render_executor import RenderExecutor
+
+CONCURRENT_REQUESTS = 50
+
+class StubImageService:
+    """Stands in for the image service so no generator or rendition cache is needed"""
+
+    async def rendition(self, image_data: bytes, name: str, digest=None) -> bytes:
+        return image_data
+
+def _payload(i: int, image_path: str) -> dict:
+    return {
+        "message": f"Message {i}",
+        "image_path": image_path,
+        "gift_card_link": f"https://example.com/redeem/{i}"
+    }
+
+def _pdf_strings(pdf: bytes) -> set:
+    """Literal strings in the PDF (text shown and link targets), including compressed streams"""
+    parts = [pdf]
+    for match in re.finditer(rb"stream\r?\n(.*?)\r?\nendstream", pdf, re.S):
+        try:
+            parts.append(zlib.decompress(match.group(1)))
+        except zlib.error:
+            pass
+    return {text.decode("latin-1") for text in re.findall(rb"\(([^()]*)\)", b"\n".join(parts))}
+
+async def _burst(png_data_url: str):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+        pdfs = [
+            asyncio.create_task(client.post("/generate-pdf", json=_payload(i, png_data_url)))
+            for i in range(CONCURRENT_REQUESTS)
+        ]
+
+        # Another route must keep answering while the PDFs render
+        probe_latencies = []
+        while not all(task.done() for task in pdfs):
+            start = time.perf_counter()
+            probe = await client.get("/metrics")
+            probe_latencies.append(time.perf_counter() - start)
+            assert probe.status_code == 200
+            await asyncio.sleep(0.01)
+
+        return await asyncio.gather(*pdfs), probe_latencies
+
+def test_concurrent_pdfs_each_carry_their_own_message_and_link(services, png_data_url):
+    services._image_service = StubImageService()
+    # Room for the whole burst, so every request renders
+    services._render_executor = RenderExecutor(max_workers=0, max_pending=CONCURRENT_REQUESTS)
+
+    responses, probe_latencies = asyncio.run(_burst(png_data_url))
+
+    for i, response in enumerate(responses):
+        assert response.status_code == 200, f"request {i}"
+        assert response.headers["content-type"] == "application/pdf"
+        strings = _pdf_strings(response.content)
+        assert f"Message {i}" in strings, f"request {i} got another request's message"
+        assert f"https://example.com/redeem/{i}" in strings, f"request {i} got another request's link"
+
+    assert probe_latencies, "the probe route was never served during the burst"
+    assert max(probe_latencies) < 1.0
+
+def test_burst_beyond_the_render_queue_is_shed_with_retry_after(services, png_data_url):
+    services._image_service = StubImageService()
+    services._render_executor = RenderExecutor(max_workers=0, max_pending=8, retry_after=2)
+
+    responses, _ = asyncio.run(_burst(png_data_url))
+
+    statuses = [response.status_code for response in responses]
+    assert set(statuses) == {200, 503}
+    for i, response in enumerate(responses):
+        if response.status_code == 200:
+            assert f"Message {i}" in _pdf_strings(response.content)
+        else:
+            assert response.headers["retry-after"] == "2"
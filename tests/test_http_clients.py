@@ -0,0 +1,63 @@
+import asyncio
+from app.services.http_clients import HTTPClientManager, parse_limits
+
+async def _serve_counting_connections():
+    """A minimal keep-alive HTTP/1.1 server that counts accepted connections"""
+    accepted = []
+
+    async def handle(reader, writer):
+        accepted.append(writer)
+        try:
+            while True:
+                await reader.readuntil(b"\r\n\r\n")
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: image/png\r\nContent-Length: 2\r\n\r\nok")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/512", accepted
+
+def _run_requests(total: int, concurrency: int, limits: tuple) -> int:
+    async def scenario():
+        server, url, accepted = await _serve_counting_connections()
+        manager = HTTPClientManager(limits={"mock": limits}, http2=False)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def request():
+            async with semaphore:
+                response = await manager.get("mock").get(url)
+                assert response.status_code == 200
+
+        try:
+            await asyncio.gather(*[request() for _ in range(total)])
+        finally:
+            await manager.aclose()
+            server.close()
+            await server.wait_closed()
+        return len(accepted)
+
+    return asyncio.run(scenario())
+
+def test_second_request_reuses_the_connection():
+    assert _run_requests(total=2, concurrency=1, limits=(10, 5)) == 1
+
+def test_concurrent_requests_stay_within_the_provider_limit():
+    assert _run_requests(total=50, concurrency=10, limits=(4, 4)) <= 4
+
+def test_clients_are_shared_per_provider():
+    async def scenario():
+        manager = HTTPClientManager(http2=False)
+        try:
+            assert manager.get("runware") is manager.get("runware")
+            assert manager.get("runware") is not manager.get("openai")
+        finally:
+            await manager.aclose()
+
+    asyncio.run(scenario())
+
+def test_parse_limits():
+    assert parse_limits("runware=8:4, openai=2") == {"runware": (8, 4), "openai": (2, 2)}
+    assert parse_limits("") == {}
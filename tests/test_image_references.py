@@ -0,0 +1,27 @@
+import pytest
+from app.config import settings
+from app.main import _load_image_bytes
+
+@pytest.mark.parametrize("image_path", [
+    "/etc/passwd",
+    "../../etc/passwd",
+    "app/config.py",
+    "/static/../app/config.py",
+    "/static/images/../../app/config.py",
+    "file:///etc/passwd",
+])
+def test_rejects_paths_outside_static(image_path):
+    assert _load_image_bytes(image_path) is None
+
+def test_loads_static_images_and_data_urls(png_bytes, png_data_url):
+    placeholder = settings.PLACEHOLDER_IMAGE_PATH
+    assert _load_image_bytes("/static/images/placeholder.svg") == placeholder.read_bytes()
+    assert _load_image_bytes(png_data_url) == png_bytes
+
+def test_loads_store_references(services, tmp_path, png_bytes):
+    from app.services.image_store import FileSystemImageStore
+    store = FileSystemImageStore(tmp_path, max_bytes=10 * 1024 * 1024, max_age=3600)
+    services._image_store = store
+    digest = store.put(png_bytes)
+    assert _load_image_bytes(f"/images/{digest}") == png_bytes
+    assert _load_image_bytes("/images/../../app/config.py") is None
@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from app.services.image_router import ImageRouter
+
+class StubProvider:
+    """Provider answering after ``delay``, or failing when ``error`` is set"""
+
+    prompt_independent = False
+
+    def __init__(self, name: str, delay: float = 0.0, error: Exception = None):
+        self.provider_name = name
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cleaned_up = 0
+
+    async def generate(self, prompt: str, occasion: str = None) -> bytes:
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+            if self.error is not None:
+                raise self.error
+            return f"{self.provider_name}:{prompt}".encode()
+        finally:
+            # Stands in for handing a pooled connection back
+            await asyncio.sleep(0)
+            self.cleaned_up += 1
+
+def _run(scenario):
+    """Run the scenario, returning what reached the loop's exception handler"""
+    errors = []
+
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        return await scenario()
+
+    result = asyncio.run(main())
+    return result, errors
+
+def test_half_open_circuit_admits_one_probe_at_a_time():
+    provider = StubProvider("flaky", error=RuntimeError("down"))
+    router = ImageRouter({"flaky": provider}, hedge=False, failure_threshold=1, reset_timeout=0)
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await router.generate("first")
+        assert router.breakers["flaky"].state == "open"
+
+        provider.error, provider.delay, provider.calls = None, 0.05, 0
+        results = await asyncio.gather(*[router.generate(f"p{i}") for i in range(5)], return_exceptions=True)
+        return results
+
+    results, errors = _run(scenario)
+    assert provider.calls == 1
+    assert sum(isinstance(result, bytes) for result in results) == 1
+    assert router.breakers["flaky"].state == "closed"
+    assert not router.breakers["flaky"].probing
+    assert errors == []
+
+def test_hedge_losers_are_awaited_after_cancellation():
+    slow = StubProvider("slow", delay=5)
+    fast = StubProvider("fast")
+    router = ImageRouter({"slow": slow, "fast": fast}, hedge_delay=0.05)
+    # Make sure the slow provider is tried first
+    router.health["fast"].record(1.0, True)
+
+    async def scenario():
+        result = await router.generate("card")
+        # The loser has finished cleaning up by the time the winner is returned
+        assert slow.cleaned_up == 1
+        return result
+
+    result, errors = _run(scenario)
+    assert result == b"fast:card"
+    assert router.decisions[-1]["started"] == ["slow", "fast"]
+    assert errors == []
+
+def test_cancelled_probe_frees_the_half_open_circuit():
+    provider = StubProvider("flaky", error=RuntimeError("down"))
+    router = ImageRouter({"flaky": provider}, hedge=False, failure_threshold=1, reset_timeout=0)
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await router.generate("first")
+        provider.error, provider.delay = None, 5
+        probe = asyncio.create_task(router.generate("probe"))
+        await asyncio.sleep(0.01)
+        assert router.breakers["flaky"].probing
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        return router.breakers["flaky"].available()
+
+    available, errors = _run(scenario)
+    assert available
+    assert errors == []
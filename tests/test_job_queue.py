@@ -0,0 +1,88 @@
+import asyncio
+import time
+from app.services.job_queue import Job, JobQueue, SQLiteJobBackend
+
+async def _wait_finished(queue: JobQueue, job_ids, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        jobs = [await queue.get(job_id) for job_id in job_ids]
+        if all(job.status in ("completed", "failed") for job in jobs):
+            return jobs
+        await asyncio.sleep(0.02)
+    raise AssertionError("jobs did not finish")
+
+def test_workers_sharing_a_database_run_each_job_once(tmp_path):
+    runs = []
+
+    async def handler(payload, progress):
+        runs.append(payload["n"])
+        await asyncio.sleep(0.05)
+        return payload["n"]
+
+    async def scenario():
+        # Jobs left queued by a previous run, then two web workers start on the same database
+        queues = [JobQueue(SQLiteJobBackend(tmp_path / "jobs.db"), workers=2) for _ in range(2)]
+        for queue in queues:
+            queue.register("work", handler)
+        job_ids = [(await queues[0].submit("work", {"n": n})).id for n in range(6)]
+        try:
+            for queue in queues:
+                await queue.start()
+            jobs = await _wait_finished(queues[1], job_ids)
+        finally:
+            for queue in queues:
+                await queue.stop()
+        assert [job.result for job in jobs] == list(range(6))
+
+    asyncio.run(scenario())
+    assert sorted(runs) == list(range(6))
+
+def test_only_jobs_with_an_expired_lease_are_recovered(tmp_path):
+    runs = []
+
+    async def handler(payload, progress):
+        runs.append(payload["name"])
+        return None
+
+    async def scenario():
+        backend = SQLiteJobBackend(tmp_path / "jobs.db")
+        now = time.time()
+        # One job held by a live worker, one whose worker died
+        await backend.save(Job("work", {"name": "live"}, id="live", status="running", owner="a", lease_until=now + 60))
+        await backend.save(Job("work", {"name": "dead"}, id="dead", status="running", owner="b", lease_until=now - 1))
+
+        queue = JobQueue(SQLiteJobBackend(tmp_path / "jobs.db"), workers=1)
+        queue.register("work", handler)
+        await queue.start()
+        try:
+            await _wait_finished(queue, ["dead"])
+            assert (await queue.get("live")).status == "running"
+        finally:
+            await queue.stop()
+
+    asyncio.run(scenario())
+    assert runs == ["dead"]
+
+def test_subscribers_see_events_recorded_by_another_process(tmp_path):
+    async def handler(payload, progress):
+        for step in range(3):
+            await asyncio.sleep(0.05)
+            await progress("step", {"step": step})
+        return "done"
+
+    async def scenario():
+        running = JobQueue(SQLiteJobBackend(tmp_path / "jobs.db"), workers=1)
+        watching = JobQueue(SQLiteJobBackend(tmp_path / "jobs.db"), workers=0, poll_interval=0.02)
+        running.register("work", handler)
+        watching.register("work", handler)
+        job = await running.submit("work", {})
+        await running.start()
+        try:
+            events = [event async for event in watching.subscribe(job.id)]
+        finally:
+            await running.stop()
+        return events
+
+    events = asyncio.run(asyncio.wait_for(scenario(), 5))
+    assert [event["event"] for event in events] == ["running", "step", "step", "step", "completed"]
+    assert [event["seq"] for event in events] == [1, 2, 3, 4, 5]
@@ -0,0 +1,63 @@
+import codecs
+import json
+import pytest
+from app.services.json_stream import JsonFieldExtractor
+
+DOCUMENTS = [
+    # Escaped surrogate pair, as json.dumps writes emoji by default
+    'Sure! {"message": "abc\\ud83d\\ude00def", "image_prompt": "a cake"}',
+    # Raw multi-byte characters, escaped quotes and backslashes
+    '{"message": "Café ☕ \\"quoted\\" \\\\ \U0001F382 done", "image_prompt": "x"}',
+    # Escapes of every kind right next to each other
+    '{"message": "\\n\\t\\u00e9\\ud83c\\udf89\\\\u0041", "image_prompt": "y"}',
+]
+
+def _stream(chunks):
+    """Feed chunks like LLMService.stream_message, returning the message deltas and final value"""
+    extractor = JsonFieldExtractor()
+    deltas, sent = [], 0
+    for chunk in chunks:
+        extractor.feed(chunk)
+        message = extractor.fields.get("message") or extractor.partial("message") or ""
+        if len(message) > sent:
+            deltas.append(message[sent:])
+            sent = len(message)
+    return deltas, extractor.fields["message"]
+
+def _split_bytes(document: str, offset: int) -> list:
+    """Split the UTF-8 encoding at a byte offset and decode it the way a streaming reader would"""
+    data = document.encode("utf-8")
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    return [decoder.decode(data[:offset]), decoder.decode(data[offset:], final=True)]
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+def test_deltas_never_split_a_character_at_any_byte_offset(document):
+    expected = json.loads(document[document.index("{"):])["message"]
+    for offset in range(len(document.encode("utf-8")) + 1):
+        deltas, final = _stream(_split_bytes(document, offset))
+        assert final == expected
+        assert "".join(deltas) == expected, f"split at byte {offset}"
+        for delta in deltas:
+            # Lone surrogates can't be encoded, so this catches a split pair
+            delta.encode("utf-8")
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+def test_deltas_are_consistent_when_fed_one_character_at_a_time(document):
+    expected = json.loads(document[document.index("{"):])["message"]
+    deltas, final = _stream(list(document))
+    assert final == expected
+    assert "".join(deltas) == expected
+    for delta in deltas:
+        delta.encode("utf-8")
+
+def test_high_surrogate_is_held_back_until_its_pair_arrives():
+    extractor = JsonFieldExtractor()
+    extractor.feed('{"message": "abc\\ud83d')
+    assert extractor.partial("message") == "abc"
+    extractor.feed('\\ude00def')
+    assert extractor.partial("message") == "abc\U0001F600def"
+
+def test_escaped_backslash_before_u_is_not_held_back():
+    extractor = JsonFieldExtractor()
+    extractor.feed('{"message": "path\\\\ud83d')
+    assert extractor.partial("message") == "path\\ud83d"
@@ -0,0 +1,38 @@
+import asyncio
+import time
+import httpx
+from app.services.admission import AdmissionController
+from app.services.llm_service import LLMService
+from benchmarks.mock_servers import MockConfig, create_app
+
+LLM_DELAY = 0.5
+CONCURRENCY = 4
+
+async def _analyze_concurrently(mock_app) -> tuple:
+    service = LLMService(cache=None, admission=AdmissionController("ollama", max_concurrency=CONCURRENCY))
+    # Talk to the mock Ollama in-process instead of over a socket
+    service.client._client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=mock_app), base_url="http://mock"
+    )
+    service.api_url = service.client.api_url = "http://mock/api/chat"
+    try:
+        start = time.perf_counter()
+        # Distinct prompts, so neither the response cache nor coalescing can merge them
+        results = await asyncio.gather(*[
+            service.analyze_input(f"Recipient {i}", f"Thoughts number {i}")
+            for i in range(CONCURRENCY)
+        ])
+        return results, time.perf_counter() - start
+    finally:
+        await service.aclose()
+
+def test_distinct_llm_calls_overlap():
+    mock_app = create_app(MockConfig(llm_latency=LLM_DELAY, jitter=0.0))
+
+    results, elapsed = asyncio.run(_analyze_concurrently(mock_app))
+
+    assert mock_app.state.calls["ollama"] == CONCURRENCY
+    # Parsed from the mock's response, not the fallback analysis
+    assert all(result["relationship"] == "friend" for result in results)
+    # Sequential calls would take CONCURRENCY * LLM_DELAY
+    assert elapsed < LLM_DELAY * 2
@@ -0,0 +1,28 @@
+import asyncio
+from app.services.llm_service import LLMService
+
+IMAGE_PROMPT = "A lighthouse on a rocky coast at dusk, warm watercolor style, soft light, detailed"
+
+def test_fallback_keeps_the_image_prompt_already_streamed():
+    service = LLMService(cache=None)
+
+    async def broken_stream(model, messages):
+        yield '{"image_prompt": "' + IMAGE_PROMPT + '", "message": "Dear Ana, '
+        raise ConnectionError("stream dropped")
+
+    service.client.stream_chat = broken_stream
+
+    async def collect():
+        try:
+            return [event async for event in service.stream_message("Ana", "friend", "birthday", "joy", "")]
+        finally:
+            await service.aclose()
+
+    events = asyncio.run(collect())
+
+    image_prompts = [value for name, value in events if name == "image_prompt"]
+    assert len(image_prompts) == 1
+    name, result = events[-1]
+    assert name == "done"
+    # The message fell back to the template, but the image prompt the client saw stands
+    assert result["image_prompt"] == image_prompts[0]
@@ -0,0 +1,97 @@
+import asyncio
+from email.mime.text import MIMEText
+import aiosmtplib
+import pytest
+from app.services.mail_service import MailService, SMTPConnectionPool
+from benchmarks.mock_servers import MockSMTPServer
+
+class DroppingSMTPServer(MockSMTPServer):
+    """Counts messages like MockSMTPServer and can drop its client connections"""
+
+    def __init__(self, drop_during_data: bool = False):
+        super().__init__()
+        self.drop_during_data = drop_during_data
+        self.transports = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        self.transports.append(server.transport)
+        if self.drop_during_data:
+            # The message got through, but the client never sees the 250
+            server.transport.close()
+        return "250 Message accepted for delivery"
+
+    def drop_connections(self):
+        loop = self._controller.loop
+        for transport in self.transports:
+            loop.call_soon_threadsafe(transport.close)
+
+def _message(i: int) -> MIMEText:
+    message = MIMEText(f"Message {i}")
+    message["From"] = "test@example.com"
+    message["To"] = "friend@example.com"
+    message["Subject"] = f"Test {i}"
+    return message
+
+def _pool(server: MockSMTPServer, size: int) -> SMTPConnectionPool:
+    return SMTPConnectionPool("127.0.0.1", server.port, start_tls=False, size=size, timeout=5)
+
+def test_concurrent_sends_share_at_most_size_connections():
+    async def send_all(pool):
+        try:
+            await asyncio.gather(*[pool.send_message(_message(i)) for i in range(20)])
+        finally:
+            await pool.aclose()
+
+    with MockSMTPServer() as server:
+        pool = _pool(server, size=3)
+        asyncio.run(send_all(pool))
+
+    assert server.received == 20
+    assert 1 <= pool.connections_opened <= 3
+
+def test_dropped_idle_session_is_reconnected_once():
+    async def send_across_drop(server, pool):
+        try:
+            await pool.send_message(_message(1))
+            server.drop_connections()
+            await asyncio.sleep(0.2)
+            await pool.send_message(_message(2))
+        finally:
+            await pool.aclose()
+
+    with DroppingSMTPServer() as server:
+        pool = _pool(server, size=1)
+        asyncio.run(send_across_drop(server, pool))
+
+    assert server.received == 2
+    assert pool.reconnects == 1
+    assert pool.connections_opened == 2
+
+def test_disconnect_during_send_is_not_retried():
+    async def send_once(pool):
+        try:
+            await pool.send_message(_message(1))
+        finally:
+            await pool.aclose()
+
+    with DroppingSMTPServer(drop_during_data=True) as server:
+        pool = _pool(server, size=1)
+        with pytest.raises(aiosmtplib.SMTPServerDisconnected):
+            asyncio.run(send_once(pool))
+
+    # Resending would have delivered the message twice
+    assert server.received == 1
+    assert pool.connections_opened == 1
+
+def test_gift_card_email_escapes_the_message_and_link():
+    email = MailService._create_gift_card_email(
+        "friend@example.com",
+        "<script>alert('hi')</script> & <b>love</b>",
+        'https://example.com/redeem" onclick="steal()'
+    )
+    body = email.get_payload()[0].get_payload(decode=True).decode()
+
+    assert "<script>" not in body and "<b>" not in body
+    assert "&lt;script&gt;alert(&#x27;hi&#x27;)&lt;/script&gt; &amp; &lt;b&gt;love&lt;/b&gt;" in body
+    assert 'href="https://example.com/redeem&quot; onclick=&quot;steal()"' in body
@@ -0,0 +1,119 @@
+import asyncio
+import struct
+import pytest
+from app.services.image_generators.model_server import ModelServerGenerator
+from app.services.model_server import ModelServer
+
+class StubBatcher:
+    """Stands in for DiffusionBatcher, answering each prompt after ``delay`` seconds"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.stopped = False
+
+    async def submit(self, prompt: str, tier: str) -> bytes:
+        await asyncio.sleep(self.delay)
+        return f"{tier}:{prompt}".encode("utf-8")
+
+    def shutdown(self):
+        self.stopped = True
+
+def _run(scenario):
+    """Run the scenario, returning any errors the event loop reported"""
+    errors = []
+
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        await scenario()
+
+    asyncio.run(main())
+    return errors
+
+def test_requests_are_answered_over_the_socket(tmp_path):
+    socket_path = tmp_path / "model.sock"
+
+    async def scenario():
+        server = ModelServer(StubBatcher(delay=0.05), socket_path)
+        await server.start()
+        generator = ModelServerGenerator(socket_path, model_id="stub", tier="draft", timeout=5)
+        try:
+            images = await asyncio.gather(*[generator.generate(f"prompt {i}") for i in range(4)])
+            assert images == [f"draft:prompt {i}".encode("utf-8") for i in range(4)]
+        finally:
+            await generator.aclose()
+            await server.close()
+
+    assert _run(scenario) == []
+
+def test_closing_the_server_fails_in_flight_requests_cleanly(tmp_path):
+    socket_path = tmp_path / "model.sock"
+
+    async def scenario():
+        batcher = StubBatcher(delay=10)
+        server = ModelServer(batcher, socket_path)
+        await server.start()
+        generator = ModelServerGenerator(socket_path, model_id="stub", tier="draft", timeout=30)
+        request = asyncio.create_task(generator.generate("slow prompt"))
+        await asyncio.sleep(0.1)
+
+        await server.close()
+
+        with pytest.raises(ConnectionError):
+            await asyncio.wait_for(request, 2)
+        assert server._connections == {}
+        assert batcher.stopped
+        await generator.aclose()
+
+    assert _run(scenario) == []
+
+def test_unreadable_reply_fails_the_waiter_instead_of_hanging(tmp_path):
+    socket_path = tmp_path / "garbage.sock"
+
+    async def reply_with_garbage(reader, writer):
+        await reader.read(1)
+        body = b"not json"
+        writer.write(struct.pack("!II", len(body), 0) + body)
+        await writer.drain()
+        await reader.read()
+        writer.close()
+
+    async def scenario():
+        server = await asyncio.start_unix_server(reply_with_garbage, path=str(socket_path))
+        generator = ModelServerGenerator(socket_path, model_id="stub", tier="draft", timeout=30)
+        try:
+            with pytest.raises(ConnectionError, match="reader failed"):
+                await asyncio.wait_for(generator.generate("prompt"), 2)
+        finally:
+            await generator.aclose()
+            server.close()
+            await server.wait_closed()
+
+    _run(scenario)
+
+def test_stale_reader_leaves_the_new_connection_alone(tmp_path):
+    socket_path = tmp_path / "model.sock"
+
+    async def scenario():
+        server = ModelServer(StubBatcher(delay=0.3), socket_path)
+        await server.start()
+        generator = ModelServerGenerator(socket_path, model_id="stub", tier="draft", timeout=5)
+        try:
+            old_request = asyncio.create_task(generator.generate("on the old connection"))
+            await asyncio.sleep(0.05)
+            old_writer = generator._writer
+
+            # The old connection looks closed, so the next request reconnects before its reader has finished
+            old_writer.is_closing = lambda: True
+            new_request = asyncio.create_task(generator.generate("on the new connection"))
+            await asyncio.sleep(0.05)
+            assert generator._writer is not old_writer
+            old_writer.transport.close()
+
+            with pytest.raises(ConnectionError):
+                await old_request
+            assert await new_request == b"draft:on the new connection"
+        finally:
+            await generator.aclose()
+            await server.close()
+
+    assert _run(scenario) == []
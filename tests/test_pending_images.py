@@ -0,0 +1,62 @@
+import asyncio
+from app.services.pending_images import PENDING_PREFIX, PendingImages
+
+def _token(path: str) -> str:
+    return path[len(PENDING_PREFIX):]
+
+def test_another_worker_sees_the_image_once_ready(tmp_path):
+    async def scenario():
+        # Two workers sharing the pending directory
+        tracking = PendingImages(directory=tmp_path)
+        other = PendingImages(directory=tmp_path, poll_interval=0.01)
+        release = asyncio.Event()
+
+        async def generate():
+            await release.wait()
+            return "/images/abc"
+
+        token = _token(tracking.track(asyncio.create_task(generate())))
+        assert other.status(token) == {"status": "pending"}
+        assert await other.wait(token, timeout=0.05) == {"status": "pending"}
+
+        release.set()
+        assert await other.wait(token, timeout=2) == {"status": "ready", "image_path": "/images/abc"}
+
+    asyncio.run(scenario())
+
+def test_another_worker_sees_failures(tmp_path):
+    async def scenario():
+        tracking = PendingImages(directory=tmp_path)
+        other = PendingImages(directory=tmp_path, poll_interval=0.01)
+
+        async def generate():
+            raise RuntimeError("generator down")
+
+        token = _token(tracking.track(asyncio.create_task(generate())))
+        assert await other.wait(token, timeout=2) == {"status": "failed"}
+
+    asyncio.run(scenario())
+
+def test_unknown_and_malformed_tokens_are_not_found(tmp_path):
+    (tmp_path.parent / "secret.json").write_text('{"status": "ready"}')
+    pending = PendingImages(directory=tmp_path)
+
+    assert pending.status("0" * 32) is None
+    assert pending.status("../secret") is None
+
+def test_expired_entries_are_purged_without_new_tokens(tmp_path):
+    async def scenario():
+        pending = PendingImages(ttl=0.0, directory=tmp_path, purge_interval=0.0)
+
+        async def generate():
+            return "/images/abc"
+
+        task = asyncio.create_task(generate())
+        pending.track(task)
+        await task
+        await asyncio.sleep(0.01)
+
+        assert pending.stats() == {"tracked": 0, "pending": 0}
+        assert list(tmp_path.glob("*.json")) == []
+
+    asyncio.run(scenario())
@@ -0,0 +1,17 @@
+import asyncio
+from app.services.response_cache import MemoryCacheBackend, ResponseCache
+
+def test_key_ignores_whitespace_but_not_case():
+    assert ResponseCache.make_key("m", "Card for  Ana\n") == ResponseCache.make_key("m", "Card for Ana")
+    assert ResponseCache.make_key("m", "Card for Ana") != ResponseCache.make_key("m", "Card for ANA")
+
+def test_names_differing_in_case_get_their_own_message():
+    cache = ResponseCache(MemoryCacheBackend(max_entries=10, ttl=60))
+
+    async def scenario():
+        await cache.put("m", "Card for Ana", {"message": "Dear Ana"})
+        return await cache.get("m", "Card for ANA"), await cache.get("m", "Card  for Ana")
+
+    other, same = asyncio.run(scenario())
+    assert other is None
+    assert same == {"message": "Dear Ana"}
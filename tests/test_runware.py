@@ -0,0 +1,104 @@
+import asyncio
+import json
+import pytest
+import websockets
+from app.services.admission import AdmissionManager, RetryableError
+from app.services.image_generators.base import ImageGenerator
+from app.services.image_generators.runware import RunwareGenerator, RunwareSession
+from benchmarks.mock_servers import MockConfig, MockProviderServer
+
+PNG_SIGNATURE = b"\x89PNG"
+
+@pytest.fixture(autouse=True)
+def fresh_clients(monkeypatch):
+    """Per-test HTTP clients and admission limits, with quick retries"""
+    monkeypatch.setattr(ImageGenerator, "client_manager", None)
+    monkeypatch.setattr(ImageGenerator, "admission_manager", AdmissionManager(backoff_base=0.01))
+
+def _generator(server: MockProviderServer, transport: str, number_results: int = 1) -> RunwareGenerator:
+    generator = RunwareGenerator("mock", transport=transport, number_results=number_results)
+    generator.api_url = f"{server.base_url}/v1"
+    if generator.session is not None:
+        generator.session.url = server.env()["RUNWARE_WS_URL"]
+    generator.batch_window = 0.05
+    return generator
+
+async def _close(generator: RunwareGenerator):
+    await generator.aclose()
+    if ImageGenerator.client_manager is not None:
+        await ImageGenerator.client_manager.aclose()
+
+def _requests(server: MockProviderServer) -> int:
+    """Task messages or requests the mock received, not counting authentication"""
+    return server.app.state.calls["runware"] - server.app.state.calls["runware_auth"]
+
+@pytest.mark.parametrize("transport", ["http", "websocket"])
+def test_concurrent_prompts_share_one_request(transport):
+    async def generate_all(generator):
+        try:
+            return await asyncio.gather(*[generator.generate(f"Prompt {i}") for i in range(5)])
+        finally:
+            await _close(generator)
+
+    with MockProviderServer(MockConfig(image_latency=0.05, jitter=0.0)) as server:
+        images = asyncio.run(generate_all(_generator(server, transport)))
+
+    assert all(image.startswith(PNG_SIGNATURE) for image in images)
+    assert server.app.state.calls["runware_tasks"] == 5
+    assert _requests(server) == 1
+
+def test_spare_variants_serve_later_requests():
+    async def generate_repeatedly(generator):
+        try:
+            return [await generator.generate("The same prompt") for _ in range(4)]
+        finally:
+            await _close(generator)
+
+    with MockProviderServer(MockConfig(image_latency=0.05, jitter=0.0)) as server:
+        images = asyncio.run(generate_repeatedly(_generator(server, "websocket", number_results=3)))
+
+    assert all(image.startswith(PNG_SIGNATURE) for image in images)
+    # Three variants from the first task, then a second task for the fourth image
+    assert server.app.state.calls["runware_tasks"] == 2
+
+def test_session_reconnects_after_the_socket_drops():
+    async def generate(generator):
+        try:
+            return await generator.generate("A prompt")
+        finally:
+            await _close(generator)
+
+    config = MockConfig(image_latency=0.05, jitter=0.0, ws_drops=1)
+    with MockProviderServer(config) as server:
+        image = asyncio.run(generate(_generator(server, "websocket")))
+
+    assert image.startswith(PNG_SIGNATURE)
+    assert server.app.state.calls["runware_auth"] == 2
+    assert server.app.state.calls["runware_tasks"] == 1
+
+async def _run_against(reply: str) -> dict:
+    """Run two tasks on a session whose server answers them with ``reply``"""
+    async def handler(ws):
+        await ws.recv()
+        await ws.send(json.dumps({"data": [{"taskType": "authentication", "connectionSessionUUID": "s"}]}))
+        await ws.recv()
+        await ws.send(reply)
+        await ws.wait_closed()
+
+    async with websockets.serve(handler, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        session = RunwareSession(f"ws://127.0.0.1:{port}", "mock", timeout=5)
+        try:
+            return await session.run([{"taskUUID": "a"}, {"taskUUID": "b"}])
+        finally:
+            await session.aclose()
+
+def test_error_without_task_fails_every_pending_task():
+    results = asyncio.run(_run_against(json.dumps({"errors": [{"code": "busy", "message": "Try later"}]})))
+
+    assert set(results) == {"a", "b"}
+    assert all("Try later" in str(result) for result in results.values())
+
+def test_unreadable_frame_fails_pending_tasks_instead_of_hanging():
+    with pytest.raises(RetryableError, match="reader failed"):
+        asyncio.run(_run_against("not json"))
@@ -0,0 +1,71 @@
+import asyncio
+from contextvars import ContextVar
+import pytest
+from app.services import deadline
+from app.services.single_flight import SingleFlight
+
+request_id: ContextVar = ContextVar("test_request_id", default=None)
+
+def test_short_budget_caller_does_not_cut_off_the_shared_call():
+    seen = {}
+
+    async def backend():
+        seen["remaining"] = deadline.remaining()
+        seen["request_id"] = request_id.get()
+        await asyncio.sleep(0.2)
+        return "image"
+
+    async def caller(flight, name, budget):
+        request_id.set(name)
+        with deadline.budget(budget):
+            return await deadline.wait(flight.do("key", backend))
+
+    async def scenario():
+        flight = SingleFlight("test")
+        hurried = asyncio.create_task(caller(flight, "hurried", 0.05))
+        await asyncio.sleep(0)
+        patient = asyncio.create_task(caller(flight, "patient", 5.0))
+        return await asyncio.gather(hurried, patient, return_exceptions=True), flight
+
+    (hurried, patient), flight = asyncio.run(scenario())
+
+    assert isinstance(hurried, deadline.DeadlineExceeded)
+    assert patient == "image"
+    assert flight.stats()["calls"] == 1
+    # The first caller's budget and request id stayed with that caller
+    assert seen == {"remaining": None, "request_id": None}
+
+def test_shared_stream_runs_outside_the_first_callers_context():
+    seen = []
+
+    async def source():
+        for i in range(3):
+            seen.append((deadline.remaining(), request_id.get()))
+            await asyncio.sleep(0.01)
+            yield i
+
+    async def scenario():
+        request_id.set("first")
+        with deadline.budget(5.0):
+            return [item async for item in SingleFlight("test").stream("key", source)]
+
+    assert asyncio.run(scenario()) == [0, 1, 2]
+    assert seen == [(None, None)] * 3
+
+def test_call_is_cancelled_once_every_caller_left():
+    async def scenario():
+        flight = SingleFlight("test")
+        started = asyncio.Event()
+
+        async def backend():
+            started.set()
+            await asyncio.sleep(10)
+
+        caller = asyncio.create_task(flight.do("key", backend))
+        await started.wait()
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        return flight.stats()
+
+    assert asyncio.run(scenario())["in_flight"] == 0
@@ -0,0 +1,23 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Generous defaults for shared CI machines; tighten locally through the environment
+MAX_IMPORT_SECONDS = float(os.getenv("STARTUP_MAX_IMPORT_SECONDS", "3"))
+MAX_FIRST_REQUEST_SECONDS = float(os.getenv("STARTUP_MAX_FIRST_REQUEST_SECONDS", "10"))
+
+@pytest.mark.benchmark
+def test_startup_stays_within_budget():
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--runs", "3", "--generator", "picsum"],
+        cwd=ROOT, check=True, capture_output=True, text=True, timeout=300
+    )
+    report = json.loads(result.stdout[result.stdout.index("{"):])
+
+    assert report["import_time_median"] < MAX_IMPORT_SECONDS
+    assert report["first_request_median"] < MAX_FIRST_REQUEST_SECONDS